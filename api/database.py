@@ -1,12 +1,12 @@
 import os
-import json
 import logging
-from typing import Dict, List, Generator, Optional
+import threading
+from typing import Callable, Dict, List, Generator, Optional
 from contextlib import contextmanager
 from dataclasses import dataclass
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, insert, DateTime
 from sqlalchemy.orm import sessionmaker, scoped_session, Session
 from sqlalchemy.exc import SQLAlchemyError
 from supabase import create_client, Client
@@ -15,6 +15,10 @@ import time
 from datetime import datetime
 import redis
 from dateutil.parser import parse
+from api.utils.codec_redis import codificar_lectura
+from api.utils.metricas import ERRORES_STORAGE, ESCRITURAS_STORAGE, cronometrar
+from api.utils.procesos import tras_fork
+from config.settings import Config
 
 logger = logging.getLogger(__name__)
 load_dotenv()
@@ -26,9 +30,41 @@ class DatabaseConfig:
     sqlite_url: str = "sqlite:///db.sqlite3"
     redis_url: str = "redis://localhost:6379/0"
 
+class _Conexion:
+    """
+    Atributo de DatabaseManager creado en el primer acceso (una sola vez, con lock),
+    pasando por la envoltura registrada para él (p. ej. los proxies de api.utils.trazas),
+    y reemplazable por asignación.
+    """
+
+    def __init__(self, fabrica):
+        self.fabrica = fabrica
+
+    def __set_name__(self, owner, nombre):
+        self.nombre = nombre
+
+    def __get__(self, obj, tipo=None):
+        if obj is None:
+            return self
+        valor = obj.__dict__.get(self.nombre)
+        if valor is None:
+            with obj._lock_conexiones:
+                valor = obj.__dict__.get(self.nombre)
+                if valor is None:
+                    valor = obj.__dict__[self.nombre] = obj._envolver(self.nombre, self.fabrica(obj))
+        return valor
+
+    def __set__(self, obj, valor):
+        obj.__dict__[self.nombre] = valor
+
+
 class DatabaseManager:
     """
     Gestiona todas las conexiones a bases de datos usando el patrón Singleton.
+
+    Los clientes (engine, SessionLocal, supabase, redis) se crean en el primer uso. Sin
+    FAST_BOOT se verifican al importar, como siempre; con FAST_BOOT la verificación la
+    hace el arranque en segundo plano (verificar_conexiones, en paralelo).
     """
     _instance = None
     
@@ -40,82 +76,162 @@ class DatabaseManager:
     
     def _initialize(self):
         """Inicialización perezosa de conexiones con manejo de errores"""
-        config = DatabaseConfig(
+        self._lock_conexiones = threading.RLock()
+        self._envolturas: Dict[str, Callable] = {}
+        self.config = DatabaseConfig(
             supabase_url=os.getenv("SUPABASE_URL"),
             supabase_key=os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY"),#??
             sqlite_url=os.getenv("SQLITE_URL", "sqlite:///db.sqlite3"),
             redis_url=os.getenv("REDIS_URL", "redis://localhost:6379/0")
         )
+        self.supabase_local = None
 
-        try:
-            #configurar SQLite
-            self.engine = create_engine(
-                config.sqlite_url,
-                connect_args={"check_same_thread": False},
-                pool_pre_ping=True
-            )
-
-            #crear sesion
-            self.SessionLocal = scoped_session(
-                sessionmaker(
-                    bind=self.engine,
-                    autocommit=False,
-                    autoflush=False,
-                )
-            )
-
-            # configurar Supabase
-            self.supabase = create_client(
-                config.supabase_url,
-                config.supabase_key,
-                options=ClientOptions(
-                    postgrest_client_timeout=15,
-                    storage_client_timeout=15,
-                    schema="public",
-                    auto_refresh_token=False,
-                    persist_session=False,#?
-                    #  headers={
-                    #     "Authorization": f"Bearer {config.supabase_key}",
-                    #     "apikey": config.supabase_key
-                    # }
-                    
-                )
-            )
-            
-            # configurar Redis
-            self.redis = redis.Redis.from_url(
-                config.redis_url,
-                socket_connect_timeout=5,
-                health_check_interval=30,
-                decode_responses=False,
-            )
-            
+        if Config.FAST_BOOT:
+            logger.info("DatabaseManager en modo perezoso (FAST_BOOT)")
+            return
 
+        try:
             self._verify_connections()
-            
-            # inicializar estructura local
-            self._init_local_cache()
-            
             logger.info("DatabaseManager inicializado correctamente")
-            
         except Exception as e:
             logger.critical(f"Error inicializando DatabaseManager: {str(e)}")
             raise
 
+    def _crear_engine(self):
+        #configurar SQLite
+        engine = create_engine(
+            self.config.sqlite_url,
+            connect_args={"check_same_thread": False},
+            pool_pre_ping=True
+        )
+        # inicializar estructura local antes del primer uso
+        self._init_local_cache(engine)
+        return engine
+
+    def _crear_sesiones(self):
+        #crear sesion
+        return scoped_session(
+            sessionmaker(
+                bind=self.engine,
+                autocommit=False,
+                autoflush=False,
+            )
+        )
+
+    def _crear_supabase(self):
+        url, clave = self.config.supabase_url, self.config.supabase_key
+        if Config.SUPABASE_LOCAL:
+            # sin red: Supabase local sobre SQLite con latencia/errores configurables
+            from api.utils.supabase_local import CLAVE_LOCAL, iniciar_desde_config
+
+            # tras un fork el servidor sigue atendiendo en el proceso padre
+            if self.supabase_local is None:
+                self.supabase_local = iniciar_desde_config()
+            url, clave = self.supabase_local.url, CLAVE_LOCAL
+            logger.warning(f"Usando Supabase local en {self.supabase_local.url}")
+
+        # configurar Supabase
+        return create_client(
+            url,
+            clave,
+            options=ClientOptions(
+                postgrest_client_timeout=15,
+                storage_client_timeout=15,
+                schema="public",
+                auto_refresh_token=False,
+                persist_session=False,#?
+                #  headers={
+                #     "Authorization": f"Bearer {config.supabase_key}",
+                #     "apikey": config.supabase_key
+                # }
+                
+            )
+        )
+
+    def _crear_redis(self):
+        # configurar Redis
+        return redis.Redis.from_url(
+            self.config.redis_url,
+            socket_connect_timeout=5,
+            health_check_interval=30,
+            decode_responses=False,
+        )
+
+    engine = _Conexion(_crear_engine)
+    SessionLocal = _Conexion(_crear_sesiones)
+    supabase = _Conexion(_crear_supabase)
+    redis = _Conexion(_crear_redis)
+
+    def _envolver(self, nombre: str, valor):
+        envoltura = self._envolturas.get(nombre)
+        return envoltura(valor) if envoltura else valor
+
+    def envolver_conexion(self, nombre: str, envoltura: Callable):
+        """
+        Registra una envoltura para el cliente `nombre`: se aplica al crearlo (también los
+        que se recrean tras un fork) y, si ya existe, al actual. No abre conexiones.
+        """
+        with self._lock_conexiones:
+            self._envolturas[nombre] = envoltura
+            if self.__dict__.get(nombre) is not None:
+                self.__dict__[nombre] = envoltura(self.__dict__[nombre])
+
+    def reiniciar_tras_fork(self):
+        """
+        En el proceso hijo descarta los clientes heredados (sin cerrarlos: los sockets
+        siguen siendo del padre) para que cada proceso cree su propio pool en el primer uso;
+        las envolturas registradas se aplican a los clientes nuevos.
+        """
+        self._lock_conexiones = threading.RLock()
+        engine = self.__dict__.pop('engine', None)
+        if engine is not None:
+            engine.dispose(close=False)
+        for nombre in ('SessionLocal', 'supabase', 'redis'):
+            self.__dict__.pop(nombre, None)
+
+    def verificar_conexiones(self) -> Dict[str, Dict]:
+        """
+        Comprueba Redis, SQLite y Supabase a la vez (el arranque tarda lo que la más lenta)
+        y devuelve {nombre: {'ok', 'ms', 'error'}} sin lanzar.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        comprobaciones = {
+            'redis': self._verificar_redis,
+            'sqlite': self._verificar_sqlite,
+            'supabase': self._verificar_supabase,
+        }
+
+        def medir(comprobacion):
+            inicio = time.perf_counter()
+            try:
+                comprobacion()
+                return {'ok': True, 'ms': round((time.perf_counter() - inicio) * 1000, 1)}
+            except Exception as e:
+                return {'ok': False, 'ms': round((time.perf_counter() - inicio) * 1000, 1), 'error': str(e)}
+
+        with ThreadPoolExecutor(max_workers=len(comprobaciones), thread_name_prefix='verificacion') as ejecutor:
+            futuros = {nombre: ejecutor.submit(medir, c) for nombre, c in comprobaciones.items()}
+            return {nombre: futuro.result() for nombre, futuro in futuros.items()}
+
     def _verify_connections(self):
         """Verifica que todas las conexiones estén activas"""
-        # Redis
+        self._verificar_redis()
+        self._verificar_sqlite()
+        self._verificar_supabase()
+
+    def _verificar_redis(self):
         if not self.redis.ping():
             raise ConnectionError("No se pudo conectar a Redis")
-        
-        # SQLite
+
+    def _verificar_sqlite(self):
         try:
             with self.engine.connect() as conn:
                 conn.execute(text("SELECT 1"))
         except SQLAlchemyError as e:
             raise ConnectionError(f"Error conectando a SQLite: {str(e)}")
-        
-        # Supabase
+
+    def _verificar_supabase(self):
         try:
             res = self.supabase.table('torres').select('id_torre').limit(1).execute()
             if not res.data:
@@ -123,10 +239,14 @@ class DatabaseManager:
         except Exception as e:
             raise ConnectionError(f"Error conectando a Supabase: {str(e)}")
 
-    def _init_local_cache(self):
+    def _init_local_cache(self, engine):
         """Inicializa la estructura de la base de datos local"""
         from api.models.base import Base
-        Base.metadata.create_all(bind=self.engine)
+        Base.metadata.create_all(bind=engine)
+        # create_all no añade índices nuevos a tablas que ya existían
+        for tabla in Base.metadata.sorted_tables:
+            for indice in tabla.indexes:
+                indice.create(bind=engine, checkfirst=True)
         logger.info("Estructura de SQLite verificada")
 
     @contextmanager
@@ -148,6 +268,59 @@ class DatabaseManager:
         finally:
             session.close()
 
+class PipelineRedis:
+    """
+    Pipeline Redis (sin transacción) que recuerda qué comando es cada posición, para
+    informar de los errores comando a comando en lugar de fallar el lote entero. Las
+    escrituras solo encolan: la latencia y los comandos fallidos de Redis se miden aquí,
+    al ejecutar (destino 'redis', modo 'pipeline').
+    """
+
+    def __init__(self, redis_client):
+        self._pipe = redis_client.pipeline(transaction=False)
+        self.comandos: List[str] = []
+        self.resultados: list = []
+        self.errores: List[Dict] = []
+        self.ejecutado = False
+
+    def __getattr__(self, nombre):
+        metodo = getattr(self._pipe, nombre)
+
+        def encolar(*args, **kwargs):
+            self.comandos.append(f"{nombre.upper()} {args[0]}" if args else nombre.upper())
+            metodo(*args, **kwargs)
+            return self
+
+        return encolar
+
+    def __len__(self):
+        return len(self.comandos)
+
+    def ejecutar(self) -> List[Dict]:
+        """Envía todos los comandos en un round trip; devuelve los que fallaron"""
+        if self.ejecutado:
+            return self.errores
+        self.ejecutado = True
+        if not self.comandos:
+            return self.errores
+        inicio = time.perf_counter()
+        try:
+            self.resultados = self._pipe.execute(raise_on_error=False)
+        except Exception as e:
+            # fallo de conexion: no se aplico ningun comando
+            self.resultados = [e] * len(self.comandos)
+        finally:
+            ESCRITURAS_STORAGE.observar(time.perf_counter() - inicio, 'redis', 'pipeline')
+        for comando, resultado in zip(self.comandos, self.resultados):
+            if isinstance(resultado, Exception):
+                self.errores.append({'comando': comando, 'error': str(resultado)})
+        if self.errores:
+            ERRORES_STORAGE.incrementar('redis', 'pipeline', cantidad=len(self.errores))
+            detalle = '; '.join(f"{e['comando']}: {e['error']}" for e in self.errores[:5])
+            logger.error(f"Pipeline Redis: {len(self.errores)}/{len(self.comandos)} comandos fallaron ({detalle})")
+        return self.errores
+
+
 class StorageManager:
     """
     Gestiona el almacenamiento distribuido entre Supabase (principal), 
@@ -160,7 +333,46 @@ class StorageManager:
 
 
     def __init__(self, db_manager: DatabaseManager):
+        from api.utils.planificacion import crear_limitadores
+
         self.db = db_manager
+        self.limitadores = crear_limitadores()  # token bucket por destino (STORAGE_RATE_*)
+        self._local = threading.local()  # pipeline Redis abierto por cada hilo
+
+    def reiniciar_tras_fork(self):
+        """Pipelines por hilo y token buckets nuevos (sus locks pudieron quedar tomados en el padre)"""
+        from api.utils.planificacion import crear_limitadores
+
+        self._local = threading.local()
+        self.limitadores = crear_limitadores()
+
+    @contextmanager
+    def pipeline_redis(self) -> Generator[PipelineRedis, None, None]:
+        """
+        Agrupa todos los comandos Redis de un tick (o lote) en un único round trip al
+        salir del bloque. Los save()/save_lote() y las alertas hechos dentro del bloque
+        encolan en el mismo pipeline; un bloque anidado reutiliza el exterior.
+        """
+        actual = getattr(self._local, 'pipeline', None)
+        if actual is not None:
+            yield actual
+            return
+
+        pipeline = PipelineRedis(self.db.redis)
+        self._local.pipeline = pipeline
+        try:
+            yield pipeline
+        finally:
+            self._local.pipeline = None
+            pipeline.ejecutar()
+
+    @staticmethod
+    def _resultado_pipeline(pipeline: PipelineRedis, **extra) -> Dict:
+        if not pipeline.ejecutado:
+            return {'success': True, 'encolado': True, **extra}  # se envia al cerrar el tick
+        if pipeline.errores:
+            return {'success': False, 'error': pipeline.errores[0]['error'], 'errores': pipeline.errores}
+        return {'success': True, **extra}
 
     def _convert_dates(self, data: dict) -> dict:
         """Convierte strings de fecha a objetos datetime para SQLite"""
@@ -210,10 +422,12 @@ class StorageManager:
             logger.error(f"Error guardando {data_type}: {str(e)}")
             raise
 
+    @cronometrar(ESCRITURAS_STORAGE, 'supabase', 'unitario', errores=ERRORES_STORAGE)
     def _save_to_supabase(self, table_name: str, data: Dict) -> Dict:
         max_retries = 3
         for attempt in range(max_retries):
             try:
+                self.limitadores['supabase'].adquirir()
                 prepared_data = self._prepare_for_supabase(data) 
                 res = self.db.supabase.table(table_name).insert(prepared_data).execute()
                 return {'success': True, 'data': res.data[0] if res.data else None}
@@ -223,8 +437,10 @@ class StorageManager:
                     return {'success': False, 'error': str(e)}
                 time.sleep(1)
 
+    @cronometrar(ESCRITURAS_STORAGE, 'sqlite', 'unitario', errores=ERRORES_STORAGE)
     def _save_to_sqlite(self, model_class, data: Dict) -> Dict:
         try:
+            self.limitadores['sqlite'].adquirir()
             converted_data = self._convert_dates(data) 
             with self.db.get_session() as session:
                 instance = model_class(**converted_data)
@@ -237,106 +453,126 @@ class StorageManager:
 
     def _save_to_redis(self, data: Dict) -> Dict:
         try:
+            self.limitadores['redis'].adquirir()
             prepared_data = self._prepare_for_supabase(data) #JSON?
-            serialized = json.dumps(prepared_data, default=str)  #maneja datetime
-            self.db.redis.set(
-                f"torre:{data['id_torre']}:last_data",
-                serialized,
-                ex=3600 # una hora de expiracion
-            )
-            return {'success': True}
+            serialized = codificar_lectura(prepared_data)  # formato segun REDIS_CODEC
+            with self.pipeline_redis() as pipe:
+                pipe.set(
+                    f"torre:{data['id_torre']}:last_data",
+                    serialized,
+                    ex=3600 # una hora de expiracion
+                )
+                pipe.publish(f"lecturas:{data['id_torre']}", serialized)  # clientes SSE
+            return self._resultado_pipeline(pipe)
         except Exception as e:
             logger.error(f"Error en Redis: {str(e)}")
+            ERRORES_STORAGE.incrementar('redis', 'unitario')
             return {'success': False, 'error': str(e)}
 
 
-def sincronizar_datos_iniciales():
-    """Sincroniza todos los datos iniciales desde Supabase"""
-    sincronizar_tabla('torres')
-    sincronizar_tabla('profiles')
-    sincronizar_tabla('payments')
-
-def sincronizar_tabla(tabla: str):
-    """Sincroniza una tabla específica desde Supabase a SQLite"""
-    db_manager = DatabaseManager()
-    
-    try:
-        # datos de Supabase
-        response = db_manager.supabase.table(tabla).select('*').execute()
-        datos_supabase = response.data
-        
-        if not datos_supabase:
-            logger.warning(f"Tabla '{tabla}' en Supabase esta vacia")
-            return
+    def save_lote(self, data_type: str, registros: List[Dict]) -> Dict:
+        """Guarda un lote de registros con una sola operación por destino"""
+        if data_type not in self.MODEL_MAPPING:
+            raise ValueError(f"Tipo de dato no soportado: {data_type}")
+        if not registros:
+            return {}
 
-        MODEL_NAMES ={
-            'profiles': 'Profile',
-            'torres': 'Torre',
-            'payments': 'Payment',
-            'diagnostico_tecnico': 'DiagnosticoTecnico',
-            'datos_meteorologicos': 'DatoMeteorologico'
-        }
+        table_name, model_name = self.MODEL_MAPPING[data_type]
 
-        if tabla not in MODEL_NAMES:
-            raise ValueError(f"No existe mapeo para la tabla {tabla}")
-        
-        # importar dinamicamente el modelo correcto
-        model_module = __import__(f'api.models.{tabla}', fromlist=[MODEL_NAMES[tabla]])
-        model_class = getattr(model_module, MODEL_NAMES[tabla])
+        try:
+            model_module = __import__(f'api.models.{table_name}', fromlist=[model_name])
+            model_class = getattr(model_module, model_name)
 
+            results = {
+                'supabase': self._save_lote_supabase(table_name, registros),
+                'sqlite': self._save_lote_sqlite(model_class, registros),
+                'redis': {'success': True}
+            }
 
-        # Sincronizar con SQLite
-        with db_manager.get_session() as session:
+            if data_type == 'meteorologico':
+                results['redis'] = self._save_lote_redis(registros)
 
+            return results
 
-            # obtener el id dinamicamente
-            primary_key = next(col.name for col in model_class.__table__.primary_key.columns)
+        except Exception as e:
+            logger.error(f"Error guardando lote de {data_type}: {str(e)}")
+            raise
 
-            # Obtener IDs existentes
-            # existing_ids = {t[0] for t in session.query(model_class.id).all()}
-            existing_ids = {t[0] for t in session.query(getattr(model_class, primary_key)).all()}
-            
-            nuevos = 0
-            actualizados = 0
-            
-            ###
-            for item in datos_supabase:
-                item_id = item.get('id') or item.get('id_torre') or item.get('id_diagnostico') or item.get('id_dato')
-
-                # # Convertir strings de fecha a objetos datetime
-                # if 'updated_at' in item and isinstance(item['updated_at'], str):
-                #     try:
-                #         item['updated_at'] = parse(item['updated_at'])
-                #     except (ValueError, TypeError) as e:
-                #         logger.warning(f"Error parseando fecha en {tabla} ID {item.get('id')}: {e}")
-                #         item['updated_at'] = None  # O usa datetime.now() como fallback
-
-                 #  strings de supabase fecha a objetos datetime
-                for field in ['fecha_creacion', 'ultima_actualizacion', 'updated_at', 'expires_at','payment_date' ]:  # A;ade todos los campos de fecha
-                    if field in item and item[field] and isinstance(item[field], str):
+    @cronometrar(ESCRITURAS_STORAGE, 'supabase', 'lote', errores=ERRORES_STORAGE)
+    def _save_lote_supabase(self, table_name: str, registros: List[Dict]) -> Dict:
+        prepared = [self._prepare_for_supabase(r) for r in registros]
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                self.limitadores['supabase'].adquirir(len(prepared))
+                self.db.supabase.table(table_name).insert(prepared, returning='minimal').execute()
+                return {'success': True, 'count': len(prepared)}
+            except Exception as e:
+                if attempt == max_retries - 1:
+                    logger.error(f"Error en Supabase (lote, intento {attempt + 1}): {str(e)}")
+                    return {'success': False, 'error': str(e)}
+                time.sleep(1)
+
+    @cronometrar(ESCRITURAS_STORAGE, 'sqlite', 'lote', errores=ERRORES_STORAGE)
+    def _save_lote_sqlite(self, model_class, registros: List[Dict]) -> Dict:
+        try:
+            # solo se convierten las columnas DateTime (parsear todo el lote es muy costoso)
+            fechas = [c.name for c in model_class.__table__.columns if isinstance(c.type, DateTime)]
+            filas = []
+            for registro in registros:
+                fila = dict(registro)
+                for campo in fechas:
+                    if isinstance(fila.get(campo), str):
                         try:
-                            item[field] = parse(item[field])
-                        except (ValueError, TypeError) as e:
-                            logger.warning(f"Error parseando fecha en {tabla} ID {item.get('id')}: {e}")
-                            item[field] = datetime.now()  #
-                
-                if item_id in existing_ids:
-                    session.query(model_class).filter_by(**{primary_key: item_id}).update(item)
-                    actualizados += 1
-                else:
-                    session.add(model_class(**item)) #item
-                    nuevos += 1
-            
-            session.commit()
-            logger.info(
-                f"Sincronización de {tabla}: {nuevos} nuevos, "
-                f"{actualizados} actualizados"
-            )
-            
+                            fila[campo] = datetime.fromisoformat(fila[campo])  # ~20x más rápido que dateutil
+                        except ValueError:
+                            fila[campo] = parse(fila[campo])
+                filas.append(fila)
+
+            self.limitadores['sqlite'].adquirir(len(filas))
+            with self.db.get_session() as session:
+                session.execute(insert(model_class.__table__), filas)
+            return {'success': True, 'count': len(filas)}
+        except Exception as e:
+            logger.error(f"Error en SQLite (lote): {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def _save_lote_redis(self, registros: List[Dict]) -> Dict:
+        try:
+            self.limitadores['redis'].adquirir(len(registros))
+            with self.pipeline_redis() as pipe:
+                for registro in registros:
+                    serialized = codificar_lectura(self._prepare_for_supabase(registro))
+                    pipe.set(f"torre:{registro['id_torre']}:last_data", serialized, ex=3600)
+                    pipe.publish(f"lecturas:{registro['id_torre']}", serialized)
+            return self._resultado_pipeline(pipe, count=len(registros))
+        except Exception as e:
+            logger.error(f"Error en Redis (lote): {str(e)}")
+            ERRORES_STORAGE.incrementar('redis', 'lote')
+            return {'success': False, 'error': str(e)}
+
+
+def sincronizar_datos_iniciales():
+    """Sincroniza desde Supabase las tablas de SYNC_TABLES en paralelo (incremental si ya hay marca)"""
+    from api.utils.sincronizacion import sincronizar_tablas
+
+    sincronizar_tablas(Config.SYNC_TABLES)
+
+def sincronizar_tabla(tabla: str, completa: bool = False) -> Dict:
+    """Sincroniza una tabla específica desde Supabase a SQLite (ver api.utils.sincronizacion)"""
+    from api.utils.sincronizacion import sincronizar_tabla as sincronizar
+
+    try:
+        return sincronizar(tabla, completa=completa)
     except Exception as e:
         logger.error(f"Error sincronizando {tabla}: {str(e)}")
         raise
 
 # Inicializacion global
 db_manager = DatabaseManager()
-storage_manager = StorageManager(db_manager)
\ No newline at end of file
+storage_manager = StorageManager(db_manager)
+
+@tras_fork
+def _reiniciar_conexiones():
+    db_manager.reiniciar_tras_fork()
+    storage_manager.reiniciar_tras_fork()
\ No newline at end of file
@@ -0,0 +1,84 @@
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Despliegue en varios procesos: N workers de la API con gunicorn (PROCESS_ROLE=api), un
+# único proceso de ingesta (python -m api.ingest) que sincroniza SQLite, simula las
+# torres y entrega las alertas, y los flujos SSE en su propio gunicorn con workers
+# gevent (PROCESS_ROLE=eventos). Así la API usa todos los núcleos sin repartir la
+# simulación entre workers ni competir con ella por el GIL, y los clientes SSE no
+# ocupan los hilos de la API.
+#
+#   python -m api.despliegue --workers 4 --bind 0.0.0.0:5000 --bind-eventos 0.0.0.0:5002
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_GUNICORN = os.path.join(RAIZ, 'gunicorn.conf.py')
+CONFIG_EVENTOS = os.path.join(RAIZ, 'gunicorn_eventos.conf.py')
+
+
+def comando_api(workers: int, bind: str) -> List[str]:
+    return [sys.executable, '-m', 'gunicorn', '-c', CONFIG_GUNICORN,
+            '--workers', str(workers), '--bind', bind, 'api.main:app']
+
+
+def comando_eventos(bind: str) -> List[str]:
+    return [sys.executable, '-m', 'gunicorn', '-c', CONFIG_EVENTOS, '--bind', bind, 'api.main:app']
+
+
+def comando_ingesta() -> List[str]:
+    return [sys.executable, '-m', 'api.ingest']
+
+
+def desplegar(workers: int, bind: str, bind_eventos: str) -> int:
+    """Lanza ingesta, API y eventos; si uno termina, detiene los demás y devuelve su código"""
+    procesos: Dict[str, subprocess.Popen] = {
+        'ingesta': subprocess.Popen(comando_ingesta(), cwd=RAIZ),
+        'api': subprocess.Popen(comando_api(workers, bind), cwd=RAIZ, env=dict(os.environ, PROCESS_ROLE='api')),
+        'eventos': subprocess.Popen(comando_eventos(bind_eventos), cwd=RAIZ,
+                                    env=dict(os.environ, PROCESS_ROLE='eventos')),
+    }
+    logger.info(f"API ({workers} workers en {bind}) pid {procesos['api'].pid}, eventos en {bind_eventos} "
+                f"pid {procesos['eventos'].pid}, ingesta pid {procesos['ingesta'].pid}")
+
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    signal.signal(signal.SIGINT, lambda *_: parar.set())
+
+    codigo = 0
+    while not parar.is_set():
+        terminados = {nombre: p.returncode for nombre, p in procesos.items() if p.poll() is not None}
+        if terminados:
+            nombre, codigo = next(iter(terminados.items()))
+            logger.error(f"El proceso {nombre} terminó con código {codigo}; deteniendo el despliegue")
+            break
+        parar.wait(1)
+
+    for proceso in procesos.values():
+        if proceso.poll() is None:
+            proceso.terminate()
+    limite = time.monotonic() + float(os.getenv('SHUTDOWN_TIMEOUT', 10)) + 10
+    for proceso in procesos.values():
+        try:
+            proceso.wait(timeout=max(0.0, limite - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+    return codigo
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="API con gunicorn (N workers), SSE con gevent y un proceso de ingesta aparte")
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1)))
+    parser.add_argument('--bind', default=os.getenv('GUNICORN_BIND', '0.0.0.0:5000'))
+    parser.add_argument('--bind-eventos', default=os.getenv('SSE_BIND', '0.0.0.0:5002'))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    sys.exit(desplegar(args.workers, args.bind, args.bind_eventos))
@@ -0,0 +1,179 @@
+import argparse
+import hmac
+import json
+import logging
+import os
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from config.settings import Config
+from api.database import db_manager, sincronizar_datos_iniciales
+from api.models.torres import Torre
+from api.services.notificacion_service import NotificacionService
+from api.utils.arranque import Paso, arranque
+from api.utils.metricas import registro
+from api.utils.perfilador import PerfilEnCurso, colapsado, instalar_senal, muestrear, parametros_consulta
+from api.utils.protocolo_binario import receptor_binario
+from api.utils.sincronizacion import sincronizador
+from api.utils.thread_manager import obtener_gestor_simulacion
+
+logger = logging.getLogger(__name__)
+
+# Servicio de ingesta separado de la API: sincroniza SQLite, simula las torres (con sus
+# lotes de escritura) y evalúa y entrega las alertas, sin Flask ni rutas. Así una
+# consulta pesada del dashboard no frena la ingesta y cada lado se escala y perfila por
+# separado. Expone /ready y /metrics en INGEST_STATUS_PORT, y POST /perfil (con
+# INGEST_ADMIN_TOKEN) para perfilar las torres, que solo corren en este proceso.
+#
+#   python -m api.ingest                 # con los workers de la API: PROCESS_ROLE=api
+
+simulation_manager = obtener_gestor_simulacion()
+
+
+def verificar_conexiones():
+    """Verifica a la vez SQLite, Supabase y Redis; lanza si alguna falla"""
+    resultado = db_manager.verificar_conexiones()
+    fallidas = {nombre: r['error'] for nombre, r in resultado.items() if not r['ok']}
+    if fallidas:
+        raise ConnectionError(f"Conexiones fallidas: {fallidas}")
+    tiempos = ', '.join(f"{nombre} {r['ms']}ms" for nombre, r in resultado.items())
+    logger.info(f"Conexiones a bases de datos verificadas ({tiempos})")
+
+
+def sincronizar():
+    sincronizar_datos_iniciales()
+    if Config.SYNC_INTERVAL > 0:
+        sincronizador.iniciar()
+
+
+def iniciar_simulacion():
+    with db_manager.get_session() as session:
+        if session.query(Torre).count() == 0:
+            logger.warning("No hay torres en la base de datos")
+        else:
+            simulation_manager.iniciar_simulaciones()
+
+
+def iniciar_consumidor():
+    # entrega de alertas del stream (cada proceso es un consumidor del grupo)
+    if Config.ALERT_CONSUMER_ENABLED:
+        NotificacionService.iniciar_consumidor()
+
+
+def iniciar_receptor():
+    # tramas binarias de gateways por TCP/UDP; solo aquí, los workers de la API no abren el puerto
+    if Config.INGEST_BINARY_PORT:
+        receptor_binario.iniciar()
+
+
+def pasos_ingesta() -> List[Paso]:
+    """Pasos de arranque de la ingesta, después de verificar las conexiones"""
+    return [
+        ('sincronizacion', sincronizar),
+        ('simulacion', iniciar_simulacion),
+        ('consumidor', iniciar_consumidor),
+        ('receptor', iniciar_receptor),
+    ]
+
+
+def detener():
+    """Drena las escrituras de la simulación y detiene consumidor y sincronización"""
+    receptor_binario.detener()
+    simulation_manager.detener_simulaciones()
+    NotificacionService.detener_consumidor()
+    sincronizador.detener()
+    logger.info("Ingesta detenida")
+
+
+class _ManejadorEstado(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/ready':
+            estado = arranque.estado()
+            estado['simulacion'] = simulation_manager.estadisticas()
+            estado['receptor_binario'] = receptor_binario.estadisticas
+            self._responder(200 if estado['listo'] else 503, 'application/json',
+                            json.dumps({'data': estado}, default=str))
+        elif self.path == '/metrics':
+            self._responder(200, 'text/plain; version=0.0.4', registro.exportar())
+        else:
+            self._responder(404, 'application/json', json.dumps({'error': 'No encontrado'}))
+
+    def do_POST(self):
+        """POST /perfil?segundos=&hilos=&agrupar=&formato=, los mismos parámetros que /api/admin/perfil"""
+        url = urlsplit(self.path)
+        if url.path != '/perfil':
+            return self._responder(404, 'application/json', json.dumps({'error': 'No encontrado'}))
+        token = self.headers.get('Authorization', '').replace('Bearer ', '', 1)
+        if not Config.INGEST_ADMIN_TOKEN or not hmac.compare_digest(token, Config.INGEST_ADMIN_TOKEN):
+            return self._responder(403, 'application/json', json.dumps({'error': 'Acceso restringido'}))
+
+        consulta = dict(parse_qsl(url.query))
+        try:
+            perfil = muestrear(**parametros_consulta(consulta))
+        except ValueError as e:
+            return self._responder(400, 'application/json', json.dumps({'error': str(e)}))
+        except PerfilEnCurso as e:
+            return self._responder(409, 'application/json', json.dumps({'error': str(e)}))
+        if consulta.get('formato') == 'json':
+            self._responder(200, 'application/json', json.dumps({'data': perfil}))
+        else:
+            self._responder(200, 'text/plain', colapsado(perfil))
+
+    def _responder(self, codigo: int, tipo: str, cuerpo: str):
+        datos = cuerpo.encode()
+        self.send_response(codigo)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def log_message(self, formato, *args):
+        pass  # las sondas de /ready no llenan el log
+
+
+def iniciar_estado(puerto: int) -> Optional[ThreadingHTTPServer]:
+    """Servidor de /ready, /metrics y /perfil de la ingesta (0 = sin servidor)"""
+    if not puerto:
+        return None
+    servidor = ThreadingHTTPServer(('0.0.0.0', puerto), _ManejadorEstado)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True, name='ingesta_estado').start()
+    logger.info(f"Estado de la ingesta en http://0.0.0.0:{servidor.server_address[1]}/ready")
+    return servidor
+
+
+def ejecutar(puerto: int = None):
+    """Arranca la ingesta y bloquea hasta SIGTERM/SIGINT"""
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    signal.signal(signal.SIGINT, lambda *_: parar.set())
+    if Config.PROFILER_SIGNAL:
+        instalar_senal()
+
+    registro.indicador('monitor_simulacion_torres_activas', "Torres con simulación activa",
+                       lambda: simulation_manager.estadisticas()['torres'])
+    servidor = iniciar_estado(Config.INGEST_STATUS_PORT if puerto is None else puerto)
+
+    pasos = [('conexiones', verificar_conexiones)] + pasos_ingesta()
+    if Config.FAST_BOOT:
+        arranque.iniciar_en_segundo_plano(pasos, reintento=Config.BOOT_RETRY_INTERVAL)
+    else:
+        arranque.ejecutar_todos(pasos)
+    logger.info(f"Proceso de ingesta {os.getpid()} en marcha")
+
+    parar.wait()
+    detener()
+    if servidor:
+        servidor.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Servicio de ingesta: sincronización, simulación y alertas sin la API")
+    parser.add_argument('--puerto', type=int, default=None, help="puerto de /ready y /metrics (0 = sin servidor)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    ejecutar(args.puerto)
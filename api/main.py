@@ -1,10 +1,14 @@
 from flask import Flask, g, request, jsonify
-from sqlalchemy import text
 from config.settings import Config
-from api.database import storage_manager, sincronizar_datos_iniciales, db_manager
-from api.models.torres import Torre
-from api.utils.thread_manager import thread_manager
+from api.database import storage_manager, db_manager
+from api.ingest import pasos_ingesta, simulation_manager, verificar_conexiones, detener as detener_ingesta
+from api.utils.sse_hub import hub_eventos
+from api.utils.metricas import instrumentar_app, registro
+from api.utils.trazas import instrumentar_dependencias, instrumentar_trazas
+from api.utils.perfilador import instalar_senal
+from api.utils.arranque import arranque
 import logging
+import threading
 from logging.handlers import RotatingFileHandler
 import atexit
 from flask_cors import CORS 
@@ -15,13 +19,28 @@ from api.routes import(
     estadisticas_bp,
     payments_bp,
     torres_bp,
-    password_bp
+    password_bp,
+    alertas_bp,
+    eventos_bp,
+    admin_bp,
+    ingest_bp
 )
 
 
 logger = logging.getLogger(__name__)
 
-def create_app():
+# modos sin ingesta: la sincronización, la simulación y las alertas van en api.ingest
+MODOS_SIN_INGESTA = ('api', 'eventos')
+
+def create_app(modo: str = None):
+    """
+    modo 'completo' (por defecto, como run.py): API más sincronización, simulación y
+    alertas en el mismo proceso. modo 'api': solo peticiones, sin los flujos SSE; la
+    ingesta corre aparte con python -m api.ingest. modo 'eventos': solo /api/eventos,
+    para servirlo con workers gevent (gunicorn_eventos.conf.py). Sin argumento se usa
+    PROCESS_ROLE.
+    """
+    modo = modo or Config.PROCESS_ROLE
     app = Flask(__name__)
     app.config.from_object(Config)
 
@@ -41,32 +60,56 @@ def create_app():
     # configuracion de logging
     configure_logging(app)
 
-    # inicialización de la base de datos
-    with app.app_context():
-        init_database()
-        sincronizar_datos_iniciales() 
-        # init_services()
+    # tiempos de Supabase/Redis/SQLite por peticion (Server-Timing y peticiones lentas)
+    if Config.TRACING_ENABLED:
+        instrumentar_dependencias(db_manager)
+
+    # inicialización de la base de datos, sincronización y simulación: en serie antes de
+    # atender peticiones o, con FAST_BOOT, en segundo plano (estado en GET /ready)
+    pasos = pasos_arranque(app, modo)
+    if Config.FAST_BOOT:
+        arranque.iniciar_en_segundo_plano(pasos, reintento=Config.BOOT_RETRY_INTERVAL)
+    else:
         try:
-           with db_manager.get_session() as session:
-                if session.query(Torre).count() == 0:
-                    logger.warning("No hay torres en la base de datos")
-                else:
-                    thread_manager.iniciar_simulaciones()
-                        
+            arranque.ejecutar_todos(pasos)
         except Exception as e:
             logger.critical(f"Error durante inicialización: {str(e)}")
             raise
-    
-        # try:
-        #     thread_manager.iniciar_simulaciones()
-        #     app.logger.info("Simulaciones de torres iniciadas")
-        # except Exception as e:
-        #     app.logger.error(f"Error al iniciar simulaciones: {str(e)}")
+
+    # init_services()
+    # try:
+    #     thread_manager.iniciar_simulaciones()
+    #     app.logger.info("Simulaciones de torres iniciadas")
+    # except Exception as e:
+    #     app.logger.error(f"Error al iniciar simulaciones: {str(e)}")
 
 
     # Registrar blueprints (rutas)
-    register_blueprints(app)
+    register_blueprints(app, modo)
+
+    # latencia por ruta y GET /metrics (formato Prometheus)
+    if Config.METRICS_ENABLED:
+        if Config.METRICS_DIR:
+            registro.compartir(Config.METRICS_DIR, Config.METRICS_FLUSH_INTERVAL)
+        instrumentar_app(app)
+        registro.indicador('monitor_simulacion_torres_activas', "Torres con simulación activa",
+                           lambda: simulation_manager.estadisticas()['torres'])
+        registro.indicador('monitor_hilos_activos', "Hilos vivos del proceso", threading.active_count)
 
+    if Config.TRACING_ENABLED:
+        instrumentar_trazas(app)
+
+    # perfil por muestreo con kill -USR2 <pid> (el endpoint es /api/admin/perfil); no en
+    # modo 'api': en gunicorn SIGUSR2 pertenece al master (la ingesta instala la suya)
+    if Config.PROFILER_SIGNAL and modo not in MODOS_SIN_INGESTA:
+        instalar_senal()
+
+
+    @app.route('/ready')
+    def ready():
+        """200 cuando terminó el arranque; 503 con el estado de cada paso mientras tanto"""
+        estado = arranque.estado()
+        return jsonify({"data": estado}), 200 if estado['listo'] else 503
 
     # Manejo de inicio/parada
     # @app.before_request
@@ -87,8 +130,10 @@ def create_app():
     def shutdown_operations():
         """Operaciones al detener la aplicación"""
         try:
-            thread_manager.detener_simulaciones()
-            app.logger.info("Simulaciones de torres detenidas")
+            hub_eventos.detener()
+            if modo not in MODOS_SIN_INGESTA:
+                detener_ingesta()
+                app.logger.info("Simulaciones de torres detenidas")
         except Exception as e:
             app.logger.error(f"Error al detener simulaciones: {str(e)}")
 
@@ -114,31 +159,41 @@ def configure_logging(app):
         app.logger.addHandler(stream_handler)
 
 def init_database():
-    """Inicializa y verifica las conexiones a bases de datos"""
+    """Verifica a la vez las conexiones a SQLite, Supabase y Redis"""
     try:
-        # verificar conexion a SQLite
-        with db_manager.engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        
-        # a Supabase
-        db_manager.supabase.table("torres").select("id_torre").limit(1).execute()
-        
-        # a Redis
-        db_manager.redis.ping()
-        
-        logging.info("Conexiones a bases de datos verificadas")
+        verificar_conexiones()
     except Exception as e:
         logging.error(f"Error en conexiones a bases de datos: {str(e)}")
         raise
 
+def pasos_arranque(app, modo: str):
+    """
+    Pasos de arranque en orden, cada uno dentro del contexto de la app. En los modos
+    'api' y 'eventos' solo se verifican las conexiones: sincronizar SQLite, simular y
+    entregar alertas es trabajo del proceso de ingesta (api.ingest).
+    """
+    def en_contexto(funcion):
+        def ejecutar():
+            with app.app_context():
+                funcion()
+        return ejecutar
+
+    pasos = [('conexiones', init_database)]
+    if modo not in MODOS_SIN_INGESTA:
+        pasos += pasos_ingesta()
+    return [(nombre, en_contexto(funcion)) for nombre, funcion in pasos]
+
 # def init_services():
 #     """Inicializar servicios adicionales"""
 #     # inicializar otros servicios ?
 #     pass
 
-def register_blueprints(app):
-    """Registra los blueprints de la aplicación"""
-    from api.routes import torres_bp, auth_bp, dashboard_bp, estadisticas_bp, payments_bp, password_bp  # importar blueprints
+def register_blueprints(app, modo: str = 'completo'):
+    """
+    Registra los blueprints de la aplicación. Los flujos SSE ocupan su conexión mientras
+    dura: en modo 'api' (workers gthread) no se registran y en modo 'eventos' son lo único.
+    """
+    from api.routes import torres_bp, auth_bp, dashboard_bp, estadisticas_bp, payments_bp, password_bp, alertas_bp, eventos_bp, admin_bp, ingest_bp  # importar blueprints
     
     blueprints = [
         {'bp': torres_bp.torres_bp, 'url_prefix': '/api/torres'},
@@ -146,8 +201,16 @@ def register_blueprints(app):
         {'bp': estadisticas_bp.estadisticas_bp, 'url_prefix': '/api/analytics'},
         {'bp': dashboard_bp.dashboard_bp, 'url_prefix': '/api/dashboard'},
         {'bp': payments_bp.payments_bp, 'url_prefix': '/api/payments'},
-        {'bp': password_bp.password_bp, 'url_prefix': '/api/password'}
+        {'bp': password_bp.password_bp, 'url_prefix': '/api/password'},
+        {'bp': alertas_bp.alertas_bp, 'url_prefix': '/api/alertas'},
+        {'bp': eventos_bp.eventos_bp, 'url_prefix': '/api/eventos'},
+        {'bp': admin_bp.admin_bp, 'url_prefix': '/api/admin'},
+        {'bp': ingest_bp.ingest_bp, 'url_prefix': '/api/ingest'}
     ]
+    if modo == 'api':
+        blueprints = [bp for bp in blueprints if bp['bp'] is not eventos_bp.eventos_bp]
+    elif modo == 'eventos':
+        blueprints = [bp for bp in blueprints if bp['bp'] is eventos_bp.eventos_bp]
 
     for bp in blueprints:
         app.register_blueprint(bp['bp'], url_prefix=bp['url_prefix'])
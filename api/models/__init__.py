@@ -4,12 +4,14 @@ from .diagnostico_tecnico import DiagnosticoTecnico
 from .base import Base
 from .payments import Payment
 from .profiles import Profile
+from .sincronizacion import MarcaSincronizacion
 from .torres import Torre
 
 __all__ = [
     'Base',
     'DatoMeteorologico',
     'DiagnosticoTecnico',
+    'MarcaSincronizacion',
     'Payment',
     'Profile',
     'Torre'
@@ -1,10 +1,11 @@
 # models/datos_meteorologicos.py
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String, Index
 import uuid
 from api.models.base import Base
 
 class DatoMeteorologico(Base):
     __tablename__ = 'datos_meteorologicos'
+    __table_args__ = (Index('ix_datos_meteorologicos_torre_timestamp', 'id_torre', 'timestamp'),)
 
     id_dato = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     id_torre = Column(String, ForeignKey('torres.id_torre'))
@@ -1,11 +1,12 @@
 # models/diagnostico_tecnico.py
-from sqlalchemy import Column, Float, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Float, String, DateTime, ForeignKey, Text, Index
 import uuid
 from api.models.base import Base
 from datetime import datetime
 
 class DiagnosticoTecnico(Base):
     __tablename__ = 'diagnosticos_tecnicos'
+    __table_args__ = (Index('ix_diagnosticos_tecnicos_torre_timestamp', 'id_torre', 'timestamp'),)
 
     id_diagnostico = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     id_torre = Column(String, ForeignKey('torres.id_torre'))
@@ -0,0 +1,13 @@
+# models/sincronizacion.py
+from sqlalchemy import Column, String, Text, Integer, DateTime
+
+from api.models.base import Base
+
+class MarcaSincronizacion(Base):
+    """Marca de agua de la sincronización incremental de cada tabla de Supabase"""
+    __tablename__ = 'sincronizacion_marcas'
+
+    tabla = Column(String, primary_key=True)
+    marca = Column(Text)  # valor remoto tal cual (ISO con zona) de la columna de marca
+    filas = Column(Integer, default=0)  # filas copiadas en la última sincronización
+    actualizado = Column(DateTime)
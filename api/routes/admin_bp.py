@@ -0,0 +1,36 @@
+# api/routes/admin_bp.py
+from flask import Blueprint, Response, jsonify, request
+from api.routes.auth_bp import admin_required
+from api.utils.perfilador import PerfilEnCurso, colapsado, muestrear, parametros_consulta
+
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.route('/perfil', methods=['POST'])
+@admin_required
+def perfilar():
+    """
+    Muestrea las pilas de todos los hilos del proceso durante ?segundos= (por defecto 10).
+    ?hilos= filtra por nombre de hilo (regex), ?agrupar=1 junta los torre_sim_<id> en uno
+    y ?formato=json devuelve el conteo con el resumen del muestreo; por defecto texto
+    colapsado para flamegraph.pl o speedscope.
+
+    Perfila el worker de la API que atiende la petición. Las torres (torre_sim_*) corren
+    en el proceso de ingesta: se perfilan con POST /perfil en INGEST_STATUS_PORT.
+    """
+    try:
+        try:
+            parametros = parametros_consulta(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        perfil = muestrear(**parametros)
+        if request.args.get('formato') == 'json':
+            return jsonify({"data": perfil})
+        return Response(colapsado(perfil), mimetype='text/plain', headers={
+            'X-Perfil-Muestras': str(perfil['muestras']),
+            'X-Perfil-Coste-Muestra-Ms': str(perfil['coste_muestra_ms'])
+        })
+    except PerfilEnCurso as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,67 @@
+# api/routes/alertas_bp.py
+from flask import Blueprint, jsonify, request
+from api.services import alerta_service, notificacion_service
+from api.routes.auth_bp import es_admin, jwt_required
+
+alertas_bp = Blueprint('alertas', __name__)
+
+@alertas_bp.route('/reglas', methods=['GET'])
+@jwt_required
+def listar_reglas():
+    """Reglas de alerta efectivas (por defecto y guardadas)"""
+    try:
+        reglas = alerta_service.AlertaService.obtener_reglas()
+        return jsonify({"data": [dict(r.a_dict(), clave=r.clave) for r in reglas]})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@alertas_bp.route('/reglas', methods=['PUT'])
+@jwt_required
+def guardar_regla():
+    """
+    Crea o reemplaza una regla: global (solo ADMIN_EMAILS), del propio usuario o de una
+    torre asignada al usuario.
+    """
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "Datos no proporcionados"}), 400
+        regla = alerta_service.ReglaAlerta.desde_dict(data)
+        if not alerta_service.AlertaService.puede_modificar(regla, request.supabase_user.user.id, es_admin()):
+            return jsonify({"error": "No autorizado"}), 403
+        regla = alerta_service.AlertaService.guardar_regla(data)
+        return jsonify({"data": dict(regla.a_dict(), clave=regla.clave)})
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@alertas_bp.route('/reglas/<clave>', methods=['DELETE'])
+@jwt_required
+def eliminar_regla(clave):
+    """Elimina una regla guardada, con los mismos permisos que para guardarla"""
+    try:
+        regla = alerta_service.AlertaService.obtener_regla_guardada(clave)
+        if regla is None:
+            return jsonify({"error": "Regla no encontrada"}), 404
+        if not alerta_service.AlertaService.puede_modificar(regla, request.supabase_user.user.id, es_admin()):
+            return jsonify({"error": "No autorizado"}), 403
+        if not alerta_service.AlertaService.eliminar_regla(clave):
+            return jsonify({"error": "Regla no encontrada"}), 404
+        return jsonify({"data": {"clave": clave}})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@alertas_bp.route('/notificaciones/<usuario_id>', methods=['GET'])
+@jwt_required
+def notificaciones_usuario(usuario_id):
+    """Últimas notificaciones de alerta entregadas a un usuario (el propio usuario o ADMIN_EMAILS)"""
+    try:
+        if request.supabase_user.user.id != usuario_id and not es_admin():
+            return jsonify({"error": "No autorizado"}), 403
+
+        limite = request.args.get('limite', default=50, type=int)
+        notificaciones = notificacion_service.NotificacionService.obtener_notificaciones(usuario_id, limite)
+        return jsonify({"data": notificaciones})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
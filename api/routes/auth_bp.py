@@ -3,9 +3,23 @@ from api.database import db_manager
 from api.services.auth_service import AuthService
 from functools import wraps
 from datetime import datetime
+from config.settings import Config
 
 auth_bp = Blueprint('auth', __name__)
 
+def _autenticar(token):
+    """Valida el token con Supabase y adjunta el usuario a la petición; devuelve un error o None"""
+    try:
+        user = db_manager.supabase.auth.get_user(token)
+        if not user:
+            return jsonify({"error": "Token inválido"}), 401
+    except Exception as e:
+        return jsonify({"error": str(e)}), 401
+
+    #  adjuntar el usuario ?
+    request.supabase_user = user
+    return None
+
 def jwt_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -18,17 +32,42 @@ def jwt_required(f):
         if len(parts) != 2 or parts[0].lower() != 'bearer':
             return jsonify({"error": "Formato de token inválido"}), 401
 
-        token = parts[1]
+        error = _autenticar(parts[1])
+        if error:
+            return error
+        return f(*args, **kwargs)
+    return decorated
 
-        try:
-            user = db_manager.supabase.auth.get_user(token)
-            if not user:
-                return jsonify({"error": "Token inválido"}), 401
-        except Exception as e:
-            return jsonify({"error": str(e)}), 401
+def jwt_required_sse(f):
+    """Como jwt_required, pero acepta también ?token= (EventSource no permite cabeceras)"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        auth_header = request.headers.get('Authorization', '')
+        parts = auth_header.split()
+        if len(parts) == 2 and parts[0].lower() == 'bearer':
+            token = parts[1]
+        else:
+            token = request.args.get('token')
+        if not token:
+            return jsonify({"error": "Token faltante"}), 401
 
-        #  adjuntar el usuario ?
-        request.supabase_user = user
+        error = _autenticar(token)
+        if error:
+            return error
+        return f(*args, **kwargs)
+    return decorated
+
+def es_admin() -> bool:
+    """Si el usuario autenticado en la petición está en ADMIN_EMAILS"""
+    return (request.supabase_user.user.email or '').lower() in Config.ADMIN_EMAILS
+
+def admin_required(f):
+    """jwt_required y además el correo del usuario en ADMIN_EMAILS"""
+    @wraps(f)
+    @jwt_required
+    def decorated(*args, **kwargs):
+        if not es_admin():
+            return jsonify({"error": "No autorizado"}), 403
         return f(*args, **kwargs)
     return decorated
 
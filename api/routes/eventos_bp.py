@@ -0,0 +1,40 @@
+# api/routes/eventos_bp.py
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from api.services import torre_service
+from api.routes.auth_bp import jwt_required, jwt_required_sse
+from api.utils.sse_hub import hub_eventos, flujo_cliente
+
+eventos_bp = Blueprint('eventos', __name__)
+
+@eventos_bp.route('/usuario/<usuario_id>', methods=['GET'])
+@jwt_required_sse
+def eventos_usuario(usuario_id):
+    """
+    Flujo SSE con las lecturas (solo campos que cambian), alertas y cambios de las torres
+    del usuario. Reanuda desde Last-Event-ID (cabecera o ?last_event_id=).
+    """
+    try:
+        if request.supabase_user.user.id != usuario_id:
+            return jsonify({"error": "No autorizado"}), 403
+
+        torres = torre_service.TorreService.obtener_por_usuario(usuario_id)
+        cliente = hub_eventos.conectar(usuario_id, [t['id_torre'] for t in torres])
+        ultimo_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        pendientes = hub_eventos.pendientes_desde(usuario_id, ultimo_id)
+
+        return Response(
+            stream_with_context(flujo_cliente(hub_eventos, cliente, pendientes)),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'  # sin buffer en nginx
+            }
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@eventos_bp.route('/estado', methods=['GET'])
+@jwt_required
+def estado_hub():
+    """Clientes conectados y eventos repartidos por el hub de este proceso"""
+    return jsonify({"data": hub_eventos.estado()})
@@ -0,0 +1,81 @@
+# api/routes/ingest_bp.py
+from flask import Blueprint, jsonify, request
+from config.settings import Config
+from api.routes.auth_bp import es_admin, jwt_required
+from api.services.ingesta_service import CuerpoDemasiadoGrande, IngestaService
+from api.utils.protocolo_binario import TramaInvalida, decodificar
+
+ingest_bp = Blueprint('ingest', __name__)
+
+@ingest_bp.route('', methods=['POST'])
+@jwt_required
+def ingerir():
+    """
+    Lote NDJSON (opcionalmente con Content-Encoding: gzip) de lecturas y diagnósticos de
+    varias torres: una línea por registro, con "tipo": "meteorologico" | "diagnostico"
+    o deducido de sus campos. Solo se aceptan torres asignadas al usuario (todas para
+    ADMIN_EMAILS). Responde con los conteos y el motivo de cada línea rechazada.
+    """
+    try:
+        if request.content_length and request.content_length > Config.INGEST_MAX_BYTES:
+            return jsonify({"error": f"El lote supera {Config.INGEST_MAX_BYTES} bytes"}), 413
+
+        cuerpo = request.get_data(cache=False)
+        if request.headers.get('Content-Encoding', '').lower() == 'gzip' or cuerpo[:2] == b'\x1f\x8b':
+            cuerpo = IngestaService.descomprimir(cuerpo)
+        elif len(cuerpo) > Config.INGEST_MAX_BYTES:
+            return jsonify({"error": f"El lote supera {Config.INGEST_MAX_BYTES} bytes"}), 413
+
+        lineas, rechazos = IngestaService.leer_ndjson(cuerpo)
+        if not lineas and not rechazos:
+            return jsonify({"error": "Lote vacío"}), 400
+
+        usuario_id = request.supabase_user.user.id
+        permitidas = IngestaService.torres_permitidas(usuario_id, es_admin(), IngestaService.ids_torre(lineas))
+        resultado = IngestaService.ingerir(lineas, permitidas)
+
+        if rechazos:
+            resultado['rechazadas'] += len(rechazos)
+            resultado['rechazos'] = sorted(
+                resultado['rechazos'] + [{'linea': n, 'error': motivo} for n, motivo in rechazos],
+                key=lambda r: r['linea']
+            )
+        resultado['lineas'] = resultado['aceptadas'] + resultado['rechazadas']
+        return jsonify({"data": resultado})
+    except CuerpoDemasiadoGrande as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@ingest_bp.route('/binario', methods=['POST'])
+@jwt_required
+def ingerir_binario():
+    """
+    Tramas del protocolo binario (api/utils/protocolo_binario.py), una o más seguidas,
+    para gateways con poco ancho de banda. Mismas reglas y respuesta que el lote NDJSON;
+    "linea" es el número de registro dentro del cuerpo.
+    """
+    try:
+        if request.content_length and request.content_length > Config.INGEST_MAX_BYTES:
+            return jsonify({"error": f"El lote supera {Config.INGEST_MAX_BYTES} bytes"}), 413
+
+        cuerpo = request.get_data(cache=False)
+        if len(cuerpo) > Config.INGEST_MAX_BYTES:
+            return jsonify({"error": f"El lote supera {Config.INGEST_MAX_BYTES} bytes"}), 413
+
+        registros, tramas = decodificar(cuerpo)
+        if not registros:
+            return jsonify({"error": "Lote vacío"}), 400
+
+        usuario_id = request.supabase_user.user.id
+        permitidas = IngestaService.torres_permitidas(usuario_id, es_admin(), IngestaService.ids_torre(registros))
+        resultado = IngestaService.ingerir(registros, permitidas)
+        resultado['lineas'] = len(registros)
+        resultado['tramas'] = tramas
+        return jsonify({"data": resultado})
+    except TramaInvalida as e:
+        return jsonify({"error": f"Trama inválida: {str(e)}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
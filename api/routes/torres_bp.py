@@ -121,6 +121,38 @@ def actualizar_estado(id_torre):
         return jsonify({"error": str(e)}), 500
     
 
+@torres_bp.route('/simulacion/estadisticas', methods=['GET'])
+@jwt_required
+def estadisticas_simulacion():
+    """Histograma de ticks y esperas de los limitadores de escritura del motor activo"""
+    try:
+        from api.utils.thread_manager import obtener_gestor_simulacion
+
+        return jsonify({"data": obtener_gestor_simulacion().estadisticas()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@torres_bp.route('/<id_torre>/simulacion/pausar', methods=['POST'])
+@jwt_required
+def pausar_simulacion(id_torre):
+    """Pausa la simulación de una torre sin cambiar su estado"""
+    try:
+        resultado = torre_service.TorreService.pausar_simulacion(id_torre)
+        return jsonify({"data": resultado})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@torres_bp.route('/<id_torre>/simulacion/reanudar', methods=['POST'])
+@jwt_required
+def reanudar_simulacion(id_torre):
+    """Reanuda la simulación de una torre pausada"""
+    try:
+        resultado = torre_service.TorreService.reanudar_simulacion(id_torre)
+        return jsonify({"data": resultado})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @torres_bp.route('/<id_torre>', methods=['PUT'])
 def actualizar_torre(id_torre):
     """Actualiza una torre existente"""
@@ -0,0 +1,79 @@
+from typing import List, Dict, Optional
+from api.database import db_manager
+from api.utils.alertas import ReglaAlerta, REGLAS_POR_DEFECTO
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# hash Redis con las reglas guardadas (clave de la regla -> JSON) y contador de version
+CLAVE_REGLAS = 'alertas:reglas'
+CLAVE_VERSION_REGLAS = 'alertas:reglas:version'
+
+class AlertaService:
+    @staticmethod
+    def obtener_reglas() -> List[ReglaAlerta]:
+        """Reglas por defecto combinadas con las guardadas (las guardadas reemplazan por clave)"""
+        try:
+            reglas = {regla.clave: regla for regla in REGLAS_POR_DEFECTO}
+            for valor in db_manager.redis.hvals(CLAVE_REGLAS):
+                regla = ReglaAlerta.desde_dict(json.loads(valor))
+                reglas[regla.clave] = regla
+            return list(reglas.values())
+        except Exception as e:
+            logger.error(f"Error obteniendo reglas de alerta: {str(e)}")
+            raise
+
+    @staticmethod
+    def guardar_regla(datos: Dict) -> ReglaAlerta:
+        """Crea o reemplaza una regla; los motores la aplican en su próxima recarga"""
+        regla = ReglaAlerta.desde_dict(datos)
+        try:
+            pipe = db_manager.redis.pipeline()
+            pipe.hset(CLAVE_REGLAS, regla.clave, json.dumps(regla.a_dict()))
+            pipe.incr(CLAVE_VERSION_REGLAS)
+            pipe.execute()
+            return regla
+        except Exception as e:
+            logger.error(f"Error guardando regla {regla.clave}: {str(e)}")
+            raise
+
+    @staticmethod
+    def obtener_regla_guardada(clave: str) -> Optional[ReglaAlerta]:
+        valor = db_manager.redis.hget(CLAVE_REGLAS, clave)
+        return ReglaAlerta.desde_dict(json.loads(valor)) if valor else None
+
+    @staticmethod
+    def puede_modificar(regla: ReglaAlerta, usuario_id: str, admin: bool = False) -> bool:
+        """
+        Las reglas globales solo las modifican administradores; las de usuario, el propio
+        usuario, y las de torre, el usuario asignado a la torre.
+        """
+        if admin:
+            return True
+        if not regla.id_torre and not regla.usuario:
+            return False
+        if regla.usuario and regla.usuario != usuario_id:
+            return False
+        if regla.id_torre:
+            respuesta = db_manager.supabase.table('torres').select('usuario_asignado').eq('id_torre', regla.id_torre).execute()
+            if not respuesta.data or respuesta.data[0].get('usuario_asignado') != usuario_id:
+                return False
+        return True
+
+    @staticmethod
+    def eliminar_regla(clave: str) -> bool:
+        """Elimina una regla guardada (las reglas por defecto vuelven a su valor original)"""
+        try:
+            pipe = db_manager.redis.pipeline()
+            pipe.hdel(CLAVE_REGLAS, clave)
+            pipe.incr(CLAVE_VERSION_REGLAS)
+            eliminadas, _ = pipe.execute()
+            return bool(eliminadas)
+        except Exception as e:
+            logger.error(f"Error eliminando regla {clave}: {str(e)}")
+            raise
+
+    @staticmethod
+    def version_reglas() -> int:
+        return int(db_manager.redis.get(CLAVE_VERSION_REGLAS) or 0)
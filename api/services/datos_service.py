@@ -1,6 +1,8 @@
 # api/services/datos_service.py
 from api.database import storage_manager, db_manager
 from api.models.datos_meteorologicos import DatoMeteorologico
+from api.utils.codec_redis import decodificar
+from api.utils.metricas import instrumentar_servicio
 from sqlalchemy.orm import Session
 from typing import Dict, List, Optional, Union
 from datetime import datetime, timedelta
@@ -11,6 +13,7 @@ from sqlalchemy import func
 logger = logging.getLogger(__name__)
 
 # api/services/datos_service.py
+@instrumentar_servicio
 class DatosService:
     @staticmethod
     def obtener_ultimos(id_torre: str, horas: int = 24) -> List[Dict]:
@@ -20,7 +23,7 @@ class DatosService:
             redis_key = f"torre:{id_torre}:last_data"
             cached_data = db_manager.redis.get(redis_key)
             if cached_data:
-                return [json.loads(cached_data)]
+                return [decodificar(cached_data)]
 
             # 2.consultar Supabase (datos historicos)
             response = db_manager.supabase.table('datos_meteorologicos').select('*').eq('id_torre', id_torre) \
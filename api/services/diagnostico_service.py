@@ -1,5 +1,6 @@
 from api.database import db_manager
 from api.models.diagnostico_tecnico import DiagnosticoTecnico
+from api.utils.metricas import instrumentar_servicio
 from sqlalchemy.orm import Session
 from typing import Dict, List, Optional
 import uuid
@@ -9,6 +10,7 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+@instrumentar_servicio
 class DiagnosticoService:
     @staticmethod
     def obtener_ultimo(id_torre: str) -> Optional[Dict]:
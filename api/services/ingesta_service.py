@@ -0,0 +1,158 @@
+# api/services/ingesta_service.py
+import json
+import logging
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config.settings import Config
+from api.database import db_manager, storage_manager
+from api.models.datos_meteorologicos import DatoMeteorologico
+from api.models.diagnostico_tecnico import DiagnosticoTecnico
+from api.utils.metricas import instrumentar_servicio
+from api.utils.sincronizacion import paginas_keyset
+from api.utils.validacion import tipo_registro, validar_lote
+
+logger = logging.getLogger(__name__)
+
+MODELOS = {'meteorologico': DatoMeteorologico, 'diagnostico': DiagnosticoTecnico}
+
+# (número de línea, registro) y (número de línea, motivo del rechazo); líneas desde 1
+Lineas = List[Tuple[int, Dict]]
+Rechazos = List[Tuple[int, str]]
+
+
+class CuerpoDemasiadoGrande(ValueError):
+    pass
+
+
+@instrumentar_servicio
+class IngestaService:
+    @staticmethod
+    def descomprimir(cuerpo: bytes, limite: int = None) -> bytes:
+        """gzip con límite sobre el tamaño descomprimido (no se expande más de `limite` bytes)"""
+        limite = limite or Config.INGEST_MAX_BYTES
+        descompresor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        try:
+            datos = descompresor.decompress(cuerpo, limite + 1)
+        except zlib.error as e:
+            raise ValueError(f"gzip inválido: {str(e)}")
+        if len(datos) > limite or descompresor.unconsumed_tail:
+            raise CuerpoDemasiadoGrande(f"El lote descomprimido supera {limite} bytes")
+        return datos
+
+    @staticmethod
+    def leer_ndjson(datos: bytes) -> Tuple[Lineas, Rechazos]:
+        """Un objeto JSON por línea; las líneas vacías se ignoran"""
+        registros, rechazos = [], []
+        for numero, linea in enumerate(datos.split(b'\n'), start=1):
+            if not linea.strip():
+                continue
+            try:
+                registro = json.loads(linea)
+            except ValueError as e:
+                rechazos.append((numero, f"JSON inválido: {str(e)}"))
+                continue
+            if not isinstance(registro, dict):
+                rechazos.append((numero, "La línea no es un objeto JSON"))
+                continue
+            registros.append((numero, registro))
+        return registros, rechazos
+
+    @staticmethod
+    def ids_torre(lineas: Lineas) -> Set[str]:
+        return {r['id_torre'] for _, r in lineas if isinstance(r.get('id_torre'), str) and r['id_torre']}
+
+    @staticmethod
+    def torres_permitidas(usuario_id: Optional[str], admin: bool, ids: Iterable[str]) -> Set[str]:
+        """
+        De las torres `ids` (las del lote), las que existen y están asignadas al usuario (o
+        todas las existentes para administradores). Se consultan solo esas, en bloques de
+        200 y paginadas por keyset, así que el límite de filas de PostgREST no trunca la
+        respuesta en flotas grandes.
+        """
+        ids = sorted(ids)
+        permitidas = set()
+        for inicio in range(0, len(ids), 200):
+            def consulta(bloque=ids[inicio:inicio + 200]):
+                consulta = db_manager.supabase.table('torres').select('id_torre').in_('id_torre', bloque)
+                return consulta if admin else consulta.eq('usuario_asignado', usuario_id)
+
+            for filas in paginas_keyset(consulta, 'id_torre'):
+                permitidas.update(fila['id_torre'] for fila in filas)
+        return permitidas
+
+    @staticmethod
+    def ya_almacenados(tipo: str, registros: List[Dict]) -> Set[Tuple[str, datetime]]:
+        """Pares (id_torre, timestamp) del lote que ya están en SQLite (reintentos del gateway)"""
+        if not registros:
+            return set()
+        modelo = MODELOS[tipo]
+        fechas = [datetime.fromisoformat(r['timestamp']) for r in registros]
+        torres = sorted({r['id_torre'] for r in registros})
+
+        existentes = set()
+        with db_manager.get_session() as session:
+            # índice (id_torre, timestamp); las torres en bloques para no exceder las variables de SQLite
+            for inicio in range(0, len(torres), 500):
+                filas = session.query(modelo.id_torre, modelo.timestamp).filter(
+                    modelo.id_torre.in_(torres[inicio:inicio + 500]),
+                    modelo.timestamp >= min(fechas),
+                    modelo.timestamp <= max(fechas)
+                ).all()
+                existentes.update((fila[0], fila[1]) for fila in filas)
+        return existentes
+
+    @staticmethod
+    def ingerir(lineas: Lineas, torres_permitidas: Optional[Set[str]] = None) -> Dict:
+        """
+        Valida por tipo, descarta lo ya almacenado y guarda con save_lote en bloques de
+        INGEST_BATCH_SIZE. Devuelve los conteos y el motivo de cada línea rechazada.
+        """
+        por_tipo = defaultdict(list)
+        for numero, registro in lineas:
+            por_tipo[tipo_registro(registro)].append((numero, registro))
+
+        resumen = {'aceptadas': 0, 'rechazadas': 0, 'por_tipo': {}, 'rechazos': [], 'almacenamiento': {}}
+        for tipo, grupo in por_tipo.items():
+            numeros = [numero for numero, _ in grupo]
+            aceptados, rechazados = validar_lote(tipo, [r for _, r in grupo], torres_permitidas)
+            rechazos = [(numeros[i], motivo) for i, motivo in rechazados]
+
+            if tipo in MODELOS and aceptados:
+                existentes = IngestaService.ya_almacenados(tipo, [r for _, r in aceptados])
+                nuevos = []
+                for i, registro in aceptados:
+                    if (registro['id_torre'], datetime.fromisoformat(registro['timestamp'])) in existentes:
+                        rechazos.append((numeros[i], "duplicado (id_torre, timestamp) ya almacenado"))
+                    else:
+                        nuevos.append(registro)
+                resumen['almacenamiento'][tipo] = IngestaService.guardar(tipo, nuevos)
+            else:
+                nuevos = []
+
+            resumen['por_tipo'][tipo] = {'aceptadas': len(nuevos), 'rechazadas': len(rechazos)}
+            resumen['aceptadas'] += len(nuevos)
+            resumen['rechazadas'] += len(rechazos)
+            resumen['rechazos'].extend(rechazos)
+
+        resumen['rechazos'] = [{'linea': numero, 'error': motivo} for numero, motivo in sorted(resumen['rechazos'])]
+        return resumen
+
+    @staticmethod
+    def guardar(tipo: str, registros: List[Dict]) -> Dict:
+        """save_lote por bloques; registros guardados por destino"""
+        guardados = {'supabase': 0, 'sqlite': 0, 'redis': 0}
+        errores = []
+        for inicio in range(0, len(registros), Config.INGEST_BATCH_SIZE):
+            bloque = registros[inicio:inicio + Config.INGEST_BATCH_SIZE]
+            resultado = storage_manager.save_lote(tipo, bloque)
+            for destino, estado in resultado.items():
+                if estado.get('success'):
+                    guardados[destino] += estado.get('count', 0)
+                else:
+                    errores.append(f"{destino}: {estado.get('error')}")
+        if errores:
+            logger.error(f"Ingesta de {tipo} con errores de almacenamiento: {errores[:3]}")
+        return {'guardados': guardados, 'errores': errores}
@@ -1,6 +1,17 @@
 # api/services/notificacion_service.py
-from typing import List
+from typing import List, Dict, Optional
+from api.database import db_manager
 from api.models.diagnostico_tecnico import DiagnosticoTecnico
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# lista Redis con las notificaciones recientes de cada usuario (y canal con el mismo nombre)
+PREFIJO_NOTIFICACIONES = 'notificaciones:'
+MAX_NOTIFICACIONES_USUARIO = 200
+
+_consumidor = None
 
 class NotificacionService:
     @staticmethod
@@ -19,4 +30,68 @@ class NotificacionService:
                     'mensaje': f'Alerta en torre {diag.id_torre}',
                     'timestamp': diag.timestamp
                 })
-        return alertas
\ No newline at end of file
+        return alertas
+
+    @staticmethod
+    def procesar_alertas(mensajes: List[Dict]):
+        """
+        Entrega un lote de alertas del stream: guarda una notificación por mensaje en la
+        lista del usuario de la torre y la publica para los clientes conectados, todo en
+        un único pipeline. Si falla, el lote no se confirma y se reintenta.
+        """
+        sin_usuario = {m['id_torre'] for m in mensajes if not m.get('usuario')}
+        usuarios = {}
+        if sin_usuario:
+            response = db_manager.supabase.table('torres') \
+                .select('id_torre, usuario_asignado') \
+                .in_('id_torre', list(sin_usuario)) \
+                .execute()
+            usuarios = {t['id_torre']: t['usuario_asignado'] for t in response.data}
+
+        pipe = db_manager.redis.pipeline(transaction=False)
+        for mensaje in mensajes:
+            usuario = mensaje.get('usuario') or usuarios.get(mensaje['id_torre'])
+            if not usuario:
+                continue
+            notificacion = json.dumps({
+                'id_torre': mensaje['id_torre'],
+                'timestamp': mensaje.get('timestamp'),
+                'alertas': mensaje.get('alertas', []),
+                'resueltas': mensaje.get('resueltas', []),
+                'activas': mensaje.get('activas', [])
+            })
+            clave = f"{PREFIJO_NOTIFICACIONES}{usuario}"
+            pipe.lpush(clave, notificacion)
+            pipe.ltrim(clave, 0, MAX_NOTIFICACIONES_USUARIO - 1)
+            pipe.publish(clave, notificacion)
+        pipe.execute()
+
+    @staticmethod
+    def obtener_notificaciones(usuario_id: str, limite: int = 50) -> List[Dict]:
+        """Notificaciones más recientes de un usuario"""
+        try:
+            valores = db_manager.redis.lrange(f"{PREFIJO_NOTIFICACIONES}{usuario_id}", 0, limite - 1)
+            return [json.loads(v) for v in valores]
+        except Exception as e:
+            logger.error(f"Error obteniendo notificaciones de {usuario_id}: {str(e)}")
+            raise
+
+    @staticmethod
+    def iniciar_consumidor(consumidor: Optional[str] = None):
+        """Arranca el consumidor del stream de alertas de este proceso (grupo notificaciones)"""
+        global _consumidor
+        from api.utils.bus_alertas import ConsumidorAlertas
+
+        if _consumidor is None:
+            _consumidor = ConsumidorAlertas(
+                db_manager.redis,
+                NotificacionService.procesar_alertas,
+                consumidor=consumidor
+            )
+        _consumidor.iniciar()
+        return _consumidor
+
+    @staticmethod
+    def detener_consumidor():
+        if _consumidor:
+            _consumidor.detener()
@@ -1,11 +1,21 @@
 from typing import List, Optional, Dict
 from api.database import db_manager
 from api.models.torres import Torre
+from api.utils.metricas import instrumentar_servicio
+from api.utils.sincronizacion import paginas_keyset
 from datetime import datetime
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# canal Redis con los cambios de estado/asignacion de torres
+CANAL_CAMBIOS_TORRES = 'torres:cambios'
+# canal y conjunto Redis para pausar/reanudar la simulacion de torres
+CANAL_CONTROL_SIMULACION = 'sim:control'
+CLAVE_TORRES_PAUSADAS = 'sim:pausadas'
+
+@instrumentar_servicio
 class TorreService:
     @staticmethod
     def obtener_todas() -> List[Dict]:
@@ -40,6 +50,38 @@ class TorreService:
             logger.error(f"Error obteniendo torres para usuario {usuario_id}: {str(e)}")
             raise
 
+    @staticmethod
+    def obtener_estados(desde: Optional[str] = None) -> List[Dict]:
+        """
+        Columnas mínimas para reconciliar la simulación (opcionalmente solo las modificadas
+        desde una fecha), paginadas por id_torre para no quedar truncadas por el límite de
+        filas de PostgREST.
+        """
+        def consulta():
+            query = db_manager.supabase.table('torres').select('id_torre, estado, usuario_asignado, ultima_actualizacion')
+            return query.gte('ultima_actualizacion', desde) if desde else query
+
+        try:
+            return [torre for pagina in paginas_keyset(consulta, 'id_torre') for torre in pagina]
+        except Exception as e:
+            logger.error(f"Error obteniendo estados de torres: {str(e)}")
+            raise
+
+    @staticmethod
+    def _notificar_cambio(torre: Optional[Dict]):
+        """Publica el cambio para que los procesos de simulación lo apliquen sin esperar"""
+        if not torre:
+            return
+        try:
+            db_manager.redis.publish(CANAL_CAMBIOS_TORRES, json.dumps({
+                'id_torre': torre['id_torre'],
+                'estado': torre.get('estado'),
+                'usuario_asignado': torre.get('usuario_asignado')
+            }))
+        except Exception as e:
+            # el diff periodico del reconciliador lo recoge igualmente
+            logger.warning(f"No se pudo notificar el cambio de la torre {torre.get('id_torre')}: {str(e)}")
+
     @staticmethod
     def crear_torre(torre_data: Dict) -> Dict:
         """Crea una nueva torre con validación"""
@@ -70,7 +112,9 @@ class TorreService:
                     'ultima_actualizacion': datetime.utcnow().isoformat()
                 }).eq('id_torre', id_torre).execute()
 
-            return response.data[0] if response.data else None
+            torre = response.data[0] if response.data else None
+            TorreService._notificar_cambio(torre)
+            return torre
         except Exception as e:
             logger.error(f"Error actualizando torre {id_torre}: {str(e)}")
             raise
@@ -89,8 +133,35 @@ class TorreService:
                 
             if not response.data:
                 raise ValueError("Torre no encontrada")
-                
+
+            TorreService._notificar_cambio(response.data[0])
             return response.data[0]
         except Exception as e:
             logger.error(f"Error actualizando torre {id_torre}: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    @staticmethod
+    def pausar_simulacion(id_torre: str) -> Dict:
+        """Pausa la simulación de una torre en el proceso que la esté ejecutando"""
+        return TorreService._controlar_simulacion(id_torre, 'pausar')
+
+    @staticmethod
+    def reanudar_simulacion(id_torre: str) -> Dict:
+        """Reanuda la simulación de una torre pausada"""
+        return TorreService._controlar_simulacion(id_torre, 'reanudar')
+
+    @staticmethod
+    def _controlar_simulacion(id_torre: str, accion: str) -> Dict:
+        try:
+            pipe = db_manager.redis.pipeline(transaction=False)
+            # el conjunto persiste la pausa para procesos que tomen la torre mas tarde
+            if accion == 'pausar':
+                pipe.sadd(CLAVE_TORRES_PAUSADAS, id_torre)
+            else:
+                pipe.srem(CLAVE_TORRES_PAUSADAS, id_torre)
+            pipe.publish(CANAL_CONTROL_SIMULACION, json.dumps({'id_torre': id_torre, 'accion': accion}))
+            pipe.execute()
+            return {'id_torre': id_torre, 'simulacion': 'pausada' if accion == 'pausar' else 'activa'}
+        except Exception as e:
+            logger.error(f"Error controlando simulación de torre {id_torre}: {str(e)}")
+            raise
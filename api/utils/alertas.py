@@ -0,0 +1,549 @@
+import logging
+import operator
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config.settings import Config
+from api.utils.simulator import ESTADOS_GENERALES
+
+logger = logging.getLogger(__name__)
+
+# umbrales de las reglas de alerta por defecto
+UMBRALES_ALERTA = {
+    'temperatura_alta': 35,
+    'temperatura_baja': 5,
+    'humedad_alta': 90,
+    'bateria_baja': 20
+}
+
+def evaluar_alertas(datos: Dict, diagnostico: Dict, umbrales: Dict = UMBRALES_ALERTA) -> List[str]:
+    """Evalúa una lectura y su diagnóstico contra los umbrales y devuelve los mensajes de alerta"""
+    alertas = []
+
+    # Alertas meteorológicas
+    temp = datos.get('temperatura')
+    if temp > umbrales['temperatura_alta']:
+        alertas.append(f"Temperatura alta: {temp}°C")
+    elif temp < umbrales['temperatura_baja']:
+        alertas.append(f"Temperatura baja: {temp}°C")
+
+    if datos.get('humedad_relativa', 0) > umbrales['humedad_alta']:
+        alertas.append(f"Humedad alta: {datos['humedad_relativa']}%")
+
+    # Alertas técnicas
+    if diagnostico.get('nivel_bateria', 100) < umbrales['bateria_baja']:
+        alertas.append(f"Batería crítica: {diagnostico['nivel_bateria']}%")
+
+    if diagnostico.get('estado_general') == 'Crítico':
+        alertas.append("Estado CRÍTICO de la torre")
+
+    return alertas
+
+
+# motor de reglas compilado
+
+OPERADORES = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+}
+
+# mismas comparaciones sin NumPy, para evaluar lecturas sueltas
+OPERADORES_ESCALARES = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+}
+
+CAMPOS_REGLA = (
+    'temperatura', 'humedad_relativa', 'presion_atmosferica', 'velocidad_viento',
+    'direccion_viento', 'precipitacion', 'radiacion_solar', 'indice_uv',
+    'nivel_bateria', 'estado_general',
+)
+
+
+_CODIGOS_ESTADO = {estado: float(i) for i, estado in enumerate(ESTADOS_GENERALES.tolist())}
+
+def _codigo_estado(valor) -> float:
+    """estado_general como código numérico (mismo orden que ESTADOS_GENERALES)"""
+    if isinstance(valor, str):
+        return _CODIGOS_ESTADO.get(valor, np.nan)
+    return np.nan if valor is None else float(valor)
+
+
+@dataclass
+class ReglaAlerta:
+    """
+    Regla de alerta guardada como datos. Sin id_torre ni usuario es global; con usuario
+    aplica a las torres asignadas a ese usuario y con id_torre a una sola torre (la regla
+    más específica con el mismo nombre reemplaza a las demás).
+
+    histeresis: una alerta activa solo se resuelve al cruzar umbral ∓ histeresis.
+    duracion: segundos que la condición debe mantenerse antes de disparar la alerta.
+    """
+    nombre: str
+    campo: str
+    operador: str
+    umbral: Any
+    mensaje: str
+    histeresis: float = 0.0
+    duracion: float = 0.0
+    id_torre: Optional[str] = None
+    usuario: Optional[str] = None
+    habilitada: bool = True
+
+    @property
+    def clave(self) -> str:
+        if self.id_torre:
+            return f"{self.nombre}@torre:{self.id_torre}"
+        if self.usuario:
+            return f"{self.nombre}@usuario:{self.usuario}"
+        return self.nombre
+
+    @classmethod
+    def desde_dict(cls, datos: Dict) -> 'ReglaAlerta':
+        campos = {f.name for f in fields(cls)}
+        regla = cls(**{k: v for k, v in datos.items() if k in campos})
+        if regla.campo not in CAMPOS_REGLA:
+            raise ValueError(f"Campo no soportado en regla de alerta: {regla.campo}")
+        if regla.operador not in OPERADORES:
+            raise ValueError(f"Operador no soportado: {regla.operador}")
+        if regla.histeresis < 0 or regla.duracion < 0:
+            raise ValueError("histeresis y duracion no pueden ser negativas")
+        return regla
+
+    def a_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _reglas_por_defecto(umbrales: Dict = UMBRALES_ALERTA) -> List[ReglaAlerta]:
+    """Reglas globales equivalentes a evaluar_alertas (mismos umbrales y mensajes)"""
+    return [
+        ReglaAlerta('temperatura_alta', 'temperatura', '>', umbrales['temperatura_alta'],
+                    "Temperatura alta: {valor}°C", histeresis=1.0),
+        ReglaAlerta('temperatura_baja', 'temperatura', '<', umbrales['temperatura_baja'],
+                    "Temperatura baja: {valor}°C", histeresis=1.0),
+        ReglaAlerta('humedad_alta', 'humedad_relativa', '>', umbrales['humedad_alta'],
+                    "Humedad alta: {valor}%", histeresis=2.0),
+        ReglaAlerta('bateria_baja', 'nivel_bateria', '<', umbrales['bateria_baja'],
+                    "Batería crítica: {valor}%", histeresis=5.0),
+        ReglaAlerta('estado_critico', 'estado_general', '==', 'Crítico',
+                    "Estado CRÍTICO de la torre"),
+    ]
+
+REGLAS_POR_DEFECTO = _reglas_por_defecto()
+
+
+class _ReglaCompilada:
+    """Parámetros efectivos de una regla por torre (un array por parámetro) y su estado"""
+
+    def __init__(self, base: ReglaAlerta, capacidad: int):
+        self.nombre = base.nombre
+        self.campo = base.campo
+        self.operador = base.operador
+        self.comparar = OPERADORES[base.operador]
+        self.mensajes: Dict[int, str] = {}  # plantillas distintas de la base, por indice
+        self.mensaje = base.mensaje
+        self.umbral = np.zeros(capacidad)
+        self.histeresis = np.zeros(capacidad)
+        self.duracion = np.zeros(capacidad)
+        self.habilitada = np.zeros(capacidad, dtype=bool)
+        # estado: alerta activa y desde cuando se cumple la condicion (NaN = no se cumple)
+        self.activa = np.zeros(capacidad, dtype=bool)
+        self.desde = np.full(capacidad, np.nan)
+
+    def aplicar(self, regla: ReglaAlerta, indices):
+        umbral = _codigo_estado(regla.umbral) if regla.campo == 'estado_general' else float(regla.umbral)
+        self.umbral[indices] = umbral
+        self.histeresis[indices] = regla.histeresis
+        self.duracion[indices] = regla.duracion
+        self.habilitada[indices] = regla.habilitada
+        if regla.mensaje != self.mensaje and not isinstance(indices, slice):
+            for i in np.atleast_1d(indices).tolist():
+                self.mensajes[i] = regla.mensaje
+
+    def crecer(self, capacidad: int):
+        extra = capacidad - len(self.umbral)
+        self.umbral = np.concatenate([self.umbral, np.zeros(extra)])
+        self.histeresis = np.concatenate([self.histeresis, np.zeros(extra)])
+        self.duracion = np.concatenate([self.duracion, np.zeros(extra)])
+        self.habilitada = np.concatenate([self.habilitada, np.zeros(extra, dtype=bool)])
+        self.activa = np.concatenate([self.activa, np.zeros(extra, dtype=bool)])
+        self.desde = np.concatenate([self.desde, np.full(extra, np.nan)])
+
+    def evaluar_uno(self, i: int, valor: float, ahora: float) -> Optional[str]:
+        """Misma lógica que evaluar para una sola torre, sin arrays: 'activada', 'resuelta' o None"""
+        activa = bool(self.activa[i])
+        umbral = float(self.umbral[i])
+        comparar = OPERADORES_ESCALARES[self.operador]
+        if valor != valor:  # NaN: sin dato
+            condicion = False
+        elif activa and self.operador in ('>', '>='):
+            condicion = comparar(valor, umbral - self.histeresis[i])
+        elif activa and self.operador in ('<', '<='):
+            condicion = comparar(valor, umbral + self.histeresis[i])
+        else:
+            condicion = comparar(valor, umbral)
+
+        if condicion and self.habilitada[i]:
+            desde = self.desde[i]
+            if desde != desde:
+                desde = self.desde[i] = ahora
+            nueva = bool(ahora - desde >= self.duracion[i])
+        else:
+            self.desde[i] = np.nan
+            nueva = False
+
+        self.activa[i] = nueva
+        if nueva and not activa:
+            return 'activada'
+        if activa and not nueva:
+            return 'resuelta'
+        return None
+
+    def evaluar(self, idx: np.ndarray, valores: np.ndarray, ahora: float):
+        """Avanza el estado de las torres idx y devuelve (posiciones activadas, posiciones resueltas)"""
+        umbral = self.umbral[idx]
+        activa = self.activa[idx]
+
+        cumple = self.comparar(valores, umbral)
+        if self.operador in ('>', '>='):
+            sigue = self.comparar(valores, umbral - self.histeresis[idx])
+        elif self.operador in ('<', '<='):
+            sigue = self.comparar(valores, umbral + self.histeresis[idx])
+        else:
+            sigue = cumple
+        condicion = np.where(activa, sigue, cumple) & self.habilitada[idx]
+
+        desde = self.desde[idx]
+        desde = np.where(condicion, np.where(np.isnan(desde), ahora, desde), np.nan)
+        nueva = condicion & (ahora - desde >= self.duracion[idx])
+
+        self.desde[idx] = desde
+        self.activa[idx] = nueva
+        return np.flatnonzero(nueva & ~activa), np.flatnonzero(activa & ~nueva)
+
+
+class MotorReglas:
+    """
+    Evalúa las reglas de alerta sobre lotes de lecturas con NumPy. Las reglas se compilan
+    a arrays de parámetros por torre (global < usuario < torre) y el estado de cada
+    alerta se guarda entre ticks, así solo se informan las transiciones: activada cuando
+    la condición se cumple durante `duracion` y resuelta al salir de la banda de histéresis.
+    """
+
+    def __init__(self, reglas: Optional[List[ReglaAlerta]] = None, recargar: bool = True):
+        self._lock = threading.RLock()
+        self._indices: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._cache_ids = (None, None)
+        self._capacidad = 1024
+        self.usuarios: Dict[str, str] = {}
+        self.reglas: List[ReglaAlerta] = []
+        self._compiladas: Dict[str, _ReglaCompilada] = {}
+        self._recargar = recargar
+        self._version_reglas = None
+        self._proxima_recarga = 0.0
+        self.transiciones = 0
+        self.cargar(reglas if reglas is not None else REGLAS_POR_DEFECTO)
+
+    # reglas y asignaciones
+
+    def cargar(self, reglas: List[ReglaAlerta]):
+        """Reemplaza las reglas; el estado de las alertas activas se conserva por nombre"""
+        with self._lock:
+            self.reglas = list(reglas)
+            anteriores = self._compiladas
+            self._compiladas = {}
+            # la regla global define campo y operador; sin global, la primera especifica
+            for regla in sorted(self.reglas, key=self._especificidad):
+                if regla.nombre in self._compiladas:
+                    continue
+                compilada = _ReglaCompilada(regla, self._capacidad)
+                previa = anteriores.get(regla.nombre)
+                if previa is not None and previa.campo == regla.campo:
+                    compilada.activa, compilada.desde = previa.activa, previa.desde
+                self._compiladas[regla.nombre] = compilada
+            self._compilar()
+
+    def asignar_usuarios(self, usuarios: Dict[str, Optional[str]]):
+        """Actualiza torre -> usuario asignado (para las reglas por usuario)"""
+        with self._lock:
+            cambios = {t: u for t, u in usuarios.items() if self.usuarios.get(t) != u}
+            if not cambios:
+                return
+            self.usuarios.update(cambios)
+            if any(r.usuario for r in self.reglas):
+                self._compilar()
+
+    def _compilar(self):
+        """Vuelca las reglas a los arrays por torre (al cambiar reglas, usuarios o torres)"""
+        por_usuario: Dict[str, List[int]] = {}
+        for id_torre, usuario in self.usuarios.items():
+            if usuario and id_torre in self._indices:
+                por_usuario.setdefault(usuario, []).append(self._indices[id_torre])
+
+        for compilada in self._compiladas.values():
+            compilada.mensajes.clear()
+        # primero las globales, despues las de usuario y al final las de torre
+        for compilada in self._compiladas.values():
+            compilada.habilitada[:] = False
+        for regla in sorted(self.reglas, key=self._especificidad):
+            compilada = self._compiladas[regla.nombre]
+            if regla.campo != compilada.campo or regla.operador != compilada.operador:
+                logger.warning(f"Regla {regla.clave} ignorada: campo/operador distinto de {compilada.nombre}")
+                continue
+            if regla.id_torre:
+                if regla.id_torre in self._indices:
+                    compilada.aplicar(regla, self._indices[regla.id_torre])
+            elif regla.usuario:
+                if regla.usuario in por_usuario:
+                    compilada.aplicar(regla, np.asarray(por_usuario[regla.usuario]))
+            else:
+                compilada.aplicar(regla, slice(None))
+
+    @staticmethod
+    def _especificidad(regla: ReglaAlerta) -> int:
+        return 2 if regla.id_torre else 1 if regla.usuario else 0
+
+    def _indices_de(self, ids_torre) -> np.ndarray:
+        # el modo flota pasa el mismo array de IDs en cada tick mientras no cambie la flota
+        if ids_torre is self._cache_ids[0]:
+            return self._cache_ids[1]
+        nuevas = [t for t in dict.fromkeys(ids_torre) if t not in self._indices]
+        if nuevas:
+            for id_torre in nuevas:
+                self._indices[id_torre] = len(self._ids)
+                self._ids.append(id_torre)
+            if len(self._ids) > self._capacidad:
+                while self._capacidad < len(self._ids):
+                    self._capacidad *= 2
+                for compilada in self._compiladas.values():
+                    compilada.crecer(self._capacidad)
+            self._compilar()
+        idx = np.fromiter(map(self._indices.__getitem__, ids_torre), dtype=np.int64, count=len(ids_torre))
+        if isinstance(ids_torre, np.ndarray):
+            self._cache_ids = (ids_torre, idx)
+        return idx
+
+    def _comprobar_reglas(self):
+        """Recarga las reglas guardadas si cambiaron (como mucho cada ALERT_RULES_RELOAD_INTERVAL)"""
+        ahora = time.monotonic()
+        if not self._recargar or ahora < self._proxima_recarga:
+            return
+        self._proxima_recarga = ahora + Config.ALERT_RULES_RELOAD_INTERVAL
+        try:
+            from api.services.alerta_service import AlertaService
+
+            version = AlertaService.version_reglas()
+            if version != self._version_reglas:
+                self.cargar(AlertaService.obtener_reglas())
+                self._version_reglas = version
+        except Exception as e:
+            logger.error(f"Error recargando reglas de alerta: {str(e)}")
+
+    # evaluacion
+
+    def evaluar(self, ids_torre: Sequence[str], columnas: Dict[str, np.ndarray],
+                ahora: Optional[float] = None) -> List[Dict]:
+        """
+        Evalúa un lote (un array por campo, alineado con ids_torre) y devuelve las
+        transiciones: {'id_torre', 'posicion' (en el lote), 'regla', 'estado': activada|resuelta,
+        'valor', 'mensaje'}
+        """
+        ahora = time.time() if ahora is None else ahora
+        self._comprobar_reglas()
+        transiciones = []
+        with self._lock:
+            idx = self._indices_de(ids_torre)
+            for compilada in self._compiladas.values():
+                valores = columnas.get(compilada.campo)
+                if valores is None:
+                    continue
+                valores = np.asarray(valores, dtype=float)
+                activadas, resueltas = compilada.evaluar(idx, valores, ahora)
+                for posiciones, estado in ((activadas, 'activada'), (resueltas, 'resuelta')):
+                    if not len(posiciones):
+                        continue
+                    posiciones_lista = posiciones.tolist()
+                    ids = [ids_torre[p] for p in posiciones_lista]
+                    for id_torre, pos, valor, i in zip(ids, posiciones_lista, valores[posiciones].tolist(),
+                                                       idx[posiciones].tolist()):
+                        transiciones.append(self._transicion(compilada, id_torre, pos, i, estado, valor))
+            self.transiciones += len(transiciones)
+        return transiciones
+
+    @staticmethod
+    def _transicion(compilada: _ReglaCompilada, id_torre: str, posicion: int, indice: int,
+                    estado: str, valor: float) -> Dict:
+        mensaje = None
+        if estado == 'activada':
+            mensaje = compilada.mensajes.get(indice, compilada.mensaje).format(valor=valor)
+        return {
+            'id_torre': id_torre,
+            'posicion': posicion,
+            'regla': compilada.nombre,
+            'estado': estado,
+            'valor': valor,
+            'mensaje': mensaje
+        }
+
+    def evaluar_lectura(self, datos: Dict, diagnostico: Dict, ahora: Optional[float] = None) -> List[Dict]:
+        """
+        Evalúa una sola lectura (motor de hilos y tareas por torre). Usa los mismos
+        parámetros compilados y el mismo estado que evaluar, pero sin crear arrays.
+        """
+        ahora = time.time() if ahora is None else ahora
+        self._comprobar_reglas()
+        id_torre = datos['id_torre']
+        transiciones = []
+        with self._lock:
+            i = self._indices.get(id_torre)
+            if i is None:
+                i = int(self._indices_de([id_torre])[0])
+            for compilada in self._compiladas.values():
+                valor = datos.get(compilada.campo, diagnostico.get(compilada.campo))
+                if compilada.campo == 'estado_general':
+                    valor = _codigo_estado(valor)
+                valor = np.nan if valor is None else float(valor)
+                estado = compilada.evaluar_uno(i, valor, ahora)
+                if estado:
+                    transiciones.append(self._transicion(compilada, id_torre, 0, i, estado, valor))
+            self.transiciones += len(transiciones)
+        return transiciones
+
+    def evaluar_lote(self, lote, ahora: Optional[float] = None) -> List[Dict]:
+        """Evalúa un LoteFlota completo en formato columnar"""
+        columnas = dict(lote.meteo)
+        columnas['nivel_bateria'] = lote.diagnostico['nivel_bateria']
+        columnas['estado_general'] = lote.diagnostico['estado_general']
+        return self.evaluar(lote.ids_torre, columnas, ahora)
+
+    def activas(self, id_torre: str) -> List[str]:
+        """Nombres de las reglas con alerta activa para una torre"""
+        with self._lock:
+            i = self._indices.get(id_torre)
+            if i is None:
+                return []
+            return [c.nombre for c in self._compiladas.values() if c.activa[i]]
+
+    def estado(self) -> Dict:
+        with self._lock:
+            return {
+                'reglas': len(self.reglas),
+                'torres': len(self._ids),
+                'alertas_activas': {c.nombre: int(c.activa.sum()) for c in self._compiladas.values()},
+                'transiciones': self.transiciones
+            }
+
+
+def agrupar_por_torre(transiciones: List[Dict]) -> Dict[str, List[Dict]]:
+    grupos: Dict[str, List[Dict]] = {}
+    for transicion in transiciones:
+        grupos.setdefault(transicion['id_torre'], []).append(transicion)
+    return grupos
+
+
+def mensaje_transiciones(id_torre: str, transiciones: List[Dict], activas: List[str],
+                         datos: Dict, diagnostico: Dict, timestamp: Optional[str] = None) -> Dict:
+    """
+    Mensaje publicado cuando cambia el estado de alerta de una torre. `alertas` conserva
+    el formato anterior (mensajes de las alertas que se acaban de activar).
+    """
+    return {
+        'id_torre': id_torre,
+        'timestamp': timestamp or datetime.utcnow().isoformat(),
+        'alertas': [t['mensaje'] for t in transiciones if t['estado'] == 'activada'],
+        'resueltas': [t['regla'] for t in transiciones if t['estado'] == 'resuelta'],
+        'activas': activas,
+        'datos': datos,
+        'diagnostico': diagnostico
+    }
+
+
+def _lotes_benchmark(torres: int, ticks: int, seed: int, independientes: bool) -> List:
+    """
+    Lotes para el benchmark. Por defecto cada tick es un paseo aleatorio sobre el
+    anterior (las lecturas reales están correlacionadas en el tiempo); con
+    `independientes` cada tick se sortea de nuevo, el peor caso de transiciones.
+    """
+    from api.utils.simulator import SimuladorFlota, LoteFlota
+
+    simulador = SimuladorFlota([f"bench-{i:06d}" for i in range(torres)], seed=seed)
+    if independientes:
+        return [simulador.tick() for _ in range(ticks)]
+
+    rng = np.random.default_rng(seed)
+    lote = simulador.tick()
+    lotes = [lote]
+    for _ in range(ticks - 1):
+        meteo = dict(lote.meteo)
+        meteo['temperatura'] = np.round(meteo['temperatura'] + rng.normal(0, 0.3, torres), 2)
+        meteo['humedad_relativa'] = np.round(np.clip(meteo['humedad_relativa'] + rng.normal(0, 1.0, torres), 0, 100), 2)
+        diagnostico = dict(lote.diagnostico)
+        diagnostico['nivel_bateria'] = np.round(np.clip(diagnostico['nivel_bateria'] + rng.normal(-0.05, 0.2, torres), 0, 100), 2)
+        lote = LoteFlota(lote.ids_torre, lote.timestamp, meteo, diagnostico)
+        lotes.append(lote)
+    return lotes
+
+
+def ejecutar_benchmark(torres: int = 100_000, ticks: int = 20, seed: int = 0,
+                       independientes: bool = False) -> Dict:
+    """
+    Rendimiento de las reglas a escala de flota: el motor compilado sobre lotes frente a
+    evaluar_alertas lectura a lectura (que se mide sobre una muestra y se extrapola), y
+    mensajes publicados por tick con y sin seguimiento de transiciones.
+    """
+    lotes = _lotes_benchmark(torres, ticks, seed, independientes)
+    motor = MotorReglas(recargar=False)
+
+    inicio = time.perf_counter()
+    transiciones = 0
+    for paso, lote in enumerate(lotes):
+        transiciones += len(agrupar_por_torre(motor.evaluar_lote(lote, ahora=float(paso))))
+    compilado = time.perf_counter() - inicio
+
+    muestra = min(torres, 20_000)
+    registros = [
+        list(zip(lote.registros_meteo()[:muestra], lote.registros_diagnostico()[:muestra]))
+        for lote in lotes[:3]
+    ]
+    inicio = time.perf_counter()
+    disparos = sum(1 for tick in registros for datos, diag in tick if evaluar_alertas(datos, diag))
+    escalar = (time.perf_counter() - inicio) / (muestra * len(registros)) * torres * ticks
+
+    lecturas = torres * ticks
+    return {
+        'torres': torres,
+        'ticks': ticks,
+        'reglas': len(motor.reglas),
+        'lecturas': 'independientes' if independientes else 'correlacionadas',
+        'lecturas_por_segundo': round(lecturas / compilado),
+        'ms_por_tick_de_flota': round(compilado / ticks * 1000, 2),
+        'lecturas_por_segundo_escalar': round(lecturas / escalar),
+        'aceleracion': round(escalar / compilado, 1),
+        'publicaciones_por_tick': round(transiciones / ticks, 1),
+        'publicaciones_por_tick_sin_transiciones': round(disparos / (muestra * len(registros)) * torres, 1)
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Benchmark del motor de reglas de alerta")
+    parser.add_argument('--torres', type=int, default=100_000)
+    parser.add_argument('--ticks', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--independientes', action='store_true', help="ticks sin correlación (peor caso)")
+    args = parser.parse_args()
+    print(json.dumps(ejecutar_benchmark(args.torres, args.ticks, args.seed, args.independientes), indent=2))
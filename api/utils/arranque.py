@@ -0,0 +1,95 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from api.utils.procesos import tras_fork
+
+logger = logging.getLogger(__name__)
+
+# Pasos de arranque del proceso (verificación de conexiones, sincronización inicial,
+# simulación, consumidor de alertas) con su estado para GET /ready. Sin FAST_BOOT se
+# ejecutan en serie dentro de create_app, como siempre; con FAST_BOOT, en un hilo en
+# segundo plano mientras Flask ya atiende peticiones.
+
+INICIO_PROCESO = time.time()
+
+Paso = Tuple[str, Callable[[], None]]
+
+
+class EstadoArranque:
+    def __init__(self):
+        self.pasos: Dict[str, Dict] = {}
+        self.listo = threading.Event()
+        self._lock = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+        self._pendiente: Optional[Tuple[List[Paso], float]] = None
+
+    def _registrar(self, nombre: str, **datos):
+        with self._lock:
+            self.pasos.setdefault(nombre, {}).update(datos)
+
+    def ejecutar(self, nombre: str, funcion: Callable[[], None]):
+        """Ejecuta un paso guardando su estado y duración; relanza el error"""
+        inicio = time.perf_counter()
+        self._registrar(nombre, estado='en_curso', error=None)
+        try:
+            funcion()
+        except Exception as e:
+            self._registrar(nombre, estado='error', error=str(e),
+                            ms=round((time.perf_counter() - inicio) * 1000, 1))
+            raise
+        self._registrar(nombre, estado='ok', ms=round((time.perf_counter() - inicio) * 1000, 1))
+
+    def ejecutar_todos(self, pasos: List[Paso]):
+        for nombre, _ in pasos:
+            self._registrar(nombre, estado='pendiente')
+        for nombre, funcion in pasos:
+            self.ejecutar(nombre, funcion)
+        self.listo.set()
+        logger.info(f"Arranque completo en {time.time() - INICIO_PROCESO:.2f}s desde el inicio del proceso")
+
+    def iniciar_en_segundo_plano(self, pasos: List[Paso], reintento: float = 5.0):
+        """
+        Ejecuta los pasos en un hilo; si uno falla (p. ej. Redis aún no responde) se
+        reintenta desde ese paso cada `reintento` segundos.
+        """
+        for nombre, _ in pasos:
+            self._registrar(nombre, estado='pendiente')
+        self._pendiente = (pasos, reintento)
+
+        def ejecutar():
+            for nombre, funcion in pasos:
+                while True:
+                    try:
+                        self.ejecutar(nombre, funcion)
+                        break
+                    except Exception as e:
+                        logger.error(f"Arranque: paso '{nombre}' falló, reintento en {reintento}s: {str(e)}")
+                        time.sleep(reintento)
+            self.listo.set()
+            logger.info(f"Arranque completo en {time.time() - INICIO_PROCESO:.2f}s desde el inicio del proceso")
+
+        self._hilo = threading.Thread(target=ejecutar, name='arranque', daemon=True)
+        self._hilo.start()
+
+    def reiniciar_tras_fork(self):
+        """Si el padre hizo fork con el arranque en segundo plano a medias, el hijo lo repite"""
+        self._lock = threading.Lock()
+        if self._pendiente and not self.listo.is_set():
+            self.pasos.clear()
+            self.iniciar_en_segundo_plano(*self._pendiente)
+
+    def estado(self) -> Dict:
+        with self._lock:
+            pasos = {nombre: dict(datos) for nombre, datos in self.pasos.items()}
+        return {
+            'listo': self.listo.is_set(),
+            'segundos_desde_inicio': round(time.time() - INICIO_PROCESO, 3),
+            'pasos': pasos
+        }
+
+
+# Instancia global
+arranque = EstadoArranque()
+tras_fork(arranque.reiniciar_tras_fork)
@@ -0,0 +1,639 @@
+import asyncio
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from config.settings import Config
+from api.utils.simulator import generar_lectura, SimuladorFlota, LoteFlota
+from api.utils.alertas import MotorReglas, agrupar_por_torre, mensaje_transiciones
+from api.utils.bus_alertas import STREAM_ALERTAS, entrada_alerta
+from api.utils.codec_redis import codificar_lectura, codificar_mensaje
+from api.utils.metricas import TICKS_SIMULACION
+from api.utils.planificacion import (
+    HistogramaTicks,
+    TokenBucket,
+    crear_limitadores,
+    desfase_torre,
+    jitter,
+    siguiente_tick
+)
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = {'supabase', 'sqlite', 'redis'}
+
+
+class EscritorLotes:
+    """Acumula registros en una cola y los entrega por lotes a una corrutina de escritura"""
+
+    def __init__(self, nombre: str, escribir: Callable[[List], Awaitable[None]],
+                 tam_lote: int = None, intervalo: float = None,
+                 limitador: Optional[TokenBucket] = None):
+        self.nombre = nombre
+        self._escribir = escribir
+        self.limitador = limitador
+        self.tam_lote = tam_lote or Config.ASYNC_BATCH_SIZE
+        self.intervalo = intervalo if intervalo is not None else Config.ASYNC_FLUSH_INTERVAL
+        self.escritos = 0
+        self.errores = 0
+        self._cola: Optional[asyncio.Queue] = None
+        self._tarea: Optional[asyncio.Task] = None
+
+    def iniciar(self):
+        # la cola se crea dentro del loop que la va a usar
+        self._cola = asyncio.Queue()
+        self._tarea = asyncio.create_task(self._bucle(), name=f"escritor_{self.nombre}")
+
+    def poner(self, registro):
+        self._cola.put_nowait(registro)
+
+    def poner_lote(self, registros: Iterable):
+        for registro in registros:
+            self._cola.put_nowait(registro)
+
+    async def _bucle(self):
+        fin = False
+        while not fin:
+            primero = await self._cola.get()
+            if primero is None:
+                break
+            lote = [primero]
+
+            # dejar que el lote se llene un poco antes de escribir
+            if self._cola.qsize() < self.tam_lote - 1:
+                await asyncio.sleep(self.intervalo)
+
+            while len(lote) < self.tam_lote and not self._cola.empty():
+                registro = self._cola.get_nowait()
+                if registro is None:
+                    fin = True
+                    break
+                lote.append(registro)
+
+            await self._entregar(lote)
+
+    async def _entregar(self, lote: List):
+        try:
+            if self.limitador:
+                await self.limitador.adquirir_async(len(lote))
+            await self._escribir(lote)
+            self.escritos += len(lote)
+        except Exception as e:
+            self.errores += len(lote)
+            logger.error(f"Error escribiendo lote en {self.nombre} ({len(lote)} registros): {str(e)}")
+
+    async def vaciar(self):
+        """Entrega todo lo pendiente y termina el bucle de escritura"""
+        if not self._tarea:
+            return
+        self._cola.put_nowait(None)
+        await self._tarea
+
+
+class SumideroSupabase:
+    """Inserciones por lote en PostgREST con un cliente HTTP asíncrono y pool de conexiones"""
+
+    def __init__(self, url: str, key: str, max_conexiones: int):
+        import httpx
+
+        self.cliente = httpx.AsyncClient(
+            base_url=f"{url.rstrip('/')}/rest/v1",
+            headers={
+                'apikey': key,
+                'Authorization': f'Bearer {key}',
+                'Content-Type': 'application/json',
+                'Prefer': 'return=minimal'
+            },
+            limits=httpx.Limits(
+                max_connections=max_conexiones,
+                max_keepalive_connections=max_conexiones
+            ),
+            timeout=15
+        )
+
+    async def insertar(self, tabla: str, registros: List[Dict]):
+        res = await self.cliente.post(f"/{tabla}", content=json.dumps(registros, default=str))
+        res.raise_for_status()
+
+    async def cerrar(self):
+        await self.cliente.aclose()
+
+
+class SumideroSQLite:
+    """Escritor SQLite asíncrono (aiosqlite) con executemany por lote"""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self.conexion = None
+        self._sentencias = {}
+
+    async def abrir(self):
+        import aiosqlite
+
+        self.conexion = await aiosqlite.connect(self.ruta)
+        await self.conexion.execute("PRAGMA journal_mode=WAL")
+        await self.conexion.execute("PRAGMA synchronous=NORMAL")
+
+    def _sentencia(self, model_class):
+        """Prepara (una sola vez por modelo) el INSERT y las columnas de fecha"""
+        if model_class not in self._sentencias:
+            from sqlalchemy import DateTime
+
+            tabla = model_class.__table__
+            columnas = [c.name for c in tabla.columns]
+            pk = next(c.name for c in tabla.primary_key.columns)
+            fechas = {c.name for c in tabla.columns if isinstance(c.type, DateTime)}
+            sql = (f"INSERT INTO {tabla.name} ({', '.join(columnas)}) "
+                   f"VALUES ({', '.join('?' * len(columnas))})")
+            self._sentencias[model_class] = (sql, columnas, pk, fechas)
+        return self._sentencias[model_class]
+
+    async def insertar(self, model_class, registros: List[Dict]):
+        sql, columnas, pk, fechas = self._sentencia(model_class)
+        filas = []
+        for registro in registros:
+            fila = []
+            for columna in columnas:
+                valor = registro.get(columna)
+                if columna == pk and valor is None:
+                    valor = str(uuid.uuid4())
+                elif columna in fechas and valor is not None:
+                    # mismo formato de texto que usa SQLAlchemy para DateTime en SQLite
+                    if isinstance(valor, str):
+                        valor = datetime.fromisoformat(valor)
+                    valor = valor.isoformat(sep=' ')
+                fila.append(valor)
+            filas.append(tuple(fila))
+
+        await self.conexion.executemany(sql, filas)
+        await self.conexion.commit()
+
+    async def cerrar(self):
+        if self.conexion:
+            await self.conexion.close()
+
+
+class SumideroRedis:
+    """Cliente Redis asíncrono con pool; cada lote se envía en un único pipeline"""
+
+    def __init__(self, url: str, max_conexiones: int):
+        import redis.asyncio as aioredis
+
+        self.redis = aioredis.from_url(url, max_connections=max_conexiones, decode_responses=False)
+
+    async def ejecutar(self, comandos: List[tuple]):
+        pipe = self.redis.pipeline(transaction=False)
+        for operacion, clave, valor in comandos:
+            if operacion == 'set':
+                pipe.set(clave, valor, ex=3600)  # una hora de expiracion
+            elif operacion == 'publish':
+                pipe.publish(clave, valor)
+            elif operacion == 'xadd':
+                pipe.xadd(clave, valor, maxlen=Config.ALERT_STREAM_MAXLEN, approximate=True)
+        await pipe.execute()
+
+    async def cerrar(self):
+        await self.redis.aclose()
+
+
+async def _descartar(lote: List):
+    """Escritura nula para medir el motor sin backends"""
+    return None
+
+
+class AsyncSimulationManager:
+    """
+    Alternativa asyncio a ThreadManager. Cada torre es una tarea ligera dentro de un
+    único event loop que corre en un hilo de fondo; las escrituras se agrupan en lotes
+    por destino (Supabase vía HTTP, SQLite vía aiosqlite y Redis asíncrono).
+    """
+
+    def __init__(self, backends: Optional[Set[str]] = None, intervalo: float = None,
+                 modo_flota: Optional[bool] = None):
+        self.backends = BACKENDS if backends is None else set(backends)
+        self.intervalo = intervalo or Config.SIMULATION_INTERVAL
+        self.modo_flota = Config.SIMULATION_BATCH if modo_flota is None else modo_flota
+        self.active_tasks: Dict[str, asyncio.Task] = {}
+        self.flota: Dict[str, None] = {}  # torres simuladas por el tick vectorizado (modo flota)
+        self.pausadas: Set[str] = set()
+        self._version_flota = 0
+        self._tarea_flota: Optional[asyncio.Task] = None
+        self.reconciliador = None
+        self.ticks = 0
+        self.retrasos = deque(maxlen=100_000)  # retraso de cada tick respecto a su hora programada
+        self.histograma = HistogramaTicks(self.intervalo)
+        self.motor_alertas = MotorReglas()
+        self.limitadores = crear_limitadores()
+        self._escritores: Dict[str, EscritorLotes] = {}
+        self._sumideros = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._hilo: Optional[threading.Thread] = None
+        self._listo = threading.Event()
+
+    # ciclo de vida del loop
+
+    def _arrancar_loop(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._listo.clear()
+        self._hilo = threading.Thread(target=self._ejecutar_loop, daemon=True, name="torre_sim_async")
+        self._hilo.start()
+        self._listo.wait(timeout=30)
+
+    def _ejecutar_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._abrir_backends())
+        except Exception as e:
+            logger.critical(f"Error abriendo backends asíncronos: {str(e)}")
+            self._listo.set()
+            self._loop.close()
+            self._loop = None
+            return
+
+        self._listo.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+            self._loop = None
+
+    async def _abrir_backends(self):
+        escribir_meteo_sb = escribir_diag_sb = escribir_meteo_sql = escribir_diag_sql = escribir_redis = _descartar
+
+        if 'supabase' in self.backends:
+            supabase = SumideroSupabase(
+                os.getenv("SUPABASE_URL"),
+                os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY"),
+                Config.ASYNC_HTTP_MAX_CONNECTIONS
+            )
+            self._sumideros['supabase'] = supabase
+            escribir_meteo_sb = lambda lote: supabase.insertar('datos_meteorologicos', lote)
+            escribir_diag_sb = lambda lote: supabase.insertar('diagnostico_tecnico', lote)
+
+        if 'sqlite' in self.backends:
+            from sqlalchemy.engine import make_url
+            from api.models.datos_meteorologicos import DatoMeteorologico
+            from api.models.diagnostico_tecnico import DiagnosticoTecnico
+
+            ruta = make_url(os.getenv("SQLITE_URL", "sqlite:///db.sqlite3")).database
+            sqlite = SumideroSQLite(ruta)
+            await sqlite.abrir()
+            self._sumideros['sqlite'] = sqlite
+            escribir_meteo_sql = lambda lote: sqlite.insertar(DatoMeteorologico, lote)
+            escribir_diag_sql = lambda lote: sqlite.insertar(DiagnosticoTecnico, lote)
+
+        if 'redis' in self.backends:
+            redis_sumidero = SumideroRedis(
+                os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+                Config.ASYNC_REDIS_MAX_CONNECTIONS
+            )
+            self._sumideros['redis'] = redis_sumidero
+            escribir_redis = redis_sumidero.ejecutar
+
+        # los dos escritores de un mismo destino comparten su token bucket
+        supabase_rl, sqlite_rl, redis_rl = (self.limitadores[b] for b in ('supabase', 'sqlite', 'redis'))
+        self._escritores = {
+            'supabase:meteorologico': EscritorLotes('supabase:meteorologico', escribir_meteo_sb, limitador=supabase_rl),
+            'supabase:diagnostico': EscritorLotes('supabase:diagnostico', escribir_diag_sb, limitador=supabase_rl),
+            'sqlite:meteorologico': EscritorLotes('sqlite:meteorologico', escribir_meteo_sql, limitador=sqlite_rl),
+            'sqlite:diagnostico': EscritorLotes('sqlite:diagnostico', escribir_diag_sql, limitador=sqlite_rl),
+            'redis': EscritorLotes('redis', escribir_redis, limitador=redis_rl),
+        }
+        for escritor in self._escritores.values():
+            escritor.iniciar()
+
+    async def _cerrar(self):
+        """Cancela las torres, vacía los lotes pendientes y cierra los clientes"""
+        tareas = list(self.active_tasks.values())
+        if self._tarea_flota:
+            tareas.append(self._tarea_flota)
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        self.active_tasks.clear()
+        self.flota.clear()
+        self._tarea_flota = None
+
+        for escritor in self._escritores.values():
+            await escritor.vaciar()
+
+        for nombre, sumidero in self._sumideros.items():
+            try:
+                await sumidero.cerrar()
+            except Exception as e:
+                logger.error(f"Error cerrando {nombre}: {str(e)}")
+        self._sumideros.clear()
+
+    # tareas por torre
+
+    def _tick(self, id_torre: str):
+        """Genera una lectura y un diagnóstico y los encola en cada destino"""
+        datos_meteo, diagnostico = generar_lectura(id_torre)
+        diagnostico['tiempo_ultima_conexion'] = diagnostico['tiempo_ultima_conexion'].isoformat()
+
+        required_meteo = ['id_torre', 'temperatura', 'humedad_relativa']
+        required_diag = ['id_torre', 'nivel_bateria', 'estado_general']
+
+        if not all(k in datos_meteo for k in required_meteo):
+            raise ValueError(f"Faltan campos meteorológicos requeridos: {required_meteo}")
+
+        if not all(k in diagnostico for k in required_diag):
+            raise ValueError(f"Faltan campos de diagnóstico requeridos: {required_diag}")
+
+        self._escritores['supabase:meteorologico'].poner(datos_meteo)
+        self._escritores['supabase:diagnostico'].poner(diagnostico)
+        self._escritores['sqlite:meteorologico'].poner(datos_meteo)
+        self._escritores['sqlite:diagnostico'].poner(diagnostico)
+        ultima = codificar_lectura(datos_meteo)
+        self._escritores['redis'].poner(('set', f"torre:{id_torre}:last_data", ultima))
+        self._escritores['redis'].poner(('publish', f"lecturas:{id_torre}", ultima))
+
+        # solo se publican los cambios de estado de las alertas
+        transiciones = self.motor_alertas.evaluar_lectura(datos_meteo, diagnostico)
+        if transiciones:
+            mensaje = mensaje_transiciones(
+                id_torre, transiciones, self.motor_alertas.activas(id_torre), datos_meteo, diagnostico
+            )
+            self._publicar_alerta(id_torre, mensaje)
+            logger.debug(f"Transiciones de alerta para torre {id_torre}: {len(transiciones)}")
+
+        self.ticks += 1
+
+    def _publicar_alerta(self, id_torre: str, mensaje: Dict):
+        """PUBLISH para los clientes en vivo y XADD al stream persistente, en el mismo lote"""
+        self._escritores['redis'].poner(('publish', f"alertas:{id_torre}", codificar_mensaje(mensaje)))
+        self._escritores['redis'].poner(
+            ('xadd', STREAM_ALERTAS, entrada_alerta(mensaje, self.motor_alertas.usuarios.get(id_torre)))
+        )
+
+    async def _tarea_torre(self, id_torre: str):
+        """
+        Bucle de simulación de una torre con cadencia fija sobre el reloj del loop. Cada
+        torre tiene su fase dentro del intervalo y cada tick se desplaza con jitter, así
+        la flota no escribe toda en el mismo instante.
+        """
+        loop = asyncio.get_running_loop()
+        base = loop.time() + desfase_torre(id_torre, self.intervalo)
+        objetivo = base
+        await asyncio.sleep(max(0.0, objetivo - loop.time()))
+
+        while True:
+            inicio = loop.time()
+            self.retrasos.append(inicio - objetivo)
+            try:
+                if id_torre not in self.pausadas:
+                    self._tick(id_torre)
+                    duracion = loop.time() - inicio
+                    self.histograma.registrar(time.monotonic(), duracion)
+                    TICKS_SIMULACION.observar(duracion, 'asyncio')
+                base = siguiente_tick(base, self.intervalo, loop.time())
+                objetivo = base + jitter(self.intervalo)
+            except Exception as e:
+                logger.error(f"Error en simulación torre {id_torre}: {str(e)}", exc_info=True)
+                # backoff en caso de error, conservando la fase
+                base = objetivo = siguiente_tick(base, self.intervalo, loop.time() + 30)
+
+            await asyncio.sleep(max(0.0, objetivo - loop.time()))
+
+    def _tick_flota(self, lote: LoteFlota):
+        """Encola un tick vectorizado completo y publica sus alertas"""
+        registros_meteo = lote.registros_meteo()
+        registros_diag = lote.registros_diagnostico()
+        for diagnostico in registros_diag:
+            diagnostico['tiempo_ultima_conexion'] = diagnostico['tiempo_ultima_conexion'].isoformat()
+
+        self._escritores['supabase:meteorologico'].poner_lote(registros_meteo)
+        self._escritores['supabase:diagnostico'].poner_lote(registros_diag)
+        self._escritores['sqlite:meteorologico'].poner_lote(registros_meteo)
+        self._escritores['sqlite:diagnostico'].poner_lote(registros_diag)
+        for datos in registros_meteo:
+            ultima = codificar_lectura(datos)
+            self._escritores['redis'].poner(('set', f"torre:{datos['id_torre']}:last_data", ultima))
+            self._escritores['redis'].poner(('publish', f"lecturas:{datos['id_torre']}", ultima))
+
+        ahora = datetime.utcnow().isoformat()
+        for id_torre, transiciones in agrupar_por_torre(self.motor_alertas.evaluar_lote(lote)).items():
+            i = transiciones[0]['posicion']
+            mensaje = mensaje_transiciones(
+                id_torre, transiciones, self.motor_alertas.activas(id_torre),
+                registros_meteo[i], registros_diag[i], timestamp=ahora
+            )
+            self._publicar_alerta(id_torre, mensaje)
+
+        self.ticks += len(lote)
+
+    async def _bucle_flota(self):
+        """Un único bucle genera con NumPy el tick de toda la flota en cada intervalo"""
+        loop = asyncio.get_running_loop()
+        simulador = SimuladorFlota([], seed=Config.SIMULATION_SEED)
+        version = -1
+        proximo = loop.time()
+
+        while True:
+            inicio = loop.time()
+            self.retrasos.append(inicio - proximo)
+            try:
+                if version != self._version_flota:
+                    # se conserva el generador para que la secuencia siga siendo reproducible
+                    version = self._version_flota
+                    simulador.ids_torre = np.asarray(
+                        [t for t in self.flota if t not in self.pausadas], dtype=object
+                    )
+                if len(simulador.ids_torre):
+                    # un solo tick para toda la flota; los escritores (con sus token buckets) lo reparten
+                    self._tick_flota(simulador.tick())
+                    duracion = loop.time() - inicio
+                    self.histograma.registrar(time.monotonic(), duracion)
+                    TICKS_SIMULACION.observar(duracion, 'flota')
+                proximo += self.intervalo
+            except Exception as e:
+                logger.error(f"Error en simulación de flota: {str(e)}", exc_info=True)
+                proximo = loop.time() + 30  # backoff en caso de error
+
+            await asyncio.sleep(max(0.0, proximo - loop.time()))
+
+    async def _iniciar_torres(self, ids_torre: Iterable[str]) -> int:
+        if self.modo_flota:
+            antes = len(self.flota)
+            self.flota.update(dict.fromkeys(ids_torre))
+            self._version_flota += 1
+            if self._tarea_flota is None:
+                self._tarea_flota = asyncio.create_task(self._bucle_flota(), name="torre_sim_flota")
+            return len(self.flota) - antes
+
+        nuevas = 0
+        for id_torre in ids_torre:
+            if id_torre in self.active_tasks:
+                continue
+            self.active_tasks[id_torre] = asyncio.create_task(
+                self._tarea_torre(id_torre), name=f"torre_sim_{id_torre}"
+            )
+            nuevas += 1
+        return nuevas
+
+    # API publica (misma forma que ThreadManager)
+
+    def iniciar_torres(self, ids_torre: Iterable[str]) -> int:
+        """Programa una tarea de simulación por cada torre indicada"""
+        self._arrancar_loop()
+        if not self._loop:
+            raise RuntimeError("El event loop de simulación no está disponible")
+        futuro = asyncio.run_coroutine_threadsafe(self._iniciar_torres(list(ids_torre)), self._loop)
+        return futuro.result(timeout=60)
+
+    def iniciar_tarea_torre(self, torre: Dict):
+        """Inicia la tarea de simulación para una torre"""
+        self.iniciar_torres([torre["id_torre"]])
+
+    async def _detener_torres(self, ids_torre: Iterable[str]) -> int:
+        detenidas = 0
+        for id_torre in ids_torre:
+            tarea = self.active_tasks.pop(id_torre, None)
+            if tarea:
+                tarea.cancel()
+                detenidas += 1
+            elif self.flota.pop(id_torre, 0) is None:
+                detenidas += 1
+        self._version_flota += 1
+        return detenidas
+
+    def detener_torres(self, ids_torre: Iterable[str]) -> int:
+        """Detiene la simulación de las torres indicadas"""
+        if not self._loop:
+            return 0
+        futuro = asyncio.run_coroutine_threadsafe(self._detener_torres(list(ids_torre)), self._loop)
+        return futuro.result(timeout=60)
+
+    def pausar_torre(self, id_torre: str):
+        """Pausa una torre: su tarea sigue programada pero no genera datos"""
+        self.pausadas.add(id_torre)
+        self._version_flota += 1
+
+    def reanudar_torre(self, id_torre: str):
+        self.pausadas.discard(id_torre)
+        self._version_flota += 1
+
+    def iniciar_simulaciones(self):
+        """Inicia tareas para todas las torres activas"""
+        logger.info("Iniciando simulaciones asíncronas para torres activas")
+
+        try:
+            from api.utils.reconciliador import ReconciliadorFlota
+
+            self._arrancar_loop()
+            if self.reconciliador is None:
+                self.reconciliador = ReconciliadorFlota(self)
+            self.reconciliador.iniciar()
+
+        except Exception as e:
+            logger.error(f"Error al iniciar simulaciones: {str(e)}")
+
+    def detener_simulaciones(self, timeout: float = None):
+        """Cancela las tareas, vacía los escritores (drenaje) y detiene el loop"""
+        timeout = Config.SHUTDOWN_TIMEOUT if timeout is None else timeout
+        if self.reconciliador:
+            self.reconciliador.detener()
+        if not self._loop:
+            return
+        futuro = asyncio.run_coroutine_threadsafe(self._cerrar(), self._loop)
+        try:
+            futuro.result(timeout=timeout)
+        except Exception as e:
+            logger.error(f"Error deteniendo simulaciones asíncronas: {str(e)}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._hilo.join(timeout=5)
+        logger.info("Todas las simulaciones asíncronas han sido detenidas")
+
+    def estadisticas(self) -> Dict:
+        """Resumen de escritura por destino, histograma de ticks y esperas de los limitadores"""
+        return {
+            'torres': len(self.active_tasks) + len(self.flota),
+            'ticks': self.ticks,
+            'histograma_ticks': self.histograma.resumen(),
+            'alertas': self.motor_alertas.estado(),
+            'limitadores': {nombre: l.estado() for nombre, l in self.limitadores.items()},
+            'escritores': {
+                nombre: {'escritos': e.escritos, 'errores': e.errores}
+                for nombre, e in self._escritores.items()
+            }
+        }
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+def ejecutar_arnes_carga(torres: int = 50_000, intervalo: float = 10.0, duracion: float = 60.0,
+                         backends: Optional[Set[str]] = None, modo_flota: bool = False) -> Dict:
+    """
+    Arnés de carga: simula `torres` torres sintéticas durante `duracion` segundos y mide
+    ticks por segundo, retraso respecto a la hora programada y uso de CPU del proceso.
+    Sin backends solo se mide el motor (generación, planificación y encolado).
+    """
+    gestor = AsyncSimulationManager(backends=backends or set(), intervalo=intervalo, modo_flota=modo_flota)
+    if not backends:
+        gestor.motor_alertas = MotorReglas(recargar=False)  # sin Redis: reglas por defecto
+    ids = [f"carga-{i:06d}" for i in range(torres)]
+
+    inicio = time.perf_counter()
+    cpu_inicio = time.process_time()
+    gestor.iniciar_torres(ids)
+    arranque = time.perf_counter() - inicio
+
+    time.sleep(duracion)
+    ticks = gestor.ticks
+    transcurrido = time.perf_counter() - inicio
+    cpu = time.process_time() - cpu_inicio
+    retrasos = list(gestor.retrasos)
+
+    gestor.detener_simulaciones()
+
+    return {
+        'torres': torres,
+        'modo': 'flota' if modo_flota else 'tareas',
+        'intervalo_s': intervalo,
+        'duracion_s': round(transcurrido, 2),
+        'arranque_s': round(arranque, 3),
+        'ticks': ticks,
+        'ticks_por_segundo': round(ticks / transcurrido, 1),
+        'ticks_esperados_por_segundo': round(torres / intervalo, 1),
+        'retraso_p50_ms': round(_percentil(retrasos, 50) * 1000, 2),
+        'retraso_p99_ms': round(_percentil(retrasos, 99) * 1000, 2),
+        'retraso_max_ms': round(max(retrasos, default=0.0) * 1000, 2),
+        'cpu_pct': round(100 * cpu / transcurrido, 1),
+        'histograma_ticks': gestor.histograma.resumen(),
+        'escritores': gestor.estadisticas()['escritores']
+    }
+
+
+# Instancia global (seleccionada con SIMULATION_ENGINE=asyncio)
+async_manager = AsyncSimulationManager()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Arnés de carga del motor de simulación asyncio")
+    parser.add_argument('--torres', type=int, default=50_000)
+    parser.add_argument('--intervalo', type=float, default=10.0)
+    parser.add_argument('--duracion', type=float, default=60.0)
+    parser.add_argument('--backends', default='', help="lista separada por comas: supabase,sqlite,redis")
+    parser.add_argument('--flota', action='store_true', help="tick vectorizado de toda la flota")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    backends = {b.strip() for b in args.backends.split(',') if b.strip()}
+    resultado = ejecutar_arnes_carga(args.torres, args.intervalo, args.duracion, backends, args.flota)
+    print(json.dumps(resultado, indent=2))
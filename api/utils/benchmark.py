@@ -0,0 +1,302 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Benchmarks de las rutas calientes de escritura y lectura sin servicios externos:
+# Supabase local (api.utils.supabase_local), SQLite temporal y Redis en proceso
+# (fakeredis). Uso:
+#
+#   python -m api.utils.benchmark                      # medir y comparar con la base
+#   python -m api.utils.benchmark --guardar            # medir y guardar como nueva base
+#   python -m api.utils.benchmark --arranque           # incluir tiempo hasta la primera petición
+
+RUTA_BASELINE = os.path.join('benchmarks', 'baseline.json')
+UMBRAL_REGRESION = 0.15  # empeoramiento relativo que se marca como regresión
+
+USUARIO_BENCH = 'usuario-bench'
+
+Caso = Tuple[Optional[Callable[[], None]], Callable[[int], None]]
+
+
+def preparar_entorno(directorio: str):
+    """
+    Arranca el Supabase local y redirige SUPABASE_URL, SQLITE_URL y Redis a los sustitutos.
+    Tiene que llamarse antes de importar api.database (que conecta al importarse).
+    """
+    from api.utils.supabase_local import CLAVE_LOCAL, ServidorSupabaseLocal
+
+    servidor = ServidorSupabaseLocal(os.path.join(directorio, 'supabase.sqlite3')).iniciar()
+    os.environ.update({
+        'SUPABASE_URL': servidor.url,
+        'SUPABASE_KEY': CLAVE_LOCAL,
+        'SUPABASE_SERVICE_ROLE_KEY': CLAVE_LOCAL,
+        'SQLITE_URL': f"sqlite:///{os.path.join(directorio, 'cache.sqlite3')}",
+        'SUPABASE_LOCAL': 'False',
+    })
+    _redis_en_proceso()
+    return servidor
+
+
+def _redis_en_proceso():
+    """Redis en proceso: todos los clientes creados con from_url comparten el mismo servidor"""
+    try:
+        import fakeredis
+    except ImportError:
+        raise RuntimeError("Los benchmarks necesitan fakeredis (pip install fakeredis)")
+    import redis
+
+    servidor_redis = fakeredis.FakeServer()
+    redis.Redis.from_url = classmethod(
+        lambda cls, url, **kwargs: fakeredis.FakeRedis(
+            server=servidor_redis, decode_responses=kwargs.get('decode_responses', False)
+        )
+    )
+
+
+def sembrar_datos(servidor, torres: int, lecturas: int):
+    """Torres del usuario de prueba con su histórico de lecturas y diagnósticos"""
+    from api.utils.simulator import generar_datos_meteorologicos, generar_diagnostico_tecnico
+
+    ahora = datetime.utcnow()
+    ids = [f"bench-{i:04d}" for i in range(torres)]
+    servidor.almacen.insertar('torres', [{
+        'id_torre': id_torre,
+        'nombre': f"Torre {id_torre}",
+        'ubicacion': {'lat': 4.6, 'lon': -74.1},
+        'usuario_asignado': USUARIO_BENCH,
+        'estado': 'activa',
+    } for id_torre in ids])
+
+    for id_torre in ids:
+        meteo, diagnosticos = [], []
+        for i in range(lecturas):
+            timestamp = (ahora - timedelta(minutes=10 * i)).isoformat()
+            meteo.append(dict(generar_datos_meteorologicos(id_torre), timestamp=timestamp))
+            if i % 10 == 0:
+                diagnostico = generar_diagnostico_tecnico(id_torre)
+                diagnostico['timestamp'] = timestamp
+                diagnostico['tiempo_ultima_conexion'] = timestamp
+                diagnosticos.append(diagnostico)
+        servidor.almacen.insertar('datos_meteorologicos', meteo)
+        servidor.almacen.insertar('diagnostico_tecnico', diagnosticos)
+    return ids
+
+
+def crear_casos(ids: List[str], tam_lote: int = 100) -> Dict[str, Caso]:
+    """Rutas medidas: (preparación opcional, operación i-ésima)"""
+    from flask import Flask
+
+    from api.database import db_manager, storage_manager
+    from api.routes.dashboard_bp import dashboard_usuario
+    from api.services.datos_service import DatosService
+    from api.utils.simulator import generar_datos_meteorologicos
+
+    app = Flask(__name__)
+    lecturas = [generar_datos_meteorologicos(ids[i % len(ids)]) for i in range(1000)]
+    lotes = [[generar_datos_meteorologicos(ids[(j + i) % len(ids)]) for i in range(tam_lote)] for j in range(20)]
+
+    def ultimas_en_cache():
+        for id_torre in ids:
+            storage_manager._save_to_redis(generar_datos_meteorologicos(id_torre))
+
+    def sin_cache():
+        db_manager.redis.delete(*[f"torre:{id_torre}:last_data" for id_torre in ids])
+
+    def estadisticas_sin_cache(i):
+        id_torre = ids[i % len(ids)]
+        db_manager.redis.delete(f"torre:{id_torre}:last_data")
+        DatosService.calcular_estadisticas(id_torre)
+
+    def dashboard(i):
+        with app.app_context():
+            # la vista sin jwt_required: se mide el trabajo del endpoint, no la autenticación
+            dashboard_usuario.__wrapped__(USUARIO_BENCH)
+
+    return {
+        'storage.save': (None, lambda i: storage_manager.save('meteorologico', lecturas[i % len(lecturas)])),
+        'storage.save_lote': (None, lambda i: storage_manager.save_lote('meteorologico', lotes[i % len(lotes)])),
+        'datos.calcular_estadisticas': (
+            ultimas_en_cache, lambda i: DatosService.calcular_estadisticas(ids[i % len(ids)])
+        ),
+        'datos.calcular_estadisticas_sin_cache': (sin_cache, estadisticas_sin_cache),
+        'dashboard.usuario': (ultimas_en_cache, dashboard),
+        'dashboard.usuario_sin_cache': (sin_cache, dashboard),
+    }
+
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+def medir(operar: Callable[[int], None], duracion: float, minimo: int = 30, calentamiento: int = 5) -> Dict:
+    """Repite la operación durante `duracion` segundos (y al menos `minimo` veces)"""
+    for i in range(calentamiento):
+        operar(i)
+
+    tiempos = []
+    inicio = time.perf_counter()
+    i = calentamiento
+    while time.perf_counter() - inicio < duracion or len(tiempos) < minimo:
+        t0 = time.perf_counter()
+        operar(i)
+        tiempos.append(time.perf_counter() - t0)
+        i += 1
+
+    tiempos.sort()
+    return {
+        'operaciones': len(tiempos),
+        'ops_s': round(len(tiempos) / sum(tiempos), 1),
+        'p50_ms': round(_percentil(tiempos, 50) * 1000, 3),
+        'p95_ms': round(_percentil(tiempos, 95) * 1000, 3),
+        'p99_ms': round(_percentil(tiempos, 99) * 1000, 3),
+    }
+
+
+def _arranque_hijo():
+    """
+    Proceso hijo de medir_arranque: importa api.main (crea la app), hace la primera
+    petición y espera a que /ready responda 200. Imprime los instantes (time.time()).
+    """
+    _redis_en_proceso()
+    from api.main import app
+
+    cliente = app.test_client()
+    respuesta = cliente.get('/ready')
+    primera = time.time()
+    while respuesta.status_code != 200:
+        time.sleep(0.01)
+        respuesta = cliente.get('/ready')
+    listo = time.time()
+    print(json.dumps({'primera_peticion': primera, 'listo': listo,
+                      'pasos': respuesta.get_json()['data']['pasos']}), flush=True)
+    os._exit(0)  # sin esperar a los hilos de simulación
+
+
+def medir_arranque(directorio: str, fast_boot: bool, repeticiones: int = 3) -> Dict:
+    """
+    Tiempo desde lanzar el intérprete hasta la primera respuesta y hasta /ready en 200,
+    contra el Supabase local ya sembrado (SUPABASE_URL del entorno) y una caché SQLite
+    vacía en cada repetición. Se queda la mediana.
+    """
+    medidas = []
+    for i in range(repeticiones):
+        entorno = dict(os.environ, FAST_BOOT=str(fast_boot),
+                       SQLITE_URL=f"sqlite:///{os.path.join(directorio, f'arranque_{fast_boot}_{i}.sqlite3')}")
+        inicio = time.time()
+        salida = subprocess.run([sys.executable, '-m', 'api.utils.benchmark', '--arranque-hijo'],
+                                env=entorno, capture_output=True, text=True, timeout=300)
+        if salida.returncode != 0:
+            raise RuntimeError(f"El arranque falló: {salida.stderr[-2000:]}")
+        datos = json.loads(salida.stdout.strip().splitlines()[-1])
+        medidas.append({
+            'primera_peticion_ms': round((datos['primera_peticion'] - inicio) * 1000, 1),
+            'listo_ms': round((datos['listo'] - inicio) * 1000, 1),
+            'pasos_ms': {nombre: paso.get('ms') for nombre, paso in datos['pasos'].items()},
+        })
+    medidas.sort(key=lambda m: m['primera_peticion_ms'])
+    return medidas[len(medidas) // 2]
+
+
+def comparar(resultado: Dict, baseline: Dict, umbral: float = UMBRAL_REGRESION) -> List[Dict]:
+    """Casos que empeoraron más que `umbral` en ops/s o en p95 (o el arranque) respecto a la base"""
+    regresiones = []
+    for modo, medida in resultado.get('arranque', {}).items():
+        base = baseline.get('arranque', {}).get(modo)
+        if base and medida['primera_peticion_ms'] > base['primera_peticion_ms'] * (1 + umbral):
+            regresiones.append({'caso': f"arranque.{modo}", 'metrica': 'primera_peticion_ms',
+                                'base': base['primera_peticion_ms'], 'actual': medida['primera_peticion_ms'],
+                                'cambio': round(medida['primera_peticion_ms'] / base['primera_peticion_ms'] - 1, 3)})
+    for nombre, medida in resultado['casos'].items():
+        base = baseline.get('casos', {}).get(nombre)
+        if not base:
+            continue
+        if medida['ops_s'] < base['ops_s'] * (1 - umbral):
+            regresiones.append({'caso': nombre, 'metrica': 'ops_s', 'base': base['ops_s'],
+                                'actual': medida['ops_s'], 'cambio': round(medida['ops_s'] / base['ops_s'] - 1, 3)})
+        if medida['p95_ms'] > base['p95_ms'] * (1 + umbral):
+            regresiones.append({'caso': nombre, 'metrica': 'p95_ms', 'base': base['p95_ms'],
+                                'actual': medida['p95_ms'], 'cambio': round(medida['p95_ms'] / base['p95_ms'] - 1, 3)})
+    return regresiones
+
+
+def ejecutar_benchmarks(casos: Optional[List[str]] = None, duracion: float = 3.0,
+                        torres: int = 10, lecturas: int = 100, latencia_ms: float = 0,
+                        jitter_ms: float = 0, tasa_errores: float = 0, arranque: bool = False) -> Dict:
+    with tempfile.TemporaryDirectory() as directorio:
+        servidor = preparar_entorno(directorio)
+        try:
+            ids = sembrar_datos(servidor, torres, lecturas)
+            servidor.configurar_red(latencia_ms, jitter_ms, tasa_errores)  # la siembra no la sufre
+            disponibles = crear_casos(ids)
+            resultado = {
+                'fecha': datetime.utcnow().isoformat(),
+                'python': sys.version.split()[0],
+                'torres': torres,
+                'lecturas_por_torre': lecturas,
+                'red': {'latencia_ms': latencia_ms, 'jitter_ms': jitter_ms, 'tasa_errores': tasa_errores},
+                'casos': {}
+            }
+            for nombre in casos or disponibles:
+                preparar, operar = disponibles[nombre]
+                if preparar:
+                    preparar()
+                resultado['casos'][nombre] = medir(operar, duracion)
+            if arranque:
+                resultado['arranque'] = {
+                    'serie': medir_arranque(directorio, fast_boot=False),
+                    'fast_boot': medir_arranque(directorio, fast_boot=True),
+                }
+            return resultado
+        finally:
+            from api.database import db_manager
+
+            db_manager.engine.dispose()
+            servidor.detener()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks de escritura y lectura contra sustitutos locales")
+    parser.add_argument('--casos', default='', help="lista separada por comas (por defecto todos)")
+    parser.add_argument('--duracion', type=float, default=3.0, help="segundos por caso")
+    parser.add_argument('--torres', type=int, default=10)
+    parser.add_argument('--lecturas', type=int, default=100, help="histórico sembrado por torre")
+    parser.add_argument('--latencia', type=float, default=0, help="ms de latencia del Supabase local")
+    parser.add_argument('--jitter', type=float, default=0, help="ms aleatorios adicionales por petición")
+    parser.add_argument('--errores', type=float, default=0, help="fracción de peticiones a Supabase que fallan")
+    parser.add_argument('--baseline', default=RUTA_BASELINE)
+    parser.add_argument('--umbral', type=float, default=UMBRAL_REGRESION)
+    parser.add_argument('--guardar', action='store_true', help="guardar el resultado como nueva base")
+    parser.add_argument('--arranque', action='store_true', help="medir también el tiempo hasta la primera petición")
+    parser.add_argument('--arranque-hijo', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.arranque_hijo:
+        _arranque_hijo()
+    if not args.guardar and not os.path.exists(args.baseline):
+        # sin base no hay comparación: fallar en lugar de dar por buena cualquier medida
+        parser.error(f"no existe la base {args.baseline}; genérala con --guardar")
+
+    logging.basicConfig(level=logging.WARNING)
+    casos = [c.strip() for c in args.casos.split(',') if c.strip()] or None
+    resultado = ejecutar_benchmarks(casos, args.duracion, args.torres, args.lecturas,
+                                    args.latencia, args.jitter, args.errores, args.arranque)
+
+    regresiones = []
+    if args.guardar:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(resultado, f, indent=2)
+    else:
+        with open(args.baseline) as f:
+            regresiones = comparar(resultado, json.load(f), args.umbral)
+        resultado['regresiones'] = regresiones
+
+    print(json.dumps(resultado, indent=2))
+    sys.exit(1 if regresiones else 0)
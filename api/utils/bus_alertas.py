@@ -0,0 +1,198 @@
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from api.utils.codec_redis import codificar_mensaje, decodificar
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+STREAM_ALERTAS = 'alertas:stream'
+STREAM_ALERTAS_FALLIDAS = 'alertas:stream:fallidas'
+GRUPO_NOTIFICACIONES = 'notificaciones'
+
+
+def entrada_alerta(mensaje: Dict, usuario: Optional[str] = None) -> Dict[str, str]:
+    """Campos de la entrada del stream: el mensaje (codec REDIS_CODEC) y las claves para filtrar"""
+    return {
+        'id_torre': mensaje['id_torre'],
+        'usuario': usuario or '',
+        'mensaje': codificar_mensaje(mensaje)
+    }
+
+
+def publicar_alerta(redis_client, mensaje: Dict, usuario: Optional[str] = None):
+    """
+    Añade la alerta al stream (persistente, con longitud acotada). Acepta también un
+    pipeline para agrupar la escritura con el PUBLISH en tiempo real.
+    """
+    return redis_client.xadd(
+        STREAM_ALERTAS,
+        entrada_alerta(mensaje, usuario),
+        maxlen=Config.ALERT_STREAM_MAXLEN,
+        approximate=True  # MAXLEN ~: recorta por nodos completos, mucho más barato
+    )
+
+
+def _orden_id(id_entrada) -> Tuple[int, int]:
+    """Los IDs de stream (ms-seq) se comparan numéricamente, no como texto"""
+    if isinstance(id_entrada, bytes):
+        id_entrada = id_entrada.decode()
+    ms, _, seq = id_entrada.partition('-')
+    return int(ms), int(seq or 0)
+
+
+class ConsumidorAlertas:
+    """
+    Consumidor de un grupo del stream de alertas. Cada worker lee lotes con XREADGROUP,
+    los entrega a `procesar` y confirma con XACK; las entradas que otro consumidor dejó
+    sin confirmar más de ALERT_STREAM_CLAIM_IDLE ms se reclaman con XAUTOCLAIM, y tras
+    ALERT_STREAM_MAX_DELIVERIES entregas fallidas pasan a alertas:stream:fallidas.
+    """
+
+    def __init__(self, redis_client, procesar: Callable[[List[Dict]], None],
+                 grupo: str = GRUPO_NOTIFICACIONES, consumidor: Optional[str] = None,
+                 tam_lote: int = None, bloqueo_ms: int = 2000):
+        self.redis = redis_client
+        self.procesar = procesar
+        self.grupo = grupo
+        self.consumidor = consumidor or f"{socket.gethostname()}:{os.getpid()}"
+        self.tam_lote = tam_lote or Config.ALERT_STREAM_BATCH
+        self.bloqueo_ms = bloqueo_ms
+        self.procesadas = 0
+        self.reclamadas = 0
+        self.fallidas = 0
+        self._parar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def crear_grupo(self):
+        try:
+            # '0': el grupo nuevo tambien entrega las alertas ya guardadas en el stream
+            self.redis.xgroup_create(STREAM_ALERTAS, self.grupo, id='0', mkstream=True)
+        except Exception as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    @staticmethod
+    def _decodificar(entradas) -> Tuple[List[str], List[Dict]]:
+        ids, mensajes = [], []
+        for id_entrada, campos in entradas:
+            if not campos:
+                continue  # entrada recortada por MAXLEN mientras estaba pendiente
+            id_entrada = id_entrada.decode() if isinstance(id_entrada, bytes) else id_entrada
+            valor = campos.get(b'mensaje', campos.get('mensaje'))
+            usuario = campos.get(b'usuario', campos.get('usuario')) or b''
+            mensaje = decodificar(valor)
+            mensaje['usuario'] = (usuario.decode() if isinstance(usuario, bytes) else usuario) or None
+            ids.append(id_entrada)
+            mensajes.append(mensaje)
+        return ids, mensajes
+
+    def _entregar(self, ids: List[str], mensajes: List[Dict]) -> bool:
+        if not ids:
+            return True
+        try:
+            self.procesar(mensajes)
+        except Exception as e:
+            # sin XACK: quedan pendientes y se reintentan al reclamarlas
+            logger.error(f"Error procesando lote de {len(ids)} alertas: {str(e)}")
+            return False
+        self.redis.xack(STREAM_ALERTAS, self.grupo, *ids)
+        self.procesadas += len(ids)
+        return True
+
+    def leer_lote(self) -> int:
+        """Lee, procesa y confirma un lote de alertas nuevas; devuelve cuántas leyó"""
+        respuesta = self.redis.xreadgroup(
+            self.grupo, self.consumidor, {STREAM_ALERTAS: '>'},
+            count=self.tam_lote, block=self.bloqueo_ms
+        )
+        leidas = 0
+        for _, entradas in respuesta or []:
+            ids, mensajes = self._decodificar(entradas)
+            self._entregar(ids, mensajes)
+            leidas += len(entradas)
+        return leidas
+
+    def reclamar_pendientes(self) -> int:
+        """Reclama las entradas abandonadas por consumidores caídos (o lotes que fallaron)"""
+        inicio, total = '0-0', 0
+        while True:
+            respuesta = self.redis.xautoclaim(
+                STREAM_ALERTAS, self.grupo, self.consumidor,
+                min_idle_time=Config.ALERT_STREAM_CLAIM_IDLE, start_id=inicio, count=self.tam_lote
+            )
+            inicio, entradas = respuesta[0], respuesta[1]
+            if entradas:
+                total += len(entradas)
+                # en Redis 6.2 las entradas ya recortadas llegan sin campos y siguen pendientes
+                vacias = [e[0] for e in entradas if not e[1]]
+                if vacias:
+                    self.redis.xack(STREAM_ALERTAS, self.grupo, *vacias)
+                self._descartar_agotadas(entradas)
+                ids, mensajes = self._decodificar(entradas)
+                self._entregar(ids, mensajes)
+            if not entradas or inicio in (b'0-0', '0-0'):
+                break
+        self.reclamadas += total
+        return total
+
+    def _descartar_agotadas(self, entradas):
+        """Mueve a alertas:stream:fallidas las entradas con demasiadas entregas"""
+        ids = sorted((e[0] for e in entradas if e[1]), key=_orden_id)
+        if not ids:
+            return
+        pendientes = self.redis.xpending_range(STREAM_ALERTAS, self.grupo, min=ids[0], max=ids[-1], count=len(ids))
+        agotadas = {p['message_id'] for p in pendientes
+                    if p['times_delivered'] > Config.ALERT_STREAM_MAX_DELIVERIES}
+        if not agotadas:
+            return
+        pipe = self.redis.pipeline()
+        for id_entrada, campos in entradas:
+            if id_entrada in agotadas and campos:
+                pipe.xadd(STREAM_ALERTAS_FALLIDAS, campos, maxlen=Config.ALERT_STREAM_MAXLEN, approximate=True)
+        pipe.xack(STREAM_ALERTAS, self.grupo, *agotadas)
+        pipe.execute()
+        self.fallidas += len(agotadas)
+        entradas[:] = [e for e in entradas if e[0] not in agotadas]
+        logger.warning(f"{len(agotadas)} alertas movidas a {STREAM_ALERTAS_FALLIDAS} tras varios reintentos")
+
+    # hilo de consumo
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self.crear_grupo()
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True, name="consumidor_alertas")
+        self._hilo.start()
+        logger.info(f"Consumidor de alertas iniciado ({self.grupo}/{self.consumidor})")
+
+    def _bucle(self):
+        proxima_reclamacion = 0.0
+        while not self._parar.is_set():
+            try:
+                if time.monotonic() >= proxima_reclamacion:
+                    self.reclamar_pendientes()
+                    proxima_reclamacion = time.monotonic() + Config.ALERT_STREAM_CLAIM_IDLE / 1000
+                self.leer_lote()
+            except Exception as e:
+                logger.error(f"Error consumiendo alertas: {str(e)}")
+                self._parar.wait(5)
+
+    def detener(self, timeout: float = 5):
+        self._parar.set()
+        if self._hilo:
+            self._hilo.join(timeout=timeout + self.bloqueo_ms / 1000)
+
+    def estado(self) -> Dict:
+        return {
+            'consumidor': self.consumidor,
+            'grupo': self.grupo,
+            'procesadas': self.procesadas,
+            'reclamadas': self.reclamadas,
+            'fallidas': self.fallidas
+        }
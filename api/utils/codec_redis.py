@@ -0,0 +1,241 @@
+import json
+import math
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Union
+
+import msgpack
+from dateutil.parser import parse
+
+from config.settings import Config
+
+# Formato de los valores en Redis. Los valores JSON se escriben tal cual (y los antiguos
+# siempre empiezan por '{'); los binarios llevan una cabecera de dos bytes: MAGIA (0xC1,
+# byte que msgpack nunca usa) y el tipo/versión, así las entradas viejas se siguen
+# pudiendo leer aunque cambie REDIS_CODEC.
+MAGIA = 0xC1
+TIPO_MSGPACK_V1 = 0x01
+TIPO_LECTURA_V1 = 0x02
+
+CODECS = ('json', 'msgpack', 'struct')
+
+# lectura meteorologica v1: timestamp en microsegundos y campos fijos (el ID va al final)
+CAMPOS_LECTURA_V1 = (
+    'temperatura', 'humedad_relativa', 'presion_atmosferica', 'velocidad_viento',
+    'direccion_viento', 'precipitacion', 'radiacion_solar', 'indice_uv',
+)
+_LECTURA_V1 = struct.Struct('<qffffHffB')
+_SIN_DIRECCION = 0xFFFF
+_SIN_UV = 0xFF
+_EPOCA = datetime(1970, 1, 1)
+_CLAVES_LECTURA = frozenset(('id_torre', 'timestamp') + CAMPOS_LECTURA_V1)
+_FLOTANTES_LECTURA_V1 = ('temperatura', 'humedad_relativa', 'presion_atmosferica', 'velocidad_viento',
+                         'precipitacion', 'radiacion_solar')
+# por debajo de este módulo el error de float32 (< 0.005) deja intactos los valores de 2 decimales
+_MAXIMO_EXACTO_FLOAT32 = 0.005 * 2 ** 24
+
+
+def _por_defecto(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return str(valor)
+
+
+# codecs
+
+def _json(valor: Any) -> bytes:
+    return json.dumps(valor, default=str).encode()
+
+
+def _msgpack(valor: Any) -> bytes:
+    return bytes((MAGIA, TIPO_MSGPACK_V1)) + msgpack.packb(valor, default=_por_defecto, use_bin_type=True)
+
+
+def _flotante(valor) -> float:
+    return math.nan if valor is None else float(valor)
+
+
+def _fecha(valor) -> Optional[datetime]:
+    """datetime UTC sin zona; ISO 8601 con fromisoformat y, si no, dateutil (como la sincronización)"""
+    if isinstance(valor, str):
+        try:
+            valor = datetime.fromisoformat(valor)
+        except ValueError:
+            try:
+                valor = parse(valor)
+            except (ValueError, OverflowError):
+                return None
+    if not isinstance(valor, datetime):
+        return None
+    if valor.tzinfo is not None:
+        valor = valor.astimezone(timezone.utc).replace(tzinfo=None)
+    return valor
+
+
+def _lectura_struct(datos: Dict) -> Optional[bytes]:
+    """
+    Lectura con campos fijos empaquetada (~35 bytes + ID); None si no tiene esa forma.
+    El formato guarda float32 redondeados a 2 decimales (suficiente para el simulador):
+    si algún valor no vuelve igual (p. ej. lecturas reales con más decimales) también
+    devuelve None y la lectura se guarda con msgpack, sin pérdida.
+    """
+    if not _CLAVES_LECTURA.issuperset(datos):
+        return None
+    timestamp = _fecha(datos.get('timestamp'))
+    if timestamp is None:
+        return None
+    micros = (timestamp - _EPOCA) // timedelta(microseconds=1)
+    direccion = datos.get('direccion_viento')
+    uv = datos.get('indice_uv')
+    try:
+        if (direccion is not None and direccion != int(direccion)) or (uv is not None and uv != int(uv)):
+            return None
+        for campo in _FLOTANTES_LECTURA_V1:
+            valor = datos.get(campo)
+            if valor is not None and not (-_MAXIMO_EXACTO_FLOAT32 < valor < _MAXIMO_EXACTO_FLOAT32
+                                          and round(valor, 2) == valor):
+                return None
+        empaquetada = _LECTURA_V1.pack(
+            micros,
+            _flotante(datos.get('temperatura')),
+            _flotante(datos.get('humedad_relativa')),
+            _flotante(datos.get('presion_atmosferica')),
+            _flotante(datos.get('velocidad_viento')),
+            _SIN_DIRECCION if direccion is None else int(direccion),
+            _flotante(datos.get('precipitacion')),
+            _flotante(datos.get('radiacion_solar')),
+            _SIN_UV if uv is None else int(uv),
+        )
+    except (struct.error, TypeError, ValueError, OverflowError):
+        return None
+    return bytes((MAGIA, TIPO_LECTURA_V1)) + empaquetada + datos['id_torre'].encode()
+
+
+def _redondear(valor: float) -> Optional[float]:
+    # los float32 se redondean a los 2 decimales con que se generan las lecturas
+    return None if valor != valor else round(valor, 2)
+
+
+def _leer_lectura_v1(cuerpo: memoryview) -> Dict:
+    (micros, temperatura, humedad, presion, viento, direccion,
+     precipitacion, radiacion, uv) = _LECTURA_V1.unpack_from(cuerpo)
+    return {
+        'id_torre': str(cuerpo[_LECTURA_V1.size:], 'utf-8'),
+        'timestamp': (_EPOCA + timedelta(microseconds=micros)).isoformat(),
+        'temperatura': _redondear(temperatura),
+        'humedad_relativa': _redondear(humedad),
+        'presion_atmosferica': _redondear(presion),
+        'velocidad_viento': _redondear(viento),
+        'direccion_viento': None if direccion == _SIN_DIRECCION else direccion,
+        'precipitacion': _redondear(precipitacion),
+        'radiacion_solar': _redondear(radiacion),
+        'indice_uv': None if uv == _SIN_UV else uv,
+    }
+
+
+# API
+
+def codificar_lectura(datos: Dict, codec: str = None) -> bytes:
+    """Valor de torre:<id>:last_data y de lecturas:<id> con el codec configurado"""
+    codec = codec or Config.REDIS_CODEC
+    if codec == 'struct':
+        empaquetada = _lectura_struct(datos)
+        if empaquetada is not None:
+            return empaquetada
+        return _msgpack(datos)
+    if codec == 'msgpack':
+        return _msgpack(datos)
+    return _json(datos)
+
+
+def codificar_mensaje(mensaje: Dict, codec: str = None) -> bytes:
+    """
+    Mensajes de alerta. Con 'struct' se usa msgpack y la lectura incluida (`datos`) va
+    empaquetada como lectura binaria en lugar de repetir los nombres de los campos.
+    """
+    codec = codec or Config.REDIS_CODEC
+    if codec == 'struct' and isinstance(mensaje.get('datos'), dict):
+        empaquetada = _lectura_struct(mensaje['datos'])
+        if empaquetada is not None:
+            mensaje = dict(mensaje, datos=empaquetada)
+        return _msgpack(mensaje)
+    if codec in ('msgpack', 'struct'):
+        return _msgpack(mensaje)
+    return _json(mensaje)
+
+
+def decodificar(valor: Union[bytes, str, None]) -> Any:
+    """Decodifica cualquier versión (JSON sin cabecera o binario con MAGIA + tipo)"""
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        return json.loads(valor)
+    vista = memoryview(valor)
+    if len(vista) < 2 or vista[0] != MAGIA:
+        return json.loads(valor)
+
+    tipo = vista[1]
+    if tipo == TIPO_LECTURA_V1:
+        return _leer_lectura_v1(vista[2:])
+    if tipo == TIPO_MSGPACK_V1:
+        resultado = msgpack.unpackb(vista[2:], raw=False)
+        if isinstance(resultado, dict) and isinstance(resultado.get('datos'), bytes):
+            resultado['datos'] = decodificar(resultado['datos'])
+        return resultado
+    raise ValueError(f"Tipo de valor Redis desconocido: {tipo}")
+
+
+def ejecutar_benchmark(lecturas: int = 50_000, seed: int = 0) -> Dict:
+    """Bytes por lectura/alerta y coste de codificar/decodificar de cada codec frente a JSON"""
+    import random
+    import time
+
+    from api.utils.simulator import SimuladorFlota
+
+    lote = SimuladorFlota([f"torre-{i:06d}" for i in range(lecturas)], seed=seed).tick()
+    registros = lote.registros_meteo()
+    diagnosticos = lote.registros_diagnostico()
+    rng = random.Random(seed)
+    alertas = [{
+        'id_torre': datos['id_torre'],
+        'timestamp': datos['timestamp'],
+        'alertas': ["Temperatura alta: 36.2°C"],
+        'resueltas': [],
+        'activas': ['temperatura_alta'],
+        'datos': datos,
+        'diagnostico': diag
+    } for datos, diag in rng.sample(list(zip(registros, diagnosticos)), min(lecturas, 5_000))]
+
+    resultado = {'lecturas': lecturas, 'codecs': {}}
+    for codec in CODECS:
+        medidas = {}
+        for nombre, valores, codificar in (('lectura', registros, codificar_lectura),
+                                          ('alerta', alertas, codificar_mensaje)):
+            inicio = time.perf_counter()
+            codificados = [codificar(v, codec) for v in valores]
+            t_codificar = time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            for v in codificados:
+                decodificar(v)
+            t_decodificar = time.perf_counter() - inicio
+            medidas[nombre] = {
+                'bytes': round(sum(map(len, codificados)) / len(codificados), 1),
+                'codificar_us': round(t_codificar / len(valores) * 1e6, 2),
+                'decodificar_us': round(t_decodificar / len(valores) * 1e6, 2),
+            }
+        resultado['codecs'][codec] = medidas
+
+    base = resultado['codecs']['json']
+    for medidas in resultado['codecs'].values():
+        for nombre in ('lectura', 'alerta'):
+            medidas[nombre]['bytes_vs_json'] = round(medidas[nombre]['bytes'] / base[nombre]['bytes'], 2)
+    return resultado
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark de los codecs de valores Redis")
+    parser.add_argument('--lecturas', type=int, default=50_000)
+    args = parser.parse_args()
+    print(json.dumps(ejecutar_benchmark(args.lecturas), indent=2))
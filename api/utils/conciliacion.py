@@ -0,0 +1,389 @@
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from api.database import db_manager
+from api.utils.sincronizacion import (
+    TABLAS,
+    TABLAS_ESPEJO,
+    TAM_LOTE_UPSERT,
+    _escritura_sqlite,
+    _fecha,
+    _normalizar,
+    obtener_modelo,
+    upsert_sqlite,
+)
+
+logger = logging.getLogger(__name__)
+
+# Conciliación SQLite <-> Supabase por cubetas. Cada fila aporta un hash de 60 bits de
+# (clave primaria, marca de tiempo en microsegundos) y cada cubeta guarda el número de
+# filas y la suma de esos hashes módulo 2^60: no depende del orden y se calcula en el
+# servidor con la función conciliacion_resumen (FUNCION_RPC). Solo las cubetas que no
+# coinciden se abren al siguiente nivel (día -> hora -> filas) y al final se copian las
+# filas que faltan o difieren, de modo que verificar millones de filas mueve kilobytes.
+#
+# El hash cubre la clave y la marca de tiempo: detecta filas que faltan, sobran o se
+# modificaron (torres/profiles cambian su columna de marca al editarse; las lecturas no
+# cambian). Si Supabase no tiene la función se hace lo mismo en el cliente pidiendo solo
+# esas dos columnas.
+
+MODULO_HASH = 1 << 60
+NIVELES_TIEMPO = ('dia', 'hora')
+NIVELES_CLAVE = ('prefijo',)
+FUNCION = 'conciliacion_resumen'
+
+FUNCION_RPC = """
+create or replace function conciliacion_resumen(
+    p_tabla text, p_clave text, p_columna text, p_nivel text,
+    p_desde timestamptz default null, p_hasta timestamptz default null,
+    p_nulos boolean default false, p_prefijo text default null
+) returns table(cubeta text, filas bigint, hash text)
+language plpgsql stable
+set timezone to 'UTC'
+as $$
+declare
+    v_fecha text := case when p_columna is null then 'null::timestamptz' else format('%I::timestamptz', p_columna) end;
+    v_cubeta text;
+    v_filtro text := 'true';
+begin
+    v_cubeta := case p_nivel
+        when 'dia' then format('coalesce(to_char(%s, ''YYYY-MM-DD''), ''null'')', v_fecha)
+        when 'hora' then format('coalesce(to_char(%s, ''YYYY-MM-DD"T"HH24''), ''null'')', v_fecha)
+        else format('left(%I::text, 1)', p_clave)
+    end;
+    if p_nulos then
+        v_filtro := format('%s is null', v_fecha);
+    elsif p_desde is not null then
+        v_filtro := format('%s >= %L and %s < %L', v_fecha, p_desde, v_fecha, p_hasta);
+    end if;
+    if p_prefijo is not null then
+        v_filtro := v_filtro || format(' and %I::text like %L', p_clave, p_prefijo || '%');
+    end if;
+    return query execute format(
+        'select %s, count(*), (sum((''x'' || substr(md5(%I::text || '':'' || '
+        'coalesce(floor(extract(epoch from %s) * 1000000)::bigint::text, '''')), 1, 15))::bit(60)::bigint::numeric) '
+        '%% 1152921504606846976)::text from %I where %s group by 1',
+        v_cubeta, p_clave, v_fecha, p_tabla, v_filtro
+    );
+end;
+$$;
+"""
+
+_EPOCA = datetime(1970, 1, 1)
+
+
+# hashes y cubetas (mismas reglas que FUNCION_RPC)
+
+def _utc(valor) -> Optional[datetime]:
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, str):
+        return _fecha(valor)
+    if valor.tzinfo is not None:
+        return valor.astimezone(timezone.utc).replace(tzinfo=None)
+    return valor
+
+
+def hash_fila(clave, fecha: Optional[datetime]) -> int:
+    micros = '' if fecha is None else str((fecha - _EPOCA) // timedelta(microseconds=1))
+    return int(hashlib.md5(f"{clave}:{micros}".encode()).hexdigest()[:15], 16)
+
+
+def cubeta(nivel: str, clave, fecha: Optional[datetime]) -> str:
+    if nivel == 'prefijo':
+        return str(clave)[:1]
+    if fecha is None:
+        return 'null'
+    return fecha.strftime('%Y-%m-%d') if nivel == 'dia' else fecha.strftime('%Y-%m-%dT%H')
+
+
+def rango(nivel_padre: Optional[str], padre: Optional[str]) -> Dict:
+    """Filtro de las filas de una cubeta del nivel anterior"""
+    if nivel_padre is None:
+        return {}
+    if nivel_padre == 'prefijo':
+        return {'prefijo': padre}
+    if padre == 'null':
+        return {'nulos': True}
+    if nivel_padre == 'dia':
+        desde = datetime.strptime(padre, '%Y-%m-%d')
+        return {'desde': desde, 'hasta': desde + timedelta(days=1)}
+    desde = datetime.strptime(padre, '%Y-%m-%dT%H')
+    return {'desde': desde, 'hasta': desde + timedelta(hours=1)}
+
+
+def resumir(filas: Iterable[Tuple], nivel: str) -> Dict[str, Tuple[int, int]]:
+    """(clave, fecha UTC) -> {cubeta: (filas, hash)}"""
+    resumen: Dict[str, List[int]] = {}
+    for clave, fecha in filas:
+        total = resumen.setdefault(cubeta(nivel, clave, fecha), [0, 0])
+        total[0] += 1
+        total[1] = (total[1] + hash_fila(clave, fecha)) % MODULO_HASH
+    return {nombre: (filas, valor) for nombre, (filas, valor) in resumen.items()}
+
+
+def _en_rango(filtro: Dict, clave, fecha: Optional[datetime]) -> bool:
+    if filtro.get('nulos'):
+        return fecha is None
+    if 'desde' in filtro and (fecha is None or not filtro['desde'] <= fecha < filtro['hasta']):
+        return False
+    return 'prefijo' not in filtro or str(clave).startswith(filtro['prefijo'])
+
+
+# lado SQLite
+
+def _columnas(tabla: str):
+    modelo = obtener_modelo(tabla)
+    clave = next(iter(modelo.__table__.primary_key.columns))
+    columna = TABLAS[tabla][2]
+    return modelo, clave, modelo.__table__.columns[columna] if columna else None
+
+
+def filas_locales(tabla: str, filtro: Dict) -> Iterable[Tuple]:
+    modelo, clave, columna = _columnas(tabla)
+    consulta = select(clave, columna) if columna is not None else select(clave)
+    if filtro.get('nulos'):
+        consulta = consulta.where(columna.is_(None))
+    elif 'desde' in filtro:
+        consulta = consulta.where(columna >= filtro['desde'], columna < filtro['hasta'])
+    if 'prefijo' in filtro:
+        consulta = consulta.where(clave.like(f"{filtro['prefijo']}%"))
+    with db_manager.engine.connect() as conn:
+        for fila in conn.execution_options(stream_results=True).execute(consulta):
+            yield fila[0], _utc(fila[1]) if columna is not None else None
+
+
+# lado Supabase
+
+class LadoRemoto:
+    """Consultas a Supabase de una conciliación; cuenta los bytes recibidos"""
+
+    def __init__(self, usar_rpc: bool = True, tam_pagina: int = 1000):
+        self.usar_rpc = usar_rpc
+        self.tam_pagina = tam_pagina
+        self.bytes = 0
+        self.peticiones = 0
+
+    def _datos(self, respuesta) -> List[Dict]:
+        datos = respuesta.data or []
+        self.peticiones += 1
+        self.bytes += len(json.dumps(datos, default=str))
+        return datos
+
+    def resumen(self, tabla: str, nivel: str, filtro: Dict) -> Dict[str, Tuple[int, int]]:
+        if self.usar_rpc:
+            _, clave, columna = _columnas(tabla)
+            parametros = {
+                'p_tabla': tabla, 'p_clave': clave.name, 'p_columna': columna.name if columna is not None else None,
+                'p_nivel': nivel, 'p_nulos': bool(filtro.get('nulos')), 'p_prefijo': filtro.get('prefijo'),
+                'p_desde': filtro['desde'].isoformat() if 'desde' in filtro else None,
+                'p_hasta': filtro['hasta'].isoformat() if 'hasta' in filtro else None,
+            }
+            try:
+                datos = self._datos(db_manager.supabase.rpc(FUNCION, parametros).execute())
+                return {d['cubeta']: (int(d['filas']), int(d['hash'])) for d in datos}
+            except Exception as e:
+                # sin la función instalada se calcula en el cliente (solo clave y marca)
+                logger.warning(f"RPC {FUNCION} no disponible, resumen en el cliente: {str(e)}")
+                self.usar_rpc = False
+        return resumir(self.filas(tabla, filtro), nivel)
+
+    def filas(self, tabla: str, filtro: Dict) -> Iterable[Tuple]:
+        """(clave, fecha) de las filas del filtro, por keyset sobre la clave"""
+        _, clave, columna = _columnas(tabla)
+        campos = clave.name + (f",{columna.name}" if columna is not None else '')
+        ultima = None
+        while True:
+            consulta = db_manager.supabase.table(tabla).select(campos)
+            if filtro.get('nulos'):
+                consulta = consulta.is_(columna.name, 'null')
+            elif 'desde' in filtro:
+                consulta = consulta.gte(columna.name, filtro['desde'].isoformat()).lt(columna.name, filtro['hasta'].isoformat())
+            if 'prefijo' in filtro:
+                consulta = consulta.like(clave.name, f"{filtro['prefijo']}*")
+            if ultima is not None:
+                consulta = consulta.gt(clave.name, ultima)
+            datos = self._datos(consulta.order(clave.name).limit(self.tam_pagina).execute())
+            if not datos:
+                return
+            for fila in datos:
+                fecha = _utc(fila.get(columna.name)) if columna is not None else None
+                if _en_rango(filtro, fila[clave.name], fecha):
+                    yield fila[clave.name], fecha
+            ultima = datos[-1][clave.name]
+
+    def filas_completas(self, tabla: str, claves: List) -> List[Dict]:
+        _, clave, _ = _columnas(tabla)
+        filas = []
+        for i in range(0, len(claves), 200):
+            filas.extend(self._datos(
+                db_manager.supabase.table(tabla).select('*').in_(clave.name, claves[i:i + 200]).execute()
+            ))
+        return filas
+
+
+# comparación y reparación
+
+def _comparar(local: Dict, remoto: Dict) -> List[str]:
+    return sorted(c for c in set(local) | set(remoto) if local.get(c) != remoto.get(c))
+
+
+def _serializable(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+
+def _reparar(tabla: str, remoto: LadoRemoto, faltantes: List, sobrantes: List, distintas: List) -> Dict:
+    """
+    Supabase manda: lo que falta o difiere en SQLite se copia de allí. Lo que sobra en
+    SQLite se borra en las tablas espejo y se sube a Supabase en las de lecturas (son
+    filas que Supabase no llegó a recibir).
+    """
+    modelo, clave, _ = _columnas(tabla)
+    copiadas = subidas = borradas = 0
+
+    bajar = faltantes + distintas
+    if bajar:
+        filas = remoto.filas_completas(tabla, bajar)
+        if filas:
+            with _escritura_sqlite:
+                copiadas = upsert_sqlite(modelo, _normalizar(tabla, modelo, filas))
+
+    if sobrantes:
+        if tabla in TABLAS_ESPEJO:
+            with _escritura_sqlite, db_manager.engine.begin() as conn:
+                for i in range(0, len(sobrantes), TAM_LOTE_UPSERT):
+                    conn.execute(modelo.__table__.delete().where(clave.in_(sobrantes[i:i + TAM_LOTE_UPSERT])))
+            borradas = len(sobrantes)
+        else:
+            with db_manager.engine.connect() as conn:
+                for i in range(0, len(sobrantes), TAM_LOTE_UPSERT):
+                    filas = conn.execute(
+                        modelo.__table__.select().where(clave.in_(sobrantes[i:i + TAM_LOTE_UPSERT]))
+                    ).mappings().all()
+                    lote = [{k: _serializable(v) for k, v in fila.items()} for fila in filas]
+                    db_manager.supabase.table(tabla).insert(lote).execute()
+                    subidas += len(lote)
+
+    return {'copiadas': copiadas, 'subidas': subidas, 'borradas': borradas}
+
+
+def conciliar_tabla(tabla: str, reparar: bool = False, usar_rpc: bool = True) -> Dict:
+    """Compara una tabla por cubetas, baja solo por las distintas y (con `reparar`) las corrige"""
+    inicio = time.perf_counter()
+    niveles = NIVELES_TIEMPO if TABLAS[tabla][2] else NIVELES_CLAVE
+    remoto = LadoRemoto(usar_rpc=usar_rpc)
+
+    # (nivel del padre, cubeta del padre) pendientes de abrir
+    pendientes: List[Tuple[Optional[str], Optional[str]]] = [(None, None)]
+    cubetas_revisadas = cubetas_distintas = 0
+    filas_locales_total = filas_remotas_total = None
+
+    for nivel in niveles:
+        siguientes = []
+        for nivel_padre, padre in pendientes:
+            filtro = rango(nivel_padre, padre)
+            local = resumir(filas_locales(tabla, filtro), nivel)
+            resumen_remoto = remoto.resumen(tabla, nivel, filtro)
+            if nivel_padre is None:
+                filas_locales_total = sum(f for f, _ in local.values())
+                filas_remotas_total = sum(f for f, _ in resumen_remoto.values())
+            distintas = _comparar(local, resumen_remoto)
+            cubetas_revisadas += len(set(local) | set(resumen_remoto))
+            cubetas_distintas += len(distintas)
+            siguientes.extend((nivel, c) for c in distintas)
+        pendientes = siguientes
+        if not pendientes:
+            break
+    hojas = pendientes
+
+    # nivel de filas: clave -> fecha en ambos lados de cada cubeta distinta
+    faltantes, sobrantes, distintas = [], [], []
+    for nivel, nombre in hojas:
+        filtro = rango(nivel, nombre)
+        local = dict(filas_locales(tabla, filtro))
+        remotas = dict(remoto.filas(tabla, filtro))
+        faltantes.extend(c for c in remotas if c not in local)
+        sobrantes.extend(c for c in local if c not in remotas)
+        distintas.extend(c for c in remotas if c in local and remotas[c] != local[c])
+    # una fila cuya marca cambió cae en cubetas distintas a cada lado: no falta ni sobra
+    movidas = set(faltantes) & set(sobrantes)
+    if movidas:
+        faltantes = [c for c in faltantes if c not in movidas]
+        sobrantes = [c for c in sobrantes if c not in movidas]
+        distintas.extend(movidas)
+
+    resultado = {
+        'tabla': tabla,
+        'filas_sqlite': filas_locales_total,
+        'filas_supabase': filas_remotas_total,
+        'cubetas_revisadas': cubetas_revisadas,
+        'cubetas_distintas': cubetas_distintas,
+        'faltantes_sqlite': len(faltantes),
+        'sobrantes_sqlite': len(sobrantes),
+        'distintas': len(distintas),
+        'rpc': remoto.usar_rpc,
+        'peticiones_supabase': remoto.peticiones,
+        'bytes_supabase': remoto.bytes,
+    }
+    if reparar and (faltantes or sobrantes or distintas):
+        resultado['reparacion'] = _reparar(tabla, remoto, faltantes, sobrantes, distintas)
+        resultado['peticiones_supabase'] = remoto.peticiones
+        resultado['bytes_supabase'] = remoto.bytes
+    resultado['segundos'] = round(time.perf_counter() - inicio, 3)
+
+    logger.info(
+        f"Conciliación de {tabla}: {cubetas_distintas}/{cubetas_revisadas} cubetas distintas, "
+        f"{len(faltantes)} faltan, {len(sobrantes)} sobran, {len(distintas)} difieren en SQLite "
+        f"({remoto.bytes} bytes de Supabase)"
+    )
+    return resultado
+
+
+def funcion_rpc_local(almacen, p_tabla, p_clave, p_columna, p_nivel, p_desde=None, p_hasta=None,
+                      p_nulos=False, p_prefijo=None) -> List[Dict]:
+    """Equivalente de FUNCION_RPC para el Supabase local (registrar_funcion)"""
+    campos = p_clave + (f",{p_columna}" if p_columna else '')
+    filtro = {}
+    if p_nulos:
+        filtro['nulos'] = True
+    elif p_desde:
+        filtro.update(desde=_utc(p_desde), hasta=_utc(p_hasta))
+    if p_prefijo:
+        filtro['prefijo'] = p_prefijo
+    filas = (
+        (fila[p_clave], _utc(fila.get(p_columna)) if p_columna else None)
+        for fila in almacen.consultar(p_tabla, select=campos)
+    )
+    resumen = resumir(((c, f) for c, f in filas if _en_rango(filtro, c, f)), p_nivel)
+    return [{'cubeta': c, 'filas': n, 'hash': str(h)} for c, (n, h) in resumen.items()]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from config.settings import Config
+
+    parser = argparse.ArgumentParser(description="Concilia SQLite con Supabase por cubetas con hash")
+    parser.add_argument('--tablas', default=','.join(Config.SYNC_TABLES))
+    parser.add_argument('--reparar', action='store_true', help="copiar las filas que faltan o difieren")
+    parser.add_argument('--sin-rpc', action='store_true', help="calcular los resúmenes remotos en el cliente")
+    parser.add_argument('--sql', action='store_true', help="mostrar la función SQL para instalarla en Supabase")
+    args = parser.parse_args()
+
+    if args.sql:
+        print(FUNCION_RPC)
+    else:
+        logging.basicConfig(level=logging.INFO)
+        tablas = [t.strip() for t in args.tablas.split(',') if t.strip()]
+        print(json.dumps([conciliar_tabla(t, args.reparar, not args.sin_rpc) for t in tablas], indent=2))
@@ -0,0 +1,263 @@
+import math
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config.settings import Config
+
+
+@dataclass(frozen=True)
+class PerfilEscenario:
+    """Parámetros de un escenario de simulación (clima, frentes, fallos y batería)"""
+    nombre: str
+    temp_media: float = 22.0
+    amplitud_diurna: float = 7.0        # °C entre la media y el maximo de la tarde
+    ruido_temp: float = 0.4             # desviacion del ruido AR(1)
+    humedad_media: float = 60.0
+    correlacion_humedad: float = -2.5   # %HR por cada °C de desviacion de la media
+    frentes_por_dia: float = 0.0        # frentes (comunes a toda la flota) por dia simulado
+    duracion_frente_h: float = 6.0
+    fallos_por_dia: float = 0.0         # rachas de fallo de sensor por torre y dia
+    duracion_fallo_h: float = 1.0
+    consumo_bateria_h: float = 1.0      # %/h
+    carga_solar_h: float = 3.5          # %/h con radiacion maxima (el sol medio diario es ~0.32)
+
+
+PERFILES: Dict[str, PerfilEscenario] = {
+    'diurno': PerfilEscenario('diurno'),
+    'tormentas': PerfilEscenario('tormentas', frentes_por_dia=1.5, duracion_frente_h=8.0),
+    'fallos': PerfilEscenario('fallos', fallos_por_dia=3.0, duracion_fallo_h=0.5),
+    'bateria': PerfilEscenario('bateria', consumo_bateria_h=4.0, carga_solar_h=10.0),
+    'completo': PerfilEscenario(
+        'completo', frentes_por_dia=1.0, fallos_por_dia=1.0,
+        consumo_bateria_h=1.2, carga_solar_h=4.0
+    ),
+}
+
+
+@dataclass
+class EstadoTorre:
+    """Estado que evoluciona tick a tick para una torre"""
+    rng: random.Random
+    desfase_temp: float
+    paso: int = -1
+    ruido_temp: float = 0.0
+    presion: float = 1013.0
+    direccion: float = 180.0
+    bateria: float = 100.0
+    fallo_temp_h: float = 0.0   # horas restantes de la racha de fallo
+    fallo_hum_h: float = 0.0
+    ultima_temp: Optional[float] = None
+    ultima_humedad: Optional[float] = None
+    ultima_conexion: Optional[datetime] = None
+
+
+class SimuladorEscenario:
+    """
+    Simulación determinista a partir de una semilla: cada torre tiene su propio generador
+    derivado de (semilla, id_torre) y los frentes dependen solo de la semilla, así que
+    afectan a toda la flota a la vez. El tiempo simulado avanza `aceleracion` veces más
+    rápido que el real, y `reproducir` genera la misma secuencia sin esperar.
+
+    En vivo el instante inicial es el reloj real, así que las marcas de tiempo son las
+    actuales. Para repeticiones exactas se fija con `inicio` (SIMULATION_START) o, con
+    `reproducir` y sin `inicio`, se redondea a la hora en punto.
+    """
+
+    def __init__(self, perfil: PerfilEscenario, seed: int = 0, inicio: Optional[datetime] = None,
+                 intervalo: float = None, aceleracion: float = 1.0):
+        self.perfil = perfil
+        self.seed = seed
+        self.inicio = inicio or datetime.utcnow()
+        self._inicio_fijo = inicio is not None
+        self.intervalo = intervalo or Config.SIMULATION_INTERVAL
+        self.aceleracion = aceleracion
+        self._torres: Dict[str, EstadoTorre] = {}
+        self._lock = threading.Lock()
+        self._t0 = time.monotonic()
+
+    # tiempo simulado
+
+    def instante(self, paso: int) -> datetime:
+        return self.inicio + timedelta(seconds=paso * self.intervalo * self.aceleracion)
+
+    def paso_actual(self) -> int:
+        """Paso correspondiente al reloj real desde la creación del simulador"""
+        return int((time.monotonic() - self._t0) / self.intervalo)
+
+    # estado por torre
+
+    def _estado(self, id_torre: str) -> EstadoTorre:
+        estado = self._torres.get(id_torre)
+        if estado is None:
+            with self._lock:
+                estado = self._torres.get(id_torre)
+                if estado is None:
+                    rng = random.Random((self.seed << 32) ^ zlib.crc32(id_torre.encode()))
+                    estado = EstadoTorre(
+                        rng=rng,
+                        desfase_temp=rng.uniform(-3.0, 3.0),
+                        presion=1013.0 + rng.uniform(-5.0, 5.0),
+                        direccion=rng.uniform(0, 360),
+                        bateria=rng.uniform(60.0, 100.0),
+                    )
+                    self._torres[id_torre] = estado
+        return estado
+
+    @lru_cache(maxsize=64)
+    def _frentes_del_dia(self, dia: int) -> Tuple[Tuple[float, float], ...]:
+        """Frentes (hora de inicio, intensidad) de un día simulado, iguales para toda la flota"""
+        rng = random.Random(f"{self.seed}:frentes:{dia}")
+        frentes = []
+        esperado = self.perfil.frentes_por_dia
+        while esperado > 0:
+            if rng.random() < min(esperado, 1.0):
+                frentes.append((rng.uniform(0, 24), rng.uniform(0.5, 1.0)))
+            esperado -= 1.0
+        return tuple(frentes)
+
+    def _intensidad_frente(self, instante: datetime) -> float:
+        if not self.perfil.frentes_por_dia:
+            return 0.0
+        horas = (instante - self.inicio).total_seconds() / 3600
+        dia = int(horas // 24)
+        intensidad = 0.0
+        for d in (dia - 1, dia):
+            for hora_inicio, fuerza in self._frentes_del_dia(d):
+                fase = (horas - (d * 24 + hora_inicio)) / self.perfil.duracion_frente_h
+                if 0.0 <= fase <= 1.0:
+                    intensidad = max(intensidad, fuerza * math.sin(math.pi * fase))
+        return intensidad
+
+    # generacion
+
+    def generar(self, id_torre: str, paso: Optional[int] = None) -> Tuple[dict, dict]:
+        """Genera la lectura y el diagnóstico de una torre para un paso de tiempo simulado"""
+        estado = self._estado(id_torre)
+        paso = self.paso_actual() if paso is None else paso
+        if paso <= estado.paso:
+            paso = estado.paso + 1
+        dt_h = (paso - estado.paso) * self.intervalo * self.aceleracion / 3600 if estado.paso >= 0 else 0.0
+        estado.paso = paso
+
+        p = self.perfil
+        rng = estado.rng
+        instante = self.instante(paso)
+        hora = instante.hour + instante.minute / 60 + instante.second / 3600
+        frente = self._intensidad_frente(instante)
+        sol = max(0.0, math.sin(math.pi * (hora - 6) / 12)) * (1 - 0.7 * frente)
+
+        # temperatura: sinusoide diurna (maximo hacia las 15h) + ruido AR(1) + caida con frentes
+        estado.ruido_temp = 0.9 * estado.ruido_temp + rng.gauss(0, p.ruido_temp)
+        temperatura = (p.temp_media + estado.desfase_temp
+                       + p.amplitud_diurna * math.sin(2 * math.pi * (hora - 9) / 24)
+                       + estado.ruido_temp - 6.0 * frente)
+
+        # humedad inversamente correlacionada con la temperatura
+        humedad = (p.humedad_media + p.correlacion_humedad * (temperatura - p.temp_media - estado.desfase_temp)
+                   + 25.0 * frente + rng.gauss(0, 1.5))
+        humedad = min(100.0, max(5.0, humedad))
+
+        # presion: paseo aleatorio con reversion a la media
+        estado.presion += 0.05 * (1013.0 - estado.presion) + rng.gauss(0, 0.3)
+        presion = estado.presion - 15.0 * frente
+
+        estado.direccion = (estado.direccion + rng.gauss(0, 10 + 40 * frente)) % 360
+        viento = max(0.0, 3.0 + abs(rng.gauss(0, 2.0)) + 20.0 * frente)
+        precipitacion = 10.0 * frente * rng.random() if frente > 0.2 else 0.0
+        radiacion = max(0.0, 1000.0 * sol + rng.gauss(0, 15) * (sol > 0))
+
+        # bateria: descarga constante y carga solar
+        estado.bateria += (p.carga_solar_h * sol - p.consumo_bateria_h) * dt_h
+        estado.bateria = min(100.0, max(0.0, estado.bateria))
+
+        # rachas de fallo de sensor (cadena de Markov por torre)
+        estado.fallo_temp_h = self._avanzar_fallo(rng, estado.fallo_temp_h, dt_h)
+        estado.fallo_hum_h = self._avanzar_fallo(rng, estado.fallo_hum_h, dt_h)
+        fallo_temp = estado.fallo_temp_h > 0
+        fallo_hum = estado.fallo_hum_h > 0
+
+        # un sensor en fallo repite su ultimo valor valido
+        if fallo_temp and estado.ultima_temp is not None:
+            temperatura = estado.ultima_temp
+        if fallo_hum and estado.ultima_humedad is not None:
+            humedad = estado.ultima_humedad
+        estado.ultima_temp, estado.ultima_humedad = temperatura, humedad
+
+        # sin bateria no hay conexion: la ultima conexion queda congelada
+        sin_conexion = estado.bateria < 5.0
+        if not sin_conexion or estado.ultima_conexion is None:
+            estado.ultima_conexion = instante - timedelta(seconds=rng.uniform(0, 120))
+
+        if estado.bateria < 10.0 or sin_conexion or (fallo_temp and fallo_hum):
+            estado_general = "Crítico"
+        elif estado.bateria < 20.0 or fallo_temp or fallo_hum:
+            estado_general = "Alerta"
+        else:
+            estado_general = "Normal"
+
+        datos = {
+            "id_torre": id_torre,
+            "timestamp": instante.isoformat(),
+            "temperatura": round(temperatura, 2),
+            "humedad_relativa": round(humedad, 2),
+            "presion_atmosferica": round(presion, 2),
+            "velocidad_viento": round(viento, 2),
+            "direccion_viento": int(estado.direccion),
+            "precipitacion": round(precipitacion, 2),
+            "radiacion_solar": round(radiacion, 2),
+            "indice_uv": int(round(11 * sol)),
+        }
+        diagnostico = {
+            "id_torre": id_torre,
+            "timestamp": instante.isoformat(),
+            "nivel_bateria": round(estado.bateria, 2),
+            "tiempo_ultima_conexion": estado.ultima_conexion,
+            "estado_sensor_temperatura": "Error" if fallo_temp else "OK",
+            "estado_sensor_humedad": "Error" if fallo_hum else "OK",
+            "estado_general": estado_general,
+        }
+        return datos, diagnostico
+
+    def _avanzar_fallo(self, rng: random.Random, restante_h: float, dt_h: float) -> float:
+        if restante_h > 0:
+            return max(0.0, restante_h - dt_h)
+        if self.perfil.fallos_por_dia and rng.random() < self.perfil.fallos_por_dia * dt_h / 24:
+            return rng.expovariate(1 / self.perfil.duracion_fallo_h)
+        return 0.0
+
+    def reproducir(self, ids_torre: List[str], pasos: int) -> Iterator[Tuple[dict, dict]]:
+        """Genera `pasos` ticks para cada torre sin esperar (mismo resultado en cada ejecución)"""
+        if not self._inicio_fijo:
+            self.inicio = self.inicio.replace(minute=0, second=0, microsecond=0)
+            self._inicio_fijo = True
+        for paso in range(pasos):
+            for id_torre in ids_torre:
+                yield self.generar(id_torre, paso)
+
+
+_escenario: Optional[SimuladorEscenario] = None
+_escenario_lock = threading.Lock()
+
+def obtener_escenario() -> Optional[SimuladorEscenario]:
+    """Simulador de escenario configurado en SIMULATION_SCENARIO (None para datos uniformes)"""
+    global _escenario
+    if Config.SIMULATION_SCENARIO == 'uniforme':
+        return None
+    if _escenario is None:
+        with _escenario_lock:
+            if _escenario is None:
+                if Config.SIMULATION_SCENARIO not in PERFILES:
+                    raise ValueError(f"Escenario no soportado: {Config.SIMULATION_SCENARIO}")
+                _escenario = SimuladorEscenario(
+                    PERFILES[Config.SIMULATION_SCENARIO],
+                    seed=Config.SIMULATION_SEED or 0,
+                    inicio=datetime.fromisoformat(Config.SIMULATION_START) if Config.SIMULATION_START else None,
+                    aceleracion=Config.SIMULATION_TIME_ACCELERATION
+                )
+    return _escenario
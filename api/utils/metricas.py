@@ -0,0 +1,420 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from api.utils.procesos import tras_fork
+
+logger = logging.getLogger(__name__)
+
+# Métricas en formato de texto de Prometheus (GET /metrics) sin dependencias externas.
+# Cada hilo acumula en su propio fragmento (sin locks en el camino caliente); al exportar
+# se suman los fragmentos y los de hilos ya terminados se consolidan en uno solo.
+# Con varios procesos (workers de gunicorn) cada uno vuelca su agregado a un fichero
+# <pid>.json de un directorio compartido y /metrics suma todos los ficheros, así que
+# responda el worker que responda los contadores no retroceden.
+
+CUBETAS_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(nombres: Sequence[str], valores: Tuple, extra: str = '') -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return '{' + ','.join(partes) + '}' if partes else ''
+
+
+def _numero(valor: float) -> str:
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _MetricaPorHilo:
+    """Base: un dict etiquetas -> celda por hilo, registrado la primera vez que el hilo escribe"""
+
+    tipo = ''
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._local = threading.local()
+        self._fragmentos: List[Tuple[threading.Thread, Dict]] = []
+        self._retirado: Dict = {}  # acumulado de hilos que ya terminaron
+        self._lock = threading.Lock()
+
+    def _fragmento(self) -> Dict:
+        try:
+            return self._local.datos
+        except AttributeError:
+            datos = self._local.datos = {}
+            with self._lock:
+                self._fragmentos.append((threading.current_thread(), datos))
+            return datos
+
+    def _celda_nueva(self):
+        raise NotImplementedError
+
+    @staticmethod
+    def _sumar(destino: List, origen: List):
+        for i, valor in enumerate(origen):
+            destino[i] += valor
+
+    def _agregado(self) -> Dict[Tuple, List]:
+        total: Dict[Tuple, List] = {}
+        with self._lock:
+            vivos = []
+            for hilo, datos in self._fragmentos:
+                if not hilo.is_alive():
+                    for clave, celda in datos.items():
+                        self._sumar(self._retirado.setdefault(clave, self._celda_nueva()), celda)
+                else:
+                    vivos.append((hilo, datos))
+            self._fragmentos = vivos
+            fuentes = [self._retirado] + [datos for _, datos in vivos]
+            for datos in fuentes:
+                for clave, celda in list(datos.items()):
+                    self._sumar(total.setdefault(clave, self._celda_nueva()), celda)
+        return total
+
+    def reiniciar(self):
+        """Sin fragmentos: el hijo de un fork empieza de cero (lo del padre lo exporta el padre)"""
+        self._local = threading.local()
+        self._fragmentos = []
+        self._retirado = {}
+        self._lock = threading.Lock()
+
+    def exportar(self, total: Optional[Dict[Tuple, List]] = None) -> List[str]:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+
+class Contador(_MetricaPorHilo):
+    tipo = 'counter'
+
+    def _celda_nueva(self):
+        return [0]
+
+    def incrementar(self, *valores, cantidad: float = 1):
+        datos = self._fragmento()
+        celda = datos.get(valores)
+        if celda is None:
+            celda = datos[valores] = [0]
+        celda[0] += cantidad
+
+    def exportar(self, total: Optional[Dict[Tuple, List]] = None) -> List[str]:
+        lineas = super().exportar()
+        for valores, (total,) in sorted((self._agregado() if total is None else total).items()):
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, valores)} {_numero(total)}")
+        return lineas
+
+
+class Histograma(_MetricaPorHilo):
+    """Histograma de cubetas fijas; la celda guarda el conteo por cubeta y la suma"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                 cubetas: Sequence[float] = CUBETAS_LATENCIA):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.cubetas = tuple(cubetas)
+
+    def _celda_nueva(self):
+        return [0] * (len(self.cubetas) + 1) + [0.0]
+
+    def observar(self, valor: float, *valores):
+        datos = self._fragmento()
+        celda = datos.get(valores)
+        if celda is None:
+            celda = datos[valores] = self._celda_nueva()
+        celda[bisect_left(self.cubetas, valor)] += 1
+        celda[-1] += valor
+
+    def exportar(self, total: Optional[Dict[Tuple, List]] = None) -> List[str]:
+        lineas = super().exportar()
+        for valores, celda in sorted((self._agregado() if total is None else total).items()):
+            acumulado = 0
+            for limite, conteo in zip(self.cubetas + (float('inf'),), celda[:-1]):
+                acumulado += conteo
+                etiquetas = _etiquetas(self.etiquetas, valores, f'le="{_numero(float(limite))}"')
+                lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+            etiquetas = _etiquetas(self.etiquetas, valores)
+            lineas.append(f"{self.nombre}_sum{etiquetas} {_numero(celda[-1])}")
+            lineas.append(f"{self.nombre}_count{etiquetas} {acumulado}")
+        return lineas
+
+
+class Indicador:
+    """Gauge calculado al exportar (torres activas, hilos, ...)"""
+
+    tipo = 'gauge'
+
+    def __init__(self, nombre: str, ayuda: str, funcion: Callable[[], float]):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.funcion = funcion
+
+    def exportar(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        try:
+            lineas.append(f"{self.nombre} {_numero(self.funcion())}")
+        except Exception:
+            pass  # un indicador que falla no debe romper el resto de /metrics
+        return lineas
+
+
+class RegistroMetricas:
+    """
+    Sin directorio compartido, exportar() devuelve solo lo de este proceso. Con
+    compartir(directorio) un hilo vuelca el agregado del proceso cada `intervalo`
+    segundos (y al salir), y exportar() suma los volcados de todos los procesos; los de
+    procesos terminados se consolidan en retirados.json con consolidar(pid). Los
+    indicadores (gauges) siguen siendo del proceso que responde.
+    """
+
+    RETIRADOS = 'retirados.json'
+
+    def __init__(self):
+        self._metricas: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.directorio: Optional[str] = None
+        self.intervalo = 5.0
+        self._parar = threading.Event()
+
+    def _registrar(self, metrica):
+        with self._lock:
+            return self._metricas.setdefault(metrica.nombre, metrica)
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Contador:
+        return self._registrar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                   cubetas: Sequence[float] = CUBETAS_LATENCIA) -> Histograma:
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, cubetas))
+
+    def indicador(self, nombre: str, ayuda: str, funcion: Callable[[], float]) -> Indicador:
+        with self._lock:
+            self._metricas[nombre] = Indicador(nombre, ayuda, funcion)  # se reemplaza al recargar
+            return self._metricas[nombre]
+
+    def reiniciar_tras_fork(self):
+        """Locks y fragmentos nuevos en el hijo; con directorio compartido, su propio volcado"""
+        self._lock = threading.Lock()
+        for metrica in self._metricas.values():
+            if isinstance(metrica, _MetricaPorHilo):
+                metrica.reiniciar()
+        if self.directorio:
+            self._iniciar_volcado()
+
+    # agregación entre procesos
+
+    def compartir(self, directorio: str, intervalo: float = 5.0):
+        """Activa la suma entre procesos a través de `directorio` (idempotente)"""
+        os.makedirs(directorio, exist_ok=True)
+        primera = self.directorio is None
+        self.directorio = directorio
+        self.intervalo = intervalo
+        if primera:
+            atexit.register(self.volcar)
+            self._iniciar_volcado()
+
+    def _iniciar_volcado(self):
+        self._parar = threading.Event()
+        threading.Thread(target=self._volcar_periodicamente, daemon=True, name='metricas_volcado').start()
+
+    def _volcar_periodicamente(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.volcar()
+            except Exception as e:
+                logger.warning(f"No se pudieron volcar las métricas: {str(e)}")
+
+    def _por_hilo(self) -> Dict[str, '_MetricaPorHilo']:
+        with self._lock:
+            return {nombre: m for nombre, m in self._metricas.items() if isinstance(m, _MetricaPorHilo)}
+
+    def _escribir(self, ruta: str, datos: Dict):
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w') as f:
+            json.dump(datos, f)
+        os.replace(temporal, ruta)  # atómico: quien lee ve el volcado anterior o el nuevo
+
+    @staticmethod
+    def _leer(ruta: str) -> Dict:
+        try:
+            with open(ruta) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _cerrojo(directorio: str, modo: int):
+        f = open(os.path.join(directorio, '.lock'), 'a')
+        fcntl.flock(f, modo)
+        return f
+
+    def volcar(self):
+        """Escribe el agregado de este proceso en <directorio>/<pid>.json"""
+        if not self.directorio:
+            return
+        datos = {nombre: [[list(valores), celda] for valores, celda in m._agregado().items()]
+                 for nombre, m in self._por_hilo().items()}
+        self._escribir(os.path.join(self.directorio, f"{os.getpid()}.json"), datos)
+
+    def consolidar(self, pid: int, directorio: str = None):
+        """
+        Suma el volcado de un proceso terminado a retirados.json y lo borra. `directorio`
+        permite llamarlo desde el master de gunicorn sin preload, que no creó la app.
+        """
+        directorio = directorio or self.directorio
+        ruta = os.path.join(directorio, f"{pid}.json")
+        if not os.path.exists(ruta):
+            return
+        with self._cerrojo(directorio, fcntl.LOCK_EX):
+            total = self._sumar_volcados(directorio, [self.RETIRADOS, f"{pid}.json"])
+            self._escribir(os.path.join(directorio, self.RETIRADOS),
+                           {nombre: [[list(v), c] for v, c in celdas.items()] for nombre, celdas in total.items()})
+            os.remove(ruta)
+
+    def _sumar_volcados(self, directorio: str, nombres: List[str]) -> Dict[str, Dict[Tuple, List]]:
+        metricas = self._por_hilo()
+        total: Dict[str, Dict[Tuple, List]] = {}
+        for nombre_fichero in nombres:
+            for nombre, celdas in self._leer(os.path.join(directorio, nombre_fichero)).items():
+                metrica = metricas.get(nombre)
+                if metrica is None:
+                    continue
+                destino = total.setdefault(nombre, {})
+                for valores, celda in celdas:
+                    metrica._sumar(destino.setdefault(tuple(valores), metrica._celda_nueva()), celda)
+        return total
+
+    def exportar(self) -> str:
+        with self._lock:
+            metricas = list(self._metricas.values())
+        totales = None
+        if self.directorio:
+            self.volcar()
+            with self._cerrojo(self.directorio, fcntl.LOCK_SH):
+                ficheros = [f for f in os.listdir(self.directorio) if f.endswith('.json')]
+                totales = self._sumar_volcados(self.directorio, ficheros)
+        lineas = []
+        for metrica in metricas:
+            if totales is not None and isinstance(metrica, _MetricaPorHilo):
+                lineas.extend(metrica.exportar(totales.get(metrica.nombre, {})))
+            else:
+                lineas.extend(metrica.exportar())
+        return '\n'.join(lineas) + '\n'
+
+
+# Instancia global y métricas de la aplicación
+registro = RegistroMetricas()
+tras_fork(registro.reiniciar_tras_fork)
+
+ESCRITURAS_STORAGE = registro.histograma(
+    'monitor_storage_escritura_segundos', "Duración de las escrituras de StorageManager por destino",
+    ('destino', 'modo')
+)
+ERRORES_STORAGE = registro.contador(
+    'monitor_storage_errores_total', "Escrituras de StorageManager fallidas por destino", ('destino', 'modo')
+)
+CONSULTAS_SERVICIO = registro.histograma(
+    'monitor_servicio_consulta_segundos', "Duración de las operaciones de los servicios", ('servicio', 'operacion')
+)
+ERRORES_SERVICIO = registro.contador(
+    'monitor_servicio_errores_total', "Operaciones de los servicios que lanzaron excepción", ('servicio', 'operacion')
+)
+TICKS_SIMULACION = registro.histograma(
+    'monitor_simulacion_tick_segundos', "Duración de cada tick de simulación", ('motor',)
+)
+PETICIONES_HTTP = registro.histograma(
+    'monitor_http_peticion_segundos', "Duración de las peticiones HTTP por ruta", ('metodo', 'ruta', 'estado')
+)
+
+
+def _fallido(resultado) -> bool:
+    # StorageManager informa los fallos en el resultado en lugar de lanzar
+    return isinstance(resultado, dict) and resultado.get('success') is False
+
+
+def cronometrar(histograma: Histograma, *valores, errores: Optional[Contador] = None):
+    """Decorador: observa la duración de cada llamada y cuenta los fallos en `errores`"""
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                resultado = funcion(*args, **kwargs)
+            except Exception:
+                if errores is not None:
+                    errores.incrementar(*valores)
+                raise
+            finally:
+                histograma.observar(time.perf_counter() - inicio, *valores)
+            if errores is not None and _fallido(resultado):
+                errores.incrementar(*valores)
+            return resultado
+        return envoltura
+    return decorador
+
+
+def instrumentar_servicio(cls):
+    """Decorador de clase: cronometra todos los @staticmethod públicos de un servicio"""
+    for nombre, atributo in list(vars(cls).items()):
+        if isinstance(atributo, staticmethod) and not nombre.startswith('_'):
+            medido = cronometrar(CONSULTAS_SERVICIO, cls.__name__, nombre, errores=ERRORES_SERVICIO)
+            setattr(cls, nombre, staticmethod(medido(atributo.__func__)))
+    return cls
+
+
+def instrumentar_app(app):
+    """Duración de cada petición por regla de ruta (no por URL, para acotar etiquetas) y GET /metrics"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _inicio_peticion():
+        g.inicio_metricas = time.perf_counter()
+
+    @app.after_request
+    def _fin_peticion(response):
+        inicio = getattr(g, 'inicio_metricas', None)
+        if inicio is not None:
+            ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+            PETICIONES_HTTP.observar(time.perf_counter() - inicio, request.method, ruta, str(response.status_code))
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metricas():
+        return Response(registro.exportar(), mimetype='text/plain; version=0.0.4')
+
+
+def medir_sobrecarga(repeticiones: int = 200_000) -> Dict:
+    """Coste por observación y por llamada cronometrada (para compararlo con un tick o una escritura)"""
+    histograma = Histograma('prueba_segundos', "prueba", ('a',))
+    inicio = time.perf_counter()
+    for i in range(repeticiones):
+        histograma.observar(0.003, 'x')
+    por_observacion = (time.perf_counter() - inicio) / repeticiones
+
+    funcion = cronometrar(histograma, 'x')(lambda: None)
+    inicio = time.perf_counter()
+    for i in range(repeticiones):
+        funcion()
+    por_llamada = (time.perf_counter() - inicio) / repeticiones
+    return {'observacion_us': round(por_observacion * 1e6, 3), 'llamada_cronometrada_us': round(por_llamada * 1e6, 3)}
+
+
+if __name__ == '__main__':
+    import json
+
+    print(json.dumps(medir_sobrecarga(), indent=2))
@@ -0,0 +1,190 @@
+import logging
+import os
+import re
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Mapping, Optional
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Perfilador estadístico para el servicio en marcha: un hilo muestrea cada `intervalo`
+# las pilas de todos los hilos (sys._current_frames) y cuenta cada pila colapsada
+# ("hilo;modulo:funcion;..." N), el formato que consumen flamegraph.pl y speedscope.
+# No instrumenta nada: el coste es proporcional a la frecuencia de muestreo y solo
+# existe mientras hay un perfil en curso.
+
+INTERVALO_DEFECTO = 0.005  # 200 Hz
+MAX_SEGUNDOS = 120
+
+_en_curso = threading.Lock()  # un perfil a la vez por proceso
+
+
+class PerfilEnCurso(Exception):
+    pass
+
+
+def _marco(frame) -> str:
+    codigo = frame.f_code
+    modulo = os.path.splitext(os.path.basename(codigo.co_filename))[0]
+    return f"{modulo}:{codigo.co_name}"
+
+
+def _pila(frame, limite: int) -> list:
+    marcos = []
+    while frame is not None and len(marcos) < limite:
+        marcos.append(_marco(frame))
+        frame = frame.f_back
+    marcos.reverse()
+    return marcos
+
+
+def _nombre_hilo(hilo: Optional[threading.Thread], ident: int) -> str:
+    return hilo.name if hilo is not None else f"hilo-{ident}"
+
+
+def muestrear(segundos: float, intervalo: float = INTERVALO_DEFECTO, hilos: Optional[str] = None,
+              agrupar_torres: bool = False, profundidad: int = 128) -> Dict:
+    """
+    Muestrea durante `segundos`; `hilos` es una expresión regular sobre el nombre del hilo
+    (p. ej. '^torre_sim_'). Con `agrupar_torres` todos los torre_sim_<id> cuentan como uno.
+    """
+    if not _en_curso.acquire(blocking=False):
+        raise PerfilEnCurso("Ya hay un perfil en curso en este proceso")
+    try:
+        segundos = min(max(float(segundos), intervalo), MAX_SEGUNDOS)
+        filtro = re.compile(hilos) if hilos else None
+        propio = threading.get_ident()
+        pilas: Counter = Counter()
+        muestras = 0
+        coste = 0.0
+
+        inicio = time.perf_counter()
+        fin = inicio + segundos
+        siguiente = inicio
+        while True:
+            ahora = time.perf_counter()
+            if ahora >= fin:
+                break
+            nombres = {h.ident: h for h in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == propio:
+                    continue
+                nombre = _nombre_hilo(nombres.get(ident), ident)
+                if filtro is not None and not filtro.search(nombre):
+                    continue
+                if agrupar_torres and nombre.startswith('torre_sim_'):
+                    nombre = 'torre_sim_*'
+                pilas[';'.join([nombre] + _pila(frame, profundidad))] += 1
+            muestras += 1
+            coste += time.perf_counter() - ahora
+
+            siguiente += intervalo
+            espera = siguiente - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            else:
+                siguiente = time.perf_counter()  # no acumular retraso si el muestreo va lento
+
+        duracion = time.perf_counter() - inicio
+        return {
+            'segundos': round(duracion, 3),
+            'intervalo_ms': intervalo * 1000,
+            'muestras': muestras,
+            'coste_muestra_ms': round(coste / muestras * 1000, 3) if muestras else 0,
+            'filtro_hilos': hilos,
+            'pilas': dict(pilas.most_common()),
+        }
+    finally:
+        _en_curso.release()
+
+
+def parametros_consulta(consulta: Mapping) -> Dict:
+    """
+    Argumentos de muestrear() a partir de ?segundos=&intervalo_ms=&hilos=&agrupar= (el
+    endpoint de la API y el del proceso de ingesta); ValueError si no son válidos.
+    """
+    segundos = float(consulta.get('segundos') or 10)
+    intervalo_ms = float(consulta.get('intervalo_ms') or INTERVALO_DEFECTO * 1000)
+    if not 0 < segundos <= MAX_SEGUNDOS:
+        raise ValueError(f"segundos debe estar entre 0 y {MAX_SEGUNDOS}")
+    if intervalo_ms < 1:
+        raise ValueError("intervalo_ms mínimo: 1")
+    hilos = consulta.get('hilos') or None
+    if hilos:
+        try:
+            re.compile(hilos)
+        except re.error as e:
+            raise ValueError(f"Filtro de hilos inválido: {str(e)}")
+    return {
+        'segundos': segundos,
+        'intervalo': intervalo_ms / 1000,
+        'hilos': hilos,
+        'agrupar_torres': consulta.get('agrupar', '0') in ('1', 'true'),
+    }
+
+
+def colapsado(perfil: Dict) -> str:
+    """Una línea por pila: 'hilo;marco;marco N' (entrada de flamegraph.pl / speedscope)"""
+    return ''.join(f"{pila} {conteo}\n" for pila, conteo in perfil['pilas'].items())
+
+
+def _perfil_por_senal(signum, frame):
+    segundos = Config.PROFILER_SIGNAL_SECONDS
+    directorio = Config.PROFILER_DIR
+
+    def ejecutar():
+        try:
+            perfil = muestrear(segundos, hilos=Config.PROFILER_SIGNAL_THREADS or None)
+            os.makedirs(directorio, exist_ok=True)
+            ruta = os.path.join(directorio, f"perfil_{os.getpid()}_{datetime.now():%Y%m%d_%H%M%S}.txt")
+            with open(ruta, 'w') as f:
+                f.write(colapsado(perfil))
+            logger.warning(f"Perfil de {perfil['segundos']}s ({perfil['muestras']} muestras) guardado en {ruta}")
+        except PerfilEnCurso:
+            logger.warning("Señal de perfil ignorada: ya hay un perfil en curso")
+        except Exception as e:
+            logger.error(f"Error generando perfil por señal: {str(e)}")
+
+    # el manejador corre en el hilo principal: el muestreo va en su propio hilo
+    threading.Thread(target=ejecutar, name='perfilador', daemon=True).start()
+
+
+def instalar_senal(nombre: str = None) -> bool:
+    """
+    Registra SIGUSR2 (o la señal configurada) para perfilar sin pasar por HTTP. Solo en
+    procesos propios (python -m api.ingest, run.py): en gunicorn SIGUSR2 es la
+    actualización del binario del master y los workers la restablecen.
+    """
+    nombre = nombre or Config.PROFILER_SIGNAL
+    senal = getattr(signal, nombre, None)
+    if senal is None or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(senal, _perfil_por_senal)
+    logger.info(f"Perfilador disponible con kill -{nombre[3:]} {os.getpid()}")
+    return True
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Perfila este proceso (demo) con el muestreador")
+    parser.add_argument('--segundos', type=float, default=2)
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_DEFECTO * 1000, help="ms entre muestras")
+    args = parser.parse_args()
+
+    def ocupado():
+        while True:
+            sum(i * i for i in range(10_000))
+
+    for i in range(4):
+        threading.Thread(target=ocupado, name=f"torre_sim_demo{i}", daemon=True).start()
+    perfil = muestrear(args.segundos, args.intervalo / 1000, agrupar_torres=True)
+    print(colapsado(perfil), end='')
+    print(json.dumps({k: v for k, v in perfil.items() if k != 'pilas'}), file=sys.stderr)
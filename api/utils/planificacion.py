@@ -0,0 +1,136 @@
+import asyncio
+import bisect
+import random
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from config.settings import Config
+
+
+def desfase_torre(id_torre: str, intervalo: float) -> float:
+    """
+    Desfase estable de una torre dentro del intervalo. Se deriva del hash del ID, así que
+    la flota queda repartida uniformemente y cada torre mantiene su fase entre reinicios
+    y entre procesos.
+    """
+    return (zlib.crc32(id_torre.encode()) / 2 ** 32) * intervalo
+
+
+def siguiente_tick(base: float, intervalo: float, ahora: float) -> float:
+    """
+    Siguiente hora programada de la torre: avanza intervalos enteros desde `base` para
+    conservar la fase aunque un tick se haya retrasado o la torre estuviera pausada
+    (los ticks perdidos no se encadenan).
+    """
+    base += intervalo
+    if base < ahora:
+        base += ((ahora - base) // intervalo + 1) * intervalo
+    return base
+
+
+def jitter(intervalo: float, fraccion: float = None) -> float:
+    """Variación aleatoria de ±fraccion·intervalo que se suma a la hora programada"""
+    fraccion = Config.SIMULATION_JITTER if fraccion is None else fraccion
+    if fraccion <= 0:
+        return 0.0
+    return random.uniform(-fraccion, fraccion) * intervalo
+
+
+class TokenBucket:
+    """
+    Limitador de tasa (operaciones por segundo) con ráfaga de hasta `capacidad`.
+    Una petición mayor que los tokens disponibles deja el cubo en negativo y las
+    siguientes esperan a que se recupere, así las esperas respetan el orden de llegada.
+    Con tasa <= 0 no limita.
+    """
+
+    def __init__(self, tasa: float, capacidad: Optional[float] = None):
+        self.tasa = tasa
+        self.capacidad = capacidad if capacidad is not None else max(tasa, 1.0)
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+        self.esperas = 0
+        self.tiempo_espera = 0.0
+
+    def reservar(self, n: float = 1) -> float:
+        """Consume n tokens y devuelve cuántos segundos hay que esperar antes de usarlos"""
+        if self.tasa <= 0:
+            return 0.0
+        with self._lock:
+            ahora = time.monotonic()
+            self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+            self._ultimo = ahora
+            self._tokens -= n
+            espera = -self._tokens / self.tasa if self._tokens < 0 else 0.0
+            if espera:
+                self.esperas += 1
+                self.tiempo_espera += espera
+            return espera
+
+    def adquirir(self, n: float = 1):
+        espera = self.reservar(n)
+        if espera:
+            time.sleep(espera)
+
+    async def adquirir_async(self, n: float = 1):
+        espera = self.reservar(n)
+        if espera:
+            await asyncio.sleep(espera)
+
+    def estado(self) -> Dict:
+        return {
+            'tasa': self.tasa,
+            'esperas': self.esperas,
+            'tiempo_espera_s': round(self.tiempo_espera, 3)
+        }
+
+
+def crear_limitadores() -> Dict[str, TokenBucket]:
+    """Un token bucket por destino de escritura, con las tasas de STORAGE_RATE_*"""
+    return {
+        'supabase': TokenBucket(Config.STORAGE_RATE_SUPABASE),
+        'sqlite': TokenBucket(Config.STORAGE_RATE_SQLITE),
+        'redis': TokenBucket(Config.STORAGE_RATE_REDIS),
+    }
+
+
+class HistogramaTicks:
+    """
+    Histograma de los ticks reales: en qué fase del intervalo empieza cada tick (una
+    carga suave reparte los ticks por igual entre las cubetas) y cuánto dura.
+    """
+    LIMITES_DURACION_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+    def __init__(self, intervalo: float, cubetas: int = 20):
+        self.intervalo = intervalo
+        self.fases = [0] * cubetas
+        self.duraciones = [0] * (len(self.LIMITES_DURACION_MS) + 1)
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, inicio: float, duracion: float):
+        """inicio: reloj monotónico al empezar el tick; duracion en segundos"""
+        cubeta = int((inicio % self.intervalo) / self.intervalo * len(self.fases))
+        indice = bisect.bisect_left(self.LIMITES_DURACION_MS, duracion * 1000)
+        with self._lock:
+            self.fases[min(cubeta, len(self.fases) - 1)] += 1
+            self.duraciones[indice] += 1
+            self.total += 1
+
+    def resumen(self) -> Dict:
+        with self._lock:
+            fases = list(self.fases)
+            duraciones = list(self.duraciones)
+            total = self.total
+        media = total / len(fases) if total else 0
+        etiquetas: List[str] = [f"<={l}" for l in self.LIMITES_DURACION_MS] + [f">{self.LIMITES_DURACION_MS[-1]}"]
+        return {
+            'ticks': total,
+            'fase': fases,
+            # 1.0 = perfectamente uniforme; N cubetas = todos los ticks en la misma
+            'pico_sobre_media': round(max(fases) / media, 2) if media else 0.0,
+            'duracion_ms': dict(zip(etiquetas, duraciones))
+        }
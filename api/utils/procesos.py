@@ -0,0 +1,33 @@
+import logging
+import os
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+# Reinicio del estado por proceso tras os.fork (workers de gunicorn con preload_app,
+# multiprocessing con 'fork'): el hijo hereda sockets, pools y locks del padre pero no
+# sus hilos. Cada singleton con conexiones o locks registra aquí cómo rehacerse.
+
+_manejadores: List[Callable[[], None]] = []
+
+
+def tras_fork(funcion: Callable[[], None]) -> Callable[[], None]:
+    """Registra `funcion` para ejecutarse en el proceso hijo después de cada fork"""
+    _manejadores.append(funcion)
+    return funcion
+
+
+def _reiniciar_hijo():
+    for funcion in _manejadores:
+        try:
+            funcion()
+        except Exception as e:
+            logger.error(f"Error reiniciando {funcion.__qualname__} tras fork: {str(e)}")
+
+
+def manejadores() -> List[str]:
+    return [funcion.__qualname__ for funcion in _manejadores]
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_hijo)
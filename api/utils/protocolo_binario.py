@@ -0,0 +1,444 @@
+import json
+import logging
+import socket
+import socketserver
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import Config
+from api.utils.validacion import _fecha_utc
+
+logger = logging.getLogger(__name__)
+
+# Protocolo binario de ingesta para gateways con enlaces caros (celular): los registros
+# son de forma fija, sin nombres de campo, con valores enteros escalados y la marca de
+# tiempo como delta en ms respecto al registro anterior. Van en tramas con prefijo de
+# longitud, una por torre y tipo; varias tramas pueden ir seguidas en el mismo cuerpo
+# HTTP, conexión TCP o datagrama UDP.
+#
+# Trama v1 (little-endian):
+#   longitud    u32   bytes que siguen a este campo
+#   magia       2s    b'MT'
+#   version     u8    1
+#   tipo        u8    1 = meteorologico, 2 = diagnostico
+#   registros   u16
+#   largo_id    u8    + id_torre en UTF-8
+#   base        i64   microsegundos desde 1970 (UTC) a los que se suma el primer delta
+#   registros   N x registro de tamaño fijo (abajo)
+#
+# Los campos ausentes van con el valor centinela del tipo (máximo del entero sin signo,
+# mínimo del entero con signo).
+
+MAGIA = b'MT'
+VERSION = 1
+TIPO_METEOROLOGICO = 1
+TIPO_DIAGNOSTICO = 2
+TIPOS = {TIPO_METEOROLOGICO: 'meteorologico', TIPO_DIAGNOSTICO: 'diagnostico'}
+CODIGOS = {nombre: codigo for codigo, nombre in TIPOS.items()}
+
+MAX_TRAMA = 2 * 1024 * 1024
+
+_LONGITUD = struct.Struct('<I')
+_CABECERA = struct.Struct('<2sBBHB')
+_BASE = struct.Struct('<q')
+
+# (campo, formato, escala): valor = entero / escala
+CAMPOS = {
+    'meteorologico': (
+        ('temperatura', 'h', 100),          # 0.01 °C
+        ('humedad_relativa', 'H', 100),     # 0.01 %
+        ('presion_atmosferica', 'H', 10),   # 0.1 hPa
+        ('velocidad_viento', 'H', 100),     # 0.01 m/s
+        ('direccion_viento', 'H', 1),       # grados
+        ('precipitacion', 'H', 100),        # 0.01 mm
+        ('radiacion_solar', 'H', 10),       # 0.1 W/m²
+        ('indice_uv', 'B', 1),
+    ),
+    'diagnostico': (
+        ('nivel_bateria', 'H', 100),        # 0.01 %
+        ('tiempo_ultima_conexion', 'I', 1), # segundos antes de timestamp
+        ('estados', 'B', 1),                # 2 bits por estado (ver ESTADOS)
+    ),
+}
+REGISTRO = {tipo: struct.Struct('<I' + ''.join(f for _, f, _ in campos)) for tipo, campos in CAMPOS.items()}
+_CENTINELA = {'h': -0x8000, 'H': 0xFFFF, 'B': 0xFF, 'I': 0xFFFFFFFF}
+_LIMITES = {'h': (-0x7FFF, 0x7FFF), 'H': (0, 0xFFFE), 'B': (0, 0xFE), 'I': (0, 0xFFFFFFFE)}
+
+# estados del diagnóstico: (campo, desplazamiento, valores); 0 = ausente
+ESTADOS = (
+    ('estado_sensor_temperatura', 0, ('OK', 'Error')),
+    ('estado_sensor_humedad', 2, ('OK', 'Error')),
+    ('estado_general', 4, ('Normal', 'Alerta', 'Crítico')),
+)
+
+_EPOCA = datetime(1970, 1, 1)
+
+
+class TramaInvalida(ValueError):
+    pass
+
+
+class ReceptorSaturado(RuntimeError):
+    pass
+
+
+# codificación (gateways, pruebas y benchmark)
+
+def _micros(valor) -> int:
+    fecha = valor if isinstance(valor, datetime) else _fecha_utc(valor)
+    if fecha is None:
+        raise ValueError(f"timestamp inválido: {valor!r}")
+    if fecha.tzinfo is not None:
+        fecha = _fecha_utc(fecha.isoformat())
+    return (fecha - _EPOCA) // timedelta(microseconds=1)
+
+
+def _entero(valor, formato: str, escala: int) -> int:
+    if valor is None:
+        return _CENTINELA[formato]
+    minimo, maximo = _LIMITES[formato]
+    return min(max(round(valor * escala), minimo), maximo)
+
+
+def _estados(registro: Dict) -> int:
+    bits = 0
+    for campo, desplazamiento, valores in ESTADOS:
+        valor = registro.get(campo)
+        if valor in valores:
+            bits |= (valores.index(valor) + 1) << desplazamiento
+    return bits
+
+
+def codificar_trama(tipo: str, id_torre: str, registros: List[Dict]) -> bytes:
+    """Una trama con los registros de una torre, en orden de timestamp"""
+    registro_struct = REGISTRO[tipo]
+    id_bytes = id_torre.encode()
+    if len(id_bytes) > 255 or len(registros) > 0xFFFF:
+        raise ValueError("id_torre de más de 255 bytes o más de 65535 registros por trama")
+
+    micros = [_micros(r['timestamp']) for r in registros]
+    base = micros[0] if micros else 0
+    cuerpo = bytearray()
+    anterior = base
+    for registro, instante in zip(registros, micros):
+        delta = (instante - anterior) // 1000
+        if not 0 <= delta <= 0xFFFFFFFF:
+            raise ValueError("Los registros de una trama deben ir en orden de timestamp")
+        anterior += delta * 1000
+        valores = []
+        for campo, formato, escala in CAMPOS[tipo]:
+            if campo == 'estados':
+                valores.append(_estados(registro))
+            elif campo == 'tiempo_ultima_conexion':
+                conexion = registro.get(campo)
+                valores.append(_CENTINELA['I'] if conexion is None else
+                               _entero(max(0, (instante - _micros(conexion)) / 1e6), formato, escala))
+            else:
+                valores.append(_entero(registro.get(campo), formato, escala))
+        cuerpo += registro_struct.pack(delta, *valores)
+
+    contenido = (_CABECERA.pack(MAGIA, VERSION, CODIGOS[tipo], len(registros), len(id_bytes))
+                 + id_bytes + _BASE.pack(base) + cuerpo)
+    return _LONGITUD.pack(len(contenido)) + contenido
+
+
+# decodificación
+
+def _leer_trama(vista: memoryview, inicio: int) -> Tuple[int, str, str, List[Dict]]:
+    """(fin, tipo, id_torre, registros) de la trama que empieza en `inicio`"""
+    if len(vista) - inicio < _LONGITUD.size:
+        raise TramaInvalida(f"Trama truncada en el byte {inicio}")
+    (longitud,) = _LONGITUD.unpack_from(vista, inicio)
+    inicio += _LONGITUD.size
+    fin = inicio + longitud
+    if longitud > MAX_TRAMA or fin > len(vista) or longitud < _CABECERA.size + _BASE.size:
+        raise TramaInvalida(f"Longitud de trama inválida ({longitud}) en el byte {inicio - _LONGITUD.size}")
+
+    magia, version, codigo, n, largo_id = _CABECERA.unpack_from(vista, inicio)
+    if magia != MAGIA:
+        raise TramaInvalida(f"Magia inválida en el byte {inicio}")
+    if version != VERSION:
+        raise TramaInvalida(f"Versión de protocolo no soportada: {version}")
+    tipo = TIPOS.get(codigo)
+    if tipo is None:
+        raise TramaInvalida(f"Tipo de registro desconocido: {codigo}")
+
+    posicion = inicio + _CABECERA.size
+    if longitud < _CABECERA.size + largo_id + _BASE.size:
+        raise TramaInvalida(f"El id_torre ({largo_id} bytes) excede la trama de {longitud} bytes")
+    try:
+        id_torre = str(vista[posicion:posicion + largo_id], 'utf-8')
+    except UnicodeDecodeError:
+        raise TramaInvalida(f"id_torre no es UTF-8 válido en el byte {posicion}")
+    posicion += largo_id
+    (micros,) = _BASE.unpack_from(vista, posicion)
+    posicion += _BASE.size
+
+    registro_struct = REGISTRO[tipo]
+    if fin - posicion != n * registro_struct.size:
+        raise TramaInvalida(f"La trama de {id_torre} declara {n} registros y trae {fin - posicion} bytes")
+
+    campos = CAMPOS[tipo]
+    registros = []
+    # iter_unpack lee directamente del memoryview, sin copiar el bloque de registros
+    for valores in struct.iter_unpack(registro_struct.format, vista[posicion:fin]):
+        micros += valores[0] * 1000
+        instante = _EPOCA + timedelta(microseconds=micros)
+        registro = {'tipo': tipo, 'id_torre': id_torre, 'timestamp': instante.isoformat()}
+        for (campo, formato, escala), valor in zip(campos, valores[1:]):
+            if valor == _CENTINELA[formato]:
+                continue
+            if campo == 'estados':
+                for nombre, desplazamiento, opciones in ESTADOS:
+                    indice = (valor >> desplazamiento) & 0b11
+                    if 0 < indice <= len(opciones):
+                        registro[nombre] = opciones[indice - 1]
+            elif campo == 'tiempo_ultima_conexion':
+                registro[campo] = (instante - timedelta(seconds=valor)).isoformat()
+            else:
+                registro[campo] = valor / escala if escala != 1 else valor
+        registros.append(registro)
+    return fin, tipo, id_torre, registros
+
+
+def decodificar(datos) -> Tuple[List[Tuple[int, Dict]], int]:
+    """
+    Todas las tramas de `datos` como (número de registro desde 1, registro) en el formato
+    de IngestaService.ingerir, y el número de tramas. Lanza TramaInvalida si una trama
+    está mal formada (el cuerpo entero se descarta: el emisor está desincronizado).
+    """
+    vista = memoryview(datos)
+    registros, tramas, inicio = [], 0, 0
+    while inicio < len(vista):
+        try:
+            inicio, _, _, leidos = _leer_trama(vista, inicio)
+        except (struct.error, OverflowError) as e:
+            # cualquier resto (p. ej. marcas de tiempo fuera de rango) es también trama inválida
+            raise TramaInvalida(f"Trama mal formada en el byte {inicio}: {str(e)}")
+        registros.extend(leidos)
+        tramas += 1
+    return list(enumerate(registros, start=1)), tramas
+
+
+# receptor TCP/UDP
+
+class ReceptorBinario:
+    """
+    Escucha tramas por TCP (cada trama se confirma con un u16: registros recibidos,
+    0xFFFE si el búfer está lleno y hay que reenviarla más tarde, o 0xFFFF si estaba mal
+    formada y se cierra la conexión) y por UDP (una o más tramas por datagrama, sin
+    respuesta). Los registros se acumulan y se guardan por lotes cada
+    INGEST_BINARY_FLUSH_INTERVAL segundos o al llegar a INGEST_BATCH_SIZE.
+
+    La confirmación significa "recibido", no "guardado": si un lote falla al guardarse
+    vuelve al búfer y se reintenta en el siguiente ciclo, de modo que solo se pierde lo
+    pendiente si el proceso termina sin poder guardarlo. El búfer está limitado a
+    INGEST_BINARY_MAX_PENDING registros; al llenarse se rechazan las tramas nuevas en
+    lugar de confirmar datos que no caben.
+    """
+
+    def __init__(self, host: str = None, puerto: int = None):
+        self.host = host or Config.INGEST_BINARY_HOST
+        self.puerto = Config.INGEST_BINARY_PORT if puerto is None else puerto
+        self._pendientes: List[Dict] = []
+        self._lock = threading.Lock()
+        self._hay_lote = threading.Event()
+        self._parar = threading.Event()
+        self._servidores = []
+        self._hilos: List[threading.Thread] = []
+        self.estadisticas = {'tramas': 0, 'invalidas': 0, 'saturadas': 0, 'registros': 0,
+                             'aceptados': 0, 'rechazados': 0, 'lotes_fallidos': 0}
+
+    def encolar(self, registros: List[Dict]):
+        with self._lock:
+            if len(self._pendientes) + len(registros) > Config.INGEST_BINARY_MAX_PENDING:
+                raise ReceptorSaturado(f"{len(self._pendientes)} registros pendientes de guardar")
+            self._pendientes.extend(registros)
+            self.estadisticas['registros'] += len(registros)
+            if len(self._pendientes) >= Config.INGEST_BATCH_SIZE:
+                self._hay_lote.set()
+
+    def recibir(self, datos) -> int:
+        """Decodifica y encola; devuelve los registros recibidos"""
+        try:
+            registros, tramas = decodificar(datos)
+        except TramaInvalida:
+            self.estadisticas['invalidas'] += 1
+            raise
+        try:
+            self.encolar([registro for _, registro in registros])
+        except ReceptorSaturado:
+            self.estadisticas['saturadas'] += tramas
+            raise
+        self.estadisticas['tramas'] += tramas
+        return len(registros)
+
+    def vaciar(self) -> Optional[Dict]:
+        from api.services.ingesta_service import IngestaService
+
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, []
+            self._hay_lote.clear()
+        if not pendientes:
+            return None
+        lineas = list(enumerate(pendientes, start=1))
+        try:
+            # el receptor no autentica cada trama: solo se aceptan torres existentes
+            permitidas = IngestaService.torres_permitidas(None, True, IngestaService.ids_torre(lineas))
+            resumen = IngestaService.ingerir(lineas, permitidas)
+        except Exception:
+            # ya estaban confirmados: vuelven al frente del búfer para el siguiente intento
+            # (lo que sí llegó a guardarse se descarta entonces como duplicado)
+            with self._lock:
+                self._pendientes[:0] = pendientes
+            self.estadisticas['lotes_fallidos'] += 1
+            raise
+        self.estadisticas['aceptados'] += resumen['aceptadas']
+        self.estadisticas['rechazados'] += resumen['rechazadas']
+        if resumen['rechazadas']:
+            logger.warning(f"Receptor binario: {resumen['rechazadas']} registros rechazados "
+                           f"(p. ej. {resumen['rechazos'][0]['error']})")
+        return resumen
+
+    def _vaciar_periodicamente(self):
+        while not self._parar.is_set():
+            self._hay_lote.wait(Config.INGEST_BINARY_FLUSH_INTERVAL)
+            try:
+                self.vaciar()
+            except Exception as e:
+                logger.error(f"Error guardando lote binario (se reintentará): {str(e)}")
+                self._parar.wait(Config.INGEST_BINARY_FLUSH_INTERVAL)  # sin reintentar en bucle
+
+    def iniciar(self):
+        receptor = self
+
+        class ManejadorTCP(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    cabecera = self.rfile.read(_LONGITUD.size)
+                    if len(cabecera) < _LONGITUD.size:
+                        return
+                    (longitud,) = _LONGITUD.unpack(cabecera)
+                    if longitud > MAX_TRAMA:
+                        self.wfile.write(struct.pack('<H', 0xFFFF))
+                        return
+                    resto = self.rfile.read(longitud)
+                    if len(resto) < longitud:
+                        return  # el gateway cortó a mitad de trama: no se confirma
+                    trama = cabecera + resto
+                    try:
+                        recibidos = receptor.recibir(trama)
+                    except TramaInvalida as e:
+                        logger.warning(f"Trama TCP inválida de {self.client_address[0]}: {str(e)}")
+                        self.wfile.write(struct.pack('<H', 0xFFFF))
+                        return
+                    except ReceptorSaturado:
+                        self.wfile.write(struct.pack('<H', 0xFFFE))  # no se confirma: reenviar
+                        continue
+                    self.wfile.write(struct.pack('<H', min(recibidos, 0xFFFD)))
+
+        class ManejadorUDP(socketserver.BaseRequestHandler):
+            def handle(self):
+                try:
+                    receptor.recibir(self.request[0])
+                except TramaInvalida as e:
+                    logger.warning(f"Datagrama inválido de {self.client_address[0]}: {str(e)}")
+                except ReceptorSaturado as e:
+                    logger.warning(f"Datagrama descartado, receptor saturado: {str(e)}")
+
+        class ServidorTCP(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        tcp = ServidorTCP((self.host, self.puerto), ManejadorTCP)
+        puerto = tcp.server_address[1]  # con puerto 0, UDP usa el mismo que eligió TCP
+        udp = socketserver.UDPServer((self.host, puerto), ManejadorUDP)
+        udp.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.puerto = puerto
+        self._servidores = [tcp, udp]
+        self._parar.clear()
+        self._hilos = [
+            threading.Thread(target=tcp.serve_forever, daemon=True, name='receptor_tcp'),
+            threading.Thread(target=udp.serve_forever, daemon=True, name='receptor_udp'),
+            threading.Thread(target=self._vaciar_periodicamente, daemon=True, name='receptor_lotes'),
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+        logger.info(f"Receptor binario en {self.host}:{puerto} (TCP y UDP)")
+
+    def detener(self):
+        for servidor in self._servidores:
+            servidor.shutdown()
+            servidor.server_close()
+        self._servidores = []
+        self._parar.set()
+        self._hay_lote.set()
+        for hilo in self._hilos:
+            hilo.join(timeout=5)
+        self._hilos = []
+        try:
+            self.vaciar()  # lo recibido antes de detener se guarda
+        except Exception as e:
+            logger.error(f"Se pierden {len(self._pendientes)} registros binarios sin guardar: {str(e)}")
+            raise
+
+
+# Instancia global (la arranca el proceso de ingesta si INGEST_BINARY_PORT > 0)
+receptor_binario = ReceptorBinario()
+
+
+def ejecutar_benchmark(torres: int = 100, lecturas: int = 60, seed: int = 0) -> Dict:
+    """Bytes por lectura y coste de decodificar frente a NDJSON (plano y gzip)"""
+    import gzip
+    import random
+
+    from api.utils.simulator import generar_datos_meteorologicos
+
+    random.seed(seed)
+    inicio = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=lecturas)
+    por_torre = {}
+    for i in range(torres):
+        id_torre = f"torre-{i:04d}"
+        por_torre[id_torre] = [dict(generar_datos_meteorologicos(id_torre),
+                                    timestamp=(inicio + timedelta(minutes=m)).isoformat())
+                               for m in range(lecturas)]
+    total = torres * lecturas
+
+    ndjson = '\n'.join(json.dumps(r) for registros in por_torre.values() for r in registros).encode()
+    binario = b''.join(codificar_trama('meteorologico', id_torre, registros)
+                       for id_torre, registros in por_torre.items())
+
+    t0 = time.perf_counter()
+    decodificados, _ = decodificar(binario)
+    t_binario = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    [json.loads(linea) for linea in ndjson.split(b'\n')]
+    t_json = time.perf_counter() - t0
+    assert len(decodificados) == total
+
+    return {
+        'lecturas': total,
+        'bytes_por_lectura': {
+            'ndjson': round(len(ndjson) / total, 1),
+            'ndjson_gzip': round(len(gzip.compress(ndjson)) / total, 1),
+            'binario': round(len(binario) / total, 1),
+            'binario_gzip': round(len(gzip.compress(binario)) / total, 1),
+        },
+        'decodificar_us': {
+            'ndjson': round(t_json / total * 1e6, 2),
+            'binario': round(t_binario / total * 1e6, 2),
+        },
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tamaño y coste del protocolo binario frente a NDJSON")
+    parser.add_argument('--torres', type=int, default=100)
+    parser.add_argument('--lecturas', type=int, default=60, help="lecturas por torre (una por minuto)")
+    args = parser.parse_args()
+    print(json.dumps(ejecutar_benchmark(args.torres, args.lecturas), indent=2))
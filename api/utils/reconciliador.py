@@ -0,0 +1,201 @@
+import json
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from config.settings import Config
+from api.database import db_manager
+from api.services.torre_service import (
+    TorreService,
+    CANAL_CAMBIOS_TORRES,
+    CANAL_CONTROL_SIMULACION,
+    CLAVE_TORRES_PAUSADAS
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _es_simulable(torre: Dict) -> bool:
+    return torre.get('estado') == 'Activa' and torre.get('usuario_asignado') is not None
+
+
+class ReconciliadorFlota:
+    """
+    Mantiene el conjunto de torres simuladas sincronizado con torres.estado sin reiniciar.
+
+    Los cambios llegan por Redis (TorreService publica en torres:cambios) y se aplican en
+    cuanto se reciben; como respaldo, cada RECONCILE_INTERVAL segundos se consultan solo
+    las torres con ultima_actualizacion posterior a la última vista, y cada
+    RECONCILE_FULL_EVERY ciclos se compara la lista completa de IDs. Por el canal
+    sim:control llegan también las pausas y reanudaciones de torres individuales.
+    """
+
+    def __init__(self, gestor, redis_client=None):
+        self.gestor = gestor
+        self.redis = redis_client or db_manager.redis
+        self.deseadas: Set[str] = set()
+        self.ultima_actualizacion: Optional[str] = None
+        self.cambios_aplicados = 0
+
+        self.coordinador = None
+        if Config.SIMULATION_SHARDING:
+            # con shards el coordinador decide que parte de las deseadas corre en este proceso
+            from api.utils.shard_coordinator import ShardCoordinator
+
+            self.coordinador = ShardCoordinator(
+                self.redis,
+                al_adquirir=gestor.iniciar_torres,
+                al_liberar=gestor.detener_torres
+            )
+
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilos: List[threading.Thread] = []
+
+    # aplicacion de cambios
+
+    def _aplicar(self, altas: Iterable[str], bajas: Iterable[str]):
+        with self._lock:
+            altas = set(altas) - self.deseadas
+            bajas = set(bajas) & self.deseadas
+            if not altas and not bajas:
+                return
+            self.deseadas |= altas
+            self.deseadas -= bajas
+            self.cambios_aplicados += len(altas) + len(bajas)
+
+        if self.coordinador:
+            for id_torre in altas:
+                self.coordinador.agregar_torre(id_torre)
+            for id_torre in bajas:
+                self.coordinador.quitar_torre(id_torre)
+            self.coordinador.despertar()
+        else:
+            if bajas:
+                self.gestor.detener_torres(bajas)
+            if altas:
+                self.gestor.iniciar_torres(altas)
+
+        logger.info(f"Reconciliación: +{len(altas)} / -{len(bajas)} torres simuladas")
+
+    def _asignar_usuarios(self, torres: List[Dict]):
+        """Informa al motor de alertas del usuario de cada torre (reglas por usuario)"""
+        motor = getattr(self.gestor, 'motor_alertas', None)
+        if motor is not None:
+            motor.asignar_usuarios({t['id_torre']: t.get('usuario_asignado') for t in torres})
+
+    def aplicar_cambio(self, torre: Dict):
+        """Aplica el cambio de una sola torre (notificación o fila modificada)"""
+        id_torre = torre['id_torre']
+        self._asignar_usuarios([torre])
+        if _es_simulable(torre):
+            self._aplicar([id_torre], [])
+        else:
+            self._aplicar([], [id_torre])
+
+    def aplicar_control(self, mensaje: Dict):
+        """Pausa o reanuda una torre en el gestor local"""
+        if mensaje.get('accion') == 'pausar':
+            self.gestor.pausar_torre(mensaje['id_torre'])
+        elif mensaje.get('accion') == 'reanudar':
+            self.gestor.reanudar_torre(mensaje['id_torre'])
+
+    def _cargar_pausadas(self):
+        for id_torre in self.redis.smembers(CLAVE_TORRES_PAUSADAS):
+            self.gestor.pausar_torre(id_torre.decode() if isinstance(id_torre, bytes) else id_torre)
+
+    def _registrar_actualizacion(self, torres: List[Dict]):
+        fechas = [t['ultima_actualizacion'] for t in torres if t.get('ultima_actualizacion')]
+        if fechas:
+            maxima = max(fechas)
+            if self.ultima_actualizacion is None or maxima > self.ultima_actualizacion:
+                self.ultima_actualizacion = maxima
+
+    def reconciliar_completo(self):
+        """Compara la lista completa de torres (arranque y respaldo poco frecuente)"""
+        torres = TorreService.obtener_estados()
+        self._registrar_actualizacion(torres)
+        self._asignar_usuarios(torres)
+        activas = {t['id_torre'] for t in torres if _es_simulable(t)}
+        with self._lock:
+            bajas = self.deseadas - activas
+        self._aplicar(activas, bajas)
+
+    def reconciliar_incremental(self):
+        """Aplica solo las torres modificadas desde la última actualización vista"""
+        if self.ultima_actualizacion is None:
+            return self.reconciliar_completo()
+        # gte: las filas con la misma marca se reaplican, lo que es idempotente
+        torres = TorreService.obtener_estados(desde=self.ultima_actualizacion)
+        self._registrar_actualizacion(torres)
+        for torre in torres:
+            self.aplicar_cambio(torre)
+
+    # hilos
+
+    def iniciar(self):
+        """Carga inicial y arranque del escucha de cambios y del diff periódico"""
+        self._parar.clear()
+        self._cargar_pausadas()
+        self.reconciliar_completo()
+        if self.coordinador:
+            self.coordinador.iniciar()
+
+        for objetivo, nombre in ((self._escuchar, "reconciliador_eventos"), (self._periodico, "reconciliador_diff")):
+            hilo = threading.Thread(target=objetivo, daemon=True, name=nombre)
+            hilo.start()
+            self._hilos.append(hilo)
+        logger.info(f"Reconciliador iniciado con {len(self.deseadas)} torres activas")
+
+    def _escuchar(self):
+        while not self._parar.is_set():
+            pubsub = None
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CANAL_CAMBIOS_TORRES, CANAL_CONTROL_SIMULACION)
+                while not self._parar.is_set():
+                    mensaje = pubsub.get_message(timeout=1.0)
+                    if not mensaje or mensaje.get('type') != 'message':
+                        continue
+                    canal = mensaje['channel'].decode() if isinstance(mensaje['channel'], bytes) else mensaje['channel']
+                    if canal == CANAL_CONTROL_SIMULACION:
+                        self.aplicar_control(json.loads(mensaje['data']))
+                    else:
+                        self.aplicar_cambio(json.loads(mensaje['data']))
+            except Exception as e:
+                logger.error(f"Error escuchando cambios de torres: {str(e)}")
+                self._parar.wait(5)  # reintentar la suscripcion
+            finally:
+                if pubsub:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def _periodico(self):
+        ciclo = 0
+        while not self._parar.wait(Config.RECONCILE_INTERVAL):
+            ciclo += 1
+            try:
+                if ciclo % Config.RECONCILE_FULL_EVERY == 0:
+                    self.reconciliar_completo()
+                else:
+                    self.reconciliar_incremental()
+            except Exception as e:
+                logger.error(f"Error en reconciliación periódica: {str(e)}")
+
+    def detener(self):
+        self._parar.set()
+        for hilo in self._hilos:
+            hilo.join(timeout=5)
+        self._hilos.clear()
+        if self.coordinador:
+            self.coordinador.detener()
+
+    def estado(self) -> Dict:
+        return {
+            'torres_deseadas': len(self.deseadas),
+            'cambios_aplicados': self.cambios_aplicados,
+            'ultima_actualizacion': self.ultima_actualizacion,
+            'shards': self.coordinador.estado() if self.coordinador else None
+        }
@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# solo renueva/libera el lease si sigue perteneciendo a este worker
+_RENOVAR = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_LIBERAR = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class ShardCoordinator:
+    """
+    Reparte las torres entre procesos y hosts sin duplicar trabajo.
+
+    Cada worker publica un heartbeat en Redis; el dueño de cada torre se decide con
+    rendezvous hashing sobre los workers vivos (al entrar o salir uno solo se mueve
+    ~1/N de las torres) y solo se simula una torre mientras se tiene su lease
+    (SET NX PX), que se renueva en cada ciclo y caduca si el worker muere.
+    """
+    CLAVE_WORKERS = "sim:workers"
+    PREFIJO_LEASE = "sim:lease:"
+
+    def __init__(self, redis_client, al_adquirir: Callable[[List[str]], None],
+                 al_liberar: Callable[[List[str]], None], worker_id: Optional[str] = None,
+                 ttl: float = None, intervalo: float = None):
+        self.redis = redis_client
+        self.al_adquirir = al_adquirir
+        self.al_liberar = al_liberar
+        self.worker_id = worker_id or Config.SHARD_WORKER_ID or \
+            f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.ttl_ms = int((ttl or Config.SHARD_LEASE_TTL) * 1000)
+        self.intervalo = intervalo or Config.SHARD_HEARTBEAT_INTERVAL
+
+        self.torres: Set[str] = set()    # universo de torres a repartir
+        self.propias: Set[str] = set()   # torres con lease de este worker
+        self.workers: List[str] = []
+
+        self._asignacion: Set[str] = set()
+        self._cache_clave = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._despertar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._renovar = self.redis.register_script(_RENOVAR)
+        self._liberar = self.redis.register_script(_LIBERAR)
+
+    # universo de torres
+
+    def actualizar_torres(self, ids_torre: Iterable[str]):
+        """Reemplaza el conjunto de torres a repartir (se aplica en el siguiente ciclo)"""
+        with self._lock:
+            self.torres = set(ids_torre)
+
+    def agregar_torre(self, id_torre: str):
+        with self._lock:
+            self.torres.add(id_torre)
+
+    def quitar_torre(self, id_torre: str):
+        with self._lock:
+            self.torres.discard(id_torre)
+
+    # ciclo de coordinacion
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True, name="shard_coordinator")
+        self._hilo.start()
+        logger.info(f"Coordinador de shards iniciado (worker {self.worker_id})")
+
+    def despertar(self):
+        """Adelanta el siguiente ciclo (p. ej. tras cambiar el universo de torres)"""
+        self._despertar.set()
+
+    def _bucle(self):
+        while not self._parar.is_set():
+            try:
+                self.ciclo()
+            except Exception as e:
+                logger.error(f"Error en ciclo de coordinación: {str(e)}")
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+
+    def ciclo(self):
+        """Heartbeat, cálculo de la asignación y ajuste de los leases"""
+        ahora = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zadd(self.CLAVE_WORKERS, {self.worker_id: ahora})
+        pipe.zremrangebyscore(self.CLAVE_WORKERS, "-inf", ahora - self.ttl_ms / 1000)
+        pipe.zrange(self.CLAVE_WORKERS, 0, -1)
+        workers = sorted(w.decode() if isinstance(w, bytes) else w for w in pipe.execute()[2])
+
+        deseadas = self._calcular_asignacion(workers)
+        self.workers = workers
+
+        # liberar las que ya no nos corresponden
+        sobrantes = self.propias - deseadas
+        if sobrantes:
+            self._liberar_leases(sobrantes)
+
+        # renovar las que mantenemos; si alguna se perdio (caduco) se deja de simular
+        mantenidas = list(self.propias & deseadas)
+        if mantenidas:
+            pipe = self.redis.pipeline(transaction=False)
+            for id_torre in mantenidas:
+                self._renovar(keys=[self.PREFIJO_LEASE + id_torre], args=[self.worker_id, self.ttl_ms], client=pipe)
+            perdidas = [t for t, ok in zip(mantenidas, pipe.execute()) if not ok]
+            if perdidas:
+                logger.warning(f"Leases perdidos por {self.worker_id}: {len(perdidas)}")
+                self.propias.difference_update(perdidas)
+                self.al_liberar(perdidas)
+
+        # adquirir las nuevas; si otro worker aun tiene el lease se reintenta en el siguiente ciclo
+        candidatas = list(deseadas - self.propias)
+        if candidatas:
+            pipe = self.redis.pipeline(transaction=False)
+            for id_torre in candidatas:
+                pipe.set(self.PREFIJO_LEASE + id_torre, self.worker_id, nx=True, px=self.ttl_ms)
+            adquiridas = [t for t, ok in zip(candidatas, pipe.execute()) if ok]
+            if adquiridas:
+                self.propias.update(adquiridas)
+                self.al_adquirir(adquiridas)
+
+    def _calcular_asignacion(self, workers: List[str]) -> Set[str]:
+        with self._lock:
+            clave = (tuple(workers), frozenset(self.torres))
+            if clave == self._cache_clave:
+                return self._asignacion
+            torres = list(self.torres)
+
+        if self.worker_id not in workers:
+            asignacion = set()
+        else:
+            asignacion = {t for t in torres if self._dueno(t, workers) == self.worker_id}
+
+        if self._cache_clave is None or clave[0] != self._cache_clave[0]:
+            logger.info(f"Rebalanceo: {len(workers)} workers, {len(asignacion)}/{len(torres)} torres para {self.worker_id}")
+        self._cache_clave = clave
+        self._asignacion = asignacion
+        return asignacion
+
+    @staticmethod
+    def _dueno(id_torre: str, workers: List[str]) -> str:
+        """Rendezvous hashing: gana el worker con mayor hash(worker, torre)"""
+        return max(
+            workers,
+            key=lambda w: hashlib.blake2b(f"{w}|{id_torre}".encode(), digest_size=8).digest()
+        )
+
+    def _liberar_leases(self, ids_torre: Iterable[str]):
+        ids_torre = list(ids_torre)
+        # primero se detiene la simulacion y despues se suelta el lease
+        self.propias.difference_update(ids_torre)
+        self.al_liberar(ids_torre)
+        pipe = self.redis.pipeline(transaction=False)
+        for id_torre in ids_torre:
+            self._liberar(keys=[self.PREFIJO_LEASE + id_torre], args=[self.worker_id], client=pipe)
+        pipe.execute()
+
+    def detener(self):
+        """Detiene el ciclo, suelta todos los leases y sale del grupo de workers"""
+        self._parar.set()
+        self._despertar.set()
+        if self._hilo:
+            self._hilo.join(timeout=self.intervalo + 5)
+        try:
+            if self.propias:
+                self._liberar_leases(self.propias)
+            self.redis.zrem(self.CLAVE_WORKERS, self.worker_id)
+        except Exception as e:
+            logger.error(f"Error liberando leases de {self.worker_id}: {str(e)}")
+        logger.info(f"Coordinador de shards detenido (worker {self.worker_id})")
+
+    def estado(self) -> Dict:
+        return {
+            'worker_id': self.worker_id,
+            'workers': self.workers,
+            'torres_totales': len(self.torres),
+            'torres_propias': len(self.propias)
+        }
@@ -1,6 +1,10 @@
 import random
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, Literal
+from itertools import repeat
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+
+import numpy as np
 
 def generar_datos_meteorologicos(id_torre: str) -> dict:
     return {
@@ -36,3 +40,106 @@ def generar_diagnostico_tecnico(id_torre: str) -> dict:
         "estado_sensor_humedad": estado_sensor_humedad,
         "estado_general": estado_general,
     }
+
+def generar_lectura(id_torre: str) -> Tuple[dict, dict]:
+    """Lectura y diagnóstico de una torre según el escenario configurado (SIMULATION_SCENARIO)"""
+    from api.utils.escenarios import obtener_escenario
+
+    escenario = obtener_escenario()
+    if escenario is None:
+        return generar_datos_meteorologicos(id_torre), generar_diagnostico_tecnico(id_torre)
+    return escenario.generar(id_torre)
+
+
+# generacion vectorizada de toda la flota
+
+ESTADOS_SENSOR = np.array(["OK", "Error"], dtype=object)
+ESTADOS_GENERALES = np.array(["Normal", "Alerta", "Crítico"], dtype=object)
+
+CAMPOS_METEO = (
+    "temperatura", "humedad_relativa", "presion_atmosferica", "velocidad_viento",
+    "direccion_viento", "precipitacion", "radiacion_solar", "indice_uv",
+)
+CAMPOS_DIAGNOSTICO = (
+    "nivel_bateria", "tiempo_ultima_conexion", "estado_sensor_temperatura",
+    "estado_sensor_humedad", "estado_general",
+)
+
+@dataclass
+class LoteFlota:
+    """Un tick de toda la flota en formato columnar (un array por campo)"""
+    ids_torre: np.ndarray
+    timestamp: datetime
+    meteo: Dict[str, np.ndarray]
+    diagnostico: Dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return len(self.ids_torre)
+
+    def registros_meteo(self) -> List[dict]:
+        """Filas con la misma forma que generar_datos_meteorologicos"""
+        columnas = [self.meteo[c].tolist() for c in CAMPOS_METEO]
+        return self._registros(CAMPOS_METEO, columnas)
+
+    def registros_diagnostico(self) -> List[dict]:
+        """Filas con la misma forma que generar_diagnostico_tecnico"""
+        ultima = (np.datetime64(self.timestamp, "us")
+                  - self.diagnostico["minutos_sin_conexion"].astype("timedelta64[m]")).tolist()
+        columnas = [
+            self.diagnostico["nivel_bateria"].tolist(),
+            ultima,
+            ESTADOS_SENSOR[self.diagnostico["error_sensor_temperatura"].astype(np.int8)].tolist(),
+            ESTADOS_SENSOR[self.diagnostico["error_sensor_humedad"].astype(np.int8)].tolist(),
+            ESTADOS_GENERALES[self.diagnostico["estado_general"]].tolist(),
+        ]
+        return self._registros(CAMPOS_DIAGNOSTICO, columnas)
+
+    def _registros(self, campos: Sequence[str], columnas: List[list]) -> List[dict]:
+        claves = ("id_torre", "timestamp") + tuple(campos)
+        filas = zip(self.ids_torre.tolist(), repeat(self.timestamp.isoformat()), *columnas)
+        return [dict(zip(claves, fila)) for fila in filas]
+
+
+class SimuladorFlota:
+    """
+    Genera un tick de toda la flota con NumPy. Usa las mismas distribuciones y reglas de
+    estado_general que las funciones escalares y es reproducible a partir de la semilla.
+    """
+
+    def __init__(self, ids_torre: Sequence[str], seed: Optional[int] = None):
+        self.ids_torre = np.asarray(list(ids_torre), dtype=object)
+        self.rng = np.random.default_rng(seed)
+
+    def tick(self, instante: Optional[datetime] = None) -> LoteFlota:
+        n = len(self.ids_torre)
+        rng = self.rng
+        instante = instante or datetime.utcnow()
+
+        meteo = {
+            "temperatura": np.round(rng.uniform(10.0, 35.0, n), 2),
+            "humedad_relativa": np.round(rng.uniform(30.0, 90.0, n), 2),
+            "presion_atmosferica": np.round(rng.uniform(950.0, 1050.0, n), 2),
+            "velocidad_viento": np.round(rng.uniform(0.0, 20.0, n), 2),
+            "direccion_viento": rng.integers(0, 361, n),
+            "precipitacion": np.round(rng.uniform(0.0, 10.0, n), 2),
+            "radiacion_solar": np.round(rng.uniform(100.0, 1000.0, n), 2),
+            "indice_uv": rng.integers(0, 12, n),
+        }
+
+        nivel_bateria = np.round(rng.uniform(10.0, 100.0, n), 2)
+        error_temp = rng.random(n) < 0.05
+        error_hum = rng.random(n) < 0.05
+
+        # 0 = Normal, 1 = Alerta (70%), 2 = Crítico (30%) cuando hay bateria baja o sensor con error
+        degradada = (nivel_bateria < 20.0) | error_temp | error_hum
+        estado_general = np.where(degradada, np.where(rng.random(n) < 0.7, 1, 2), 0).astype(np.int8)
+
+        diagnostico = {
+            "nivel_bateria": nivel_bateria,
+            "minutos_sin_conexion": rng.integers(1, 31, n),
+            "error_sensor_temperatura": error_temp,
+            "error_sensor_humedad": error_hum,
+            "estado_general": estado_general,
+        }
+
+        return LoteFlota(self.ids_torre, instante, meteo, diagnostico)
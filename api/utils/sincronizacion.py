@@ -0,0 +1,371 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from dateutil.parser import parse
+from sqlalchemy import DateTime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config.settings import Config
+from api.database import db_manager
+from api.models.sincronizacion import MarcaSincronizacion
+
+logger = logging.getLogger(__name__)
+
+# Sincronización Supabase -> SQLite. Cada tabla con columna de marca (última modificación
+# o timestamp de la lectura) guarda en sincronizacion_marcas el mayor valor copiado, y la
+# siguiente pasada solo pide filas con columna >= marca. Las filas se escriben con
+# INSERT ... ON CONFLICT DO UPDATE por lotes, sin consultar antes qué IDs existen, página
+# a página (keyset) y con varias tablas a la vez.
+# Las pasadas incrementales no ven borrados ni filas con la columna de marca a NULL: para
+# eso está la pasada completa (sin marca, sin columna o cada SYNC_FULL_EVERY ciclos).
+# En las lecturas la marca es el timestamp de la medida, no el de inserción: un gateway
+# que reenvía horas atrasadas inserta filas por debajo de la marca, así que esas tablas
+# se piden desde SYNC_LOOKBACK_SECONDS antes de la marca (el upsert es idempotente).
+
+# tabla de Supabase: (módulo de api.models, modelo, columna de marca o None)
+TABLAS = {
+    'torres': ('torres', 'Torre', 'ultima_actualizacion'),
+    'profiles': ('profiles', 'Profile', 'updated_at'),
+    'payments': ('payments', 'Payment', None),  # sin columna de modificación: siempre completa
+    'datos_meteorologicos': ('datos_meteorologicos', 'DatoMeteorologico', 'timestamp'),
+    'diagnostico_tecnico': ('diagnostico_tecnico', 'DiagnosticoTecnico', 'timestamp'),
+}
+
+# tablas en las que Supabase es la única fuente: la pasada completa borra en SQLite lo que
+# ya no existe allí (las lecturas no, SQLite puede tener filas que Supabase rechazó)
+TABLAS_ESPEJO = {'torres', 'profiles', 'payments'}
+
+# tablas cuya columna de marca es la hora de la medida: pueden llegar filas con marca antigua
+TABLAS_POR_MEDIDA = {'datos_meteorologicos', 'diagnostico_tecnico'}
+
+TAM_LOTE_UPSERT = 500
+
+_locks = defaultdict(threading.Lock)  # una sincronización a la vez por tabla
+_escritura_sqlite = threading.Lock()  # las tablas se descargan en paralelo pero SQLite admite un escritor
+
+
+def obtener_modelo(tabla: str):
+    if tabla not in TABLAS:
+        raise ValueError(f"No existe mapeo para la tabla {tabla}")
+    modulo, nombre, _ = TABLAS[tabla]
+    return getattr(__import__(f'api.models.{modulo}', fromlist=[nombre]), nombre)
+
+
+def _fecha(texto: str) -> datetime:
+    """Fecha de Supabase en UTC sin zona (como se guarda en SQLite)"""
+    # PostgREST devuelve ISO 8601: fromisoformat es ~20 veces más rápido que dateutil
+    try:
+        fecha = datetime.fromisoformat(texto)
+    except ValueError:
+        fecha = parse(texto)
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+
+def _normalizar(tabla: str, modelo, filas: List[Dict]) -> List[Dict]:
+    """Solo las columnas del modelo, con las fechas de Supabase convertidas a datetime"""
+    columnas = modelo.__table__.columns
+    presentes = [c.name for c in columnas if c.name in filas[0]]
+    fechas = {c.name for c in columnas if isinstance(c.type, DateTime)}
+    normalizadas = []
+    for fila in filas:
+        registro = {}
+        for nombre in presentes:
+            valor = fila.get(nombre)
+            if nombre in fechas and isinstance(valor, str) and valor:
+                try:
+                    valor = _fecha(valor)
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"Error parseando fecha en {tabla}.{nombre}: {e}")
+                    valor = datetime.now()
+            registro[nombre] = valor
+        normalizadas.append(registro)
+    return normalizadas
+
+
+def upsert_sqlite(modelo, filas: List[Dict], tam_lote: int = TAM_LOTE_UPSERT) -> int:
+    """INSERT ... ON CONFLICT(pk) DO UPDATE por lotes; devuelve las filas escritas"""
+    if not filas:
+        return 0
+    tabla = modelo.__table__
+    clave = [c.name for c in tabla.primary_key.columns]
+    actualizables = [nombre for nombre in filas[0] if nombre not in clave]
+
+    with db_manager.engine.begin() as conn:
+        for i in range(0, len(filas), tam_lote):
+            sentencia = sqlite_insert(tabla).values(filas[i:i + tam_lote])
+            if actualizables:
+                sentencia = sentencia.on_conflict_do_update(
+                    index_elements=clave,
+                    set_={nombre: sentencia.excluded[nombre] for nombre in actualizables}
+                )
+            else:
+                sentencia = sentencia.on_conflict_do_nothing(index_elements=clave)
+            conn.execute(sentencia)
+    return len(filas)
+
+
+def borrar_ausentes(modelo, claves_remotas: set, tam_lote: int = TAM_LOTE_UPSERT) -> int:
+    """Borra de SQLite las filas cuya clave primaria ya no está en Supabase"""
+    columna = next(iter(modelo.__table__.primary_key.columns))
+    with db_manager.engine.begin() as conn:
+        locales = {fila[0] for fila in conn.execute(modelo.__table__.select().with_only_columns(columna))}
+        ausentes = list(locales - claves_remotas)
+        for i in range(0, len(ausentes), tam_lote):
+            conn.execute(modelo.__table__.delete().where(columna.in_(ausentes[i:i + tam_lote])))
+    return len(ausentes)
+
+
+def leer_marca(tabla: str) -> Optional[str]:
+    with db_manager.get_session() as session:
+        registro = session.get(MarcaSincronizacion, tabla)
+        return registro.marca if registro else None
+
+
+def guardar_marca(tabla: str, marca: Optional[str], filas: int):
+    with db_manager.get_session() as session:
+        session.merge(MarcaSincronizacion(tabla=tabla, marca=marca, filas=filas, actualizado=datetime.now()))
+
+
+def _mayor_marca(filas: List[Dict], columna: str, actual: Optional[str]) -> Optional[str]:
+    # se comparan como fechas (el texto puede venir con distintas zonas) y se guarda el original
+    mayor, mayor_fecha = actual, _fecha(actual) if actual else None
+    for fila in filas:
+        valor = fila.get(columna)
+        if not valor:
+            continue
+        fecha = _fecha(valor)
+        if mayor_fecha is None or fecha > mayor_fecha:
+            mayor, mayor_fecha = valor, fecha
+    return mayor
+
+
+def _retroceder(marca: str, segundos: float) -> str:
+    """La marca `segundos` antes, conservando su zona horaria (o la falta de ella)"""
+    try:
+        fecha = datetime.fromisoformat(marca)
+    except ValueError:
+        fecha = parse(marca)
+    return (fecha - timedelta(seconds=segundos)).isoformat()
+
+
+def _literal(valor) -> str:
+    # entre comillas dentro de or=(...): las marcas ISO llevan ':' y '+'
+    return '"' + str(valor).replace('"', '\\"') + '"'
+
+
+def paginas_keyset(consulta: Callable[[], Any], clave: str, tam_pagina: int = None) -> Iterator[List[Dict]]:
+    """
+    Páginas de `consulta()` (una consulta de Supabase nueva, con sus filtros) ordenadas por
+    la columna única `clave`, pidiendo clave > última fila hasta recibir una página vacía:
+    el límite de filas de PostgREST no trunca el resultado.
+    """
+    tam_pagina = tam_pagina or Config.SYNC_PAGE_SIZE
+    cursor = None
+    while True:
+        pagina = consulta()
+        if cursor is not None:
+            pagina = pagina.gt(clave, cursor)
+        filas = pagina.order(clave).limit(tam_pagina).execute().data or []
+        if not filas:
+            return
+        yield filas
+        cursor = filas[-1][clave]
+
+
+def paginas_remotas(tabla: str, columna: Optional[str], marca: Optional[str], incremental: bool,
+                    tam_pagina: int = None) -> Iterator[List[Dict]]:
+    """
+    Páginas de Supabase por keyset: (columna, clave) > última fila en las incrementales y
+    clave > última en las completas. Nunca se usa offset, así que una fila insertada o
+    borrada entre páginas no desplaza a las demás; se pide hasta recibir una página vacía,
+    de modo que un límite de filas del servidor menor que la página no trunca nada.
+    """
+    tam_pagina = tam_pagina or Config.SYNC_PAGE_SIZE
+    clave = next(iter(obtener_modelo(tabla).__table__.primary_key.columns)).name
+    cursor = None
+    while True:
+        consulta = db_manager.supabase.table(tabla).select('*')
+        if incremental:
+            if cursor is None:
+                consulta = consulta.gte(columna, marca)
+            else:
+                valor, ultima_clave = _literal(cursor[0]), _literal(cursor[1])
+                consulta = consulta.or_(
+                    f"{columna}.gt.{valor},and({columna}.eq.{valor},{clave}.gt.{ultima_clave})"
+                )
+            consulta = consulta.order(columna).order(clave)
+        else:
+            if cursor is not None:
+                consulta = consulta.gt(clave, cursor)
+            consulta = consulta.order(clave)
+
+        filas = consulta.limit(tam_pagina).execute().data or []
+        if not filas:
+            return
+        yield filas
+        ultima = filas[-1]
+        cursor = (ultima[columna], ultima[clave]) if incremental else ultima[clave]
+
+
+def sincronizar_tabla(tabla: str, completa: bool = False, tam_pagina: int = None) -> Dict:
+    """
+    Copia a SQLite las filas de Supabase modificadas desde la última marca de la tabla
+    (todas si `completa`, si no hay marca o si la tabla no tiene columna de marca).
+    Cada página se escribe en cuanto llega: la memoria no depende del tamaño de la tabla.
+    """
+    modelo = obtener_modelo(tabla)
+    columna = TABLAS[tabla][2]
+    clave = next(iter(modelo.__table__.primary_key.columns)).name
+
+    with _locks[tabla]:
+        inicio = time.perf_counter()
+        marca = leer_marca(tabla) if columna else None
+        incremental = bool(columna and marca and not completa)
+        espejo = not incremental and tabla in TABLAS_ESPEJO
+        desde = marca
+        if incremental and tabla in TABLAS_POR_MEDIDA and Config.SYNC_LOOKBACK_SECONDS > 0:
+            desde = _retroceder(marca, Config.SYNC_LOOKBACK_SECONDS)  # lecturas atrasadas
+
+        escritas = paginas = 0
+        nueva_marca = marca
+        claves_remotas = set()
+        for filas in paginas_remotas(tabla, columna, desde, incremental, tam_pagina):
+            paginas += 1
+            normalizadas = _normalizar(tabla, modelo, filas)
+            with _escritura_sqlite:
+                escritas += upsert_sqlite(modelo, normalizadas)
+            if columna:
+                nueva_marca = _mayor_marca(filas, columna, nueva_marca)
+            if espejo:
+                claves_remotas.update(fila.get(clave) for fila in filas)
+
+        if not escritas and not incremental:
+            logger.warning(f"Tabla '{tabla}' en Supabase esta vacia")
+
+        borradas = 0
+        if espejo and escritas:
+            # el recorrido por keyset terminó con una página vacía: la tabla remota está completa
+            with _escritura_sqlite:
+                borradas = borrar_ausentes(modelo, claves_remotas)
+        guardar_marca(tabla, nueva_marca, escritas)
+
+        segundos = time.perf_counter() - inicio
+        resultado = {
+            'tabla': tabla,
+            'modo': 'incremental' if incremental else 'completa',
+            'filas': escritas,
+            'borradas': borradas,
+            'paginas': paginas,
+            'marca': nueva_marca,
+            'segundos': round(segundos, 3),
+            'filas_s': round(escritas / segundos, 1) if segundos > 0 else 0
+        }
+        logger.info(
+            f"Sincronización {resultado['modo']} de {tabla}: {escritas} filas, {borradas} borradas "
+            f"en {paginas} páginas, {resultado['segundos']}s ({resultado['filas_s']} filas/s, marca {nueva_marca})"
+        )
+        return resultado
+
+
+def sincronizar_tablas(tablas: List[str], completa: bool = False, hilos: int = None,
+                       tam_pagina: int = None, ignorar_errores: bool = False) -> List[Dict]:
+    """
+    Sincroniza tablas independientes en paralelo (la descarga de una se solapa con la de
+    las demás; las escrituras en SQLite se serializan). Sin `ignorar_errores` relanza el
+    primer error después de terminar las demás tablas.
+    """
+    hilos = max(1, min(hilos or Config.SYNC_WORKERS, len(tablas) or 1))
+    resultados, error = [], None
+    with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='sincronizacion') as ejecutor:
+        futuros = {tabla: ejecutor.submit(sincronizar_tabla, tabla, completa, tam_pagina) for tabla in tablas}
+        for tabla, futuro in futuros.items():
+            try:
+                resultados.append(futuro.result())
+            except Exception as e:
+                logger.error(f"Error sincronizando {tabla}: {str(e)}")
+                error = error or e
+    if error is not None and not ignorar_errores:
+        raise error
+    return resultados
+
+
+class SincronizadorPeriodico:
+    """
+    Repite la sincronización incremental de SYNC_TABLES cada SYNC_INTERVAL segundos y la
+    completa cada SYNC_FULL_EVERY ciclos (recoge borrados y columnas de marca a NULL).
+    """
+
+    def __init__(self, tablas: Optional[List[str]] = None):
+        self.tablas = tablas or Config.SYNC_TABLES
+        self.ciclos = 0
+        self.ultimos: Dict[str, Dict] = {}
+        self._parar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def sincronizar(self, completa: bool = False) -> List[Dict]:
+        resultados = sincronizar_tablas(self.tablas, completa=completa, ignorar_errores=True)
+        for resultado in resultados:
+            self.ultimos[resultado['tabla']] = resultado
+        return resultados
+
+    def _periodico(self):
+        while not self._parar.wait(Config.SYNC_INTERVAL):
+            self.ciclos += 1
+            completa = Config.SYNC_FULL_EVERY > 0 and self.ciclos % Config.SYNC_FULL_EVERY == 0
+            self.sincronizar(completa=completa)
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._periodico, name='sincronizacion', daemon=True)
+        self._hilo.start()
+        logger.info(f"Sincronización periódica de {', '.join(self.tablas)} cada {Config.SYNC_INTERVAL}s")
+
+    def detener(self):
+        self._parar.set()
+        if self._hilo:
+            self._hilo.join(timeout=5)
+            self._hilo = None
+
+    def estado(self) -> Dict:
+        return {
+            'activo': bool(self._hilo and self._hilo.is_alive()),
+            'ciclos': self.ciclos,
+            'tablas': self.ultimos
+        }
+
+
+# Instancia global
+sincronizador = SincronizadorPeriodico()
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Sincroniza (o rellena) tablas de Supabase en SQLite")
+    parser.add_argument('--tablas', default=','.join(Config.SYNC_TABLES),
+                        help="p. ej. datos_meteorologicos,diagnostico_tecnico para un backfill")
+    parser.add_argument('--completa', action='store_true', help="ignorar la marca y recorrer toda la tabla")
+    parser.add_argument('--hilos', type=int, default=Config.SYNC_WORKERS)
+    parser.add_argument('--pagina', type=int, default=Config.SYNC_PAGE_SIZE, help="filas por página")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    tablas = [t.strip() for t in args.tablas.split(',') if t.strip()]
+    inicio = time.perf_counter()
+    resultados = sincronizar_tablas(tablas, args.completa, args.hilos, args.pagina)
+    total = time.perf_counter() - inicio
+    print(json.dumps({
+        'tablas': resultados,
+        'segundos': round(total, 3),
+        'filas_s': round(sum(r['filas'] for r in resultados) / total, 1) if total > 0 else 0
+    }, indent=2))
@@ -0,0 +1,289 @@
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from api.utils.codec_redis import decodificar
+from api.utils.procesos import tras_fork
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+PATRON_LECTURAS = 'lecturas:*'
+PATRON_ALERTAS = 'alertas:*'
+
+# campos que se comparan para enviar solo lo que cambió en cada lectura
+CAMPOS_DELTA = (
+    'temperatura', 'humedad_relativa', 'presion_atmosferica', 'velocidad_viento',
+    'direccion_viento', 'precipitacion', 'radiacion_solar', 'indice_uv',
+)
+
+
+def canal_lecturas(id_torre: str) -> str:
+    return f"lecturas:{id_torre}"
+
+
+class ClienteSSE:
+    """Una conexión SSE abierta: cola propia y el usuario al que pertenece"""
+
+    def __init__(self, usuario: str, tam_cola: int):
+        self.usuario = usuario
+        self.cola: queue.Queue = queue.Queue(maxsize=tam_cola)
+        self.cerrado = False
+
+    def enviar(self, evento: Tuple[int, str, str]) -> bool:
+        try:
+            self.cola.put_nowait(evento)
+            return True
+        except queue.Full:
+            # cliente lento: se cierra y el navegador reconecta con Last-Event-ID
+            self.cerrado = True
+            return False
+
+
+class HubEventos:
+    """
+    Reparto de eventos en vivo a los clientes SSE de este proceso. Una sola suscripción
+    Redis (PSUBSCRIBE lecturas:*, alertas:* y el canal de cambios de torres) alimenta a
+    todos los clientes: cada mensaje se enruta al usuario dueño de la torre. Los eventos
+    recientes se guardan en un buffer circular con IDs "<epoca>-<secuencia>" para poder
+    reanudar desde Last-Event-ID; de las lecturas solo se envían los campos que cambiaron.
+    """
+
+    def __init__(self, redis_client=None):
+        self._redis = redis_client
+        self.epoca = format(int(time.time()), 'x')
+        self._secuencia = itertools.count(1)
+        self._buffer: deque = deque(maxlen=Config.SSE_BUFFER)
+        self._clientes: Dict[str, Set[ClienteSSE]] = {}
+        self._torres_usuario: Dict[str, str] = {}
+        self._ultimas: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self.eventos = 0
+        self.descartados = 0
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            from api.database import db_manager
+
+            self._redis = db_manager.redis
+        return self._redis
+
+    # clientes
+
+    def conectar(self, usuario: str, torres: List[str]) -> ClienteSSE:
+        """Registra un cliente del usuario y las torres que tiene asignadas"""
+        self.iniciar()
+        cliente = ClienteSSE(usuario, Config.SSE_CLIENT_QUEUE)
+        with self._lock:
+            self._clientes.setdefault(usuario, set()).add(cliente)
+            for id_torre in torres:
+                self._torres_usuario[id_torre] = usuario
+                self._ultimas.pop(id_torre, None)  # la primera lectura se envia completa
+        return cliente
+
+    def desconectar(self, cliente: ClienteSSE):
+        with self._lock:
+            clientes = self._clientes.get(cliente.usuario)
+            if clientes:
+                clientes.discard(cliente)
+                if not clientes:
+                    del self._clientes[cliente.usuario]
+                    torres = [t for t, u in self._torres_usuario.items() if u == cliente.usuario]
+                    for id_torre in torres:
+                        del self._torres_usuario[id_torre]
+                        self._ultimas.pop(id_torre, None)
+
+    def pendientes_desde(self, usuario: str, ultimo_id: Optional[str]) -> Optional[List[Tuple[int, str, str]]]:
+        """
+        Eventos del usuario posteriores a Last-Event-ID. None si no se puede reanudar
+        (otro proceso u otra época, o el evento ya salió del buffer): el cliente debe
+        volver a pedir el estado completo.
+        """
+        if not ultimo_id:
+            return []
+        epoca, _, secuencia = ultimo_id.partition('-')
+        if epoca != self.epoca or not secuencia.isdigit():
+            return None
+        secuencia = int(secuencia)
+        with self._lock:
+            eventos = list(self._buffer)
+        if eventos and eventos[0][0] > secuencia + 1:
+            return None
+        return [(s, tipo, datos) for s, u, tipo, datos in eventos if u == usuario and s > secuencia]
+
+    # reparto
+
+    def _emitir(self, usuario: str, tipo: str, datos: Dict):
+        secuencia = next(self._secuencia)
+        texto = json.dumps(datos, separators=(',', ':'), default=str)
+        with self._lock:
+            self._buffer.append((secuencia, usuario, tipo, texto))
+            clientes = list(self._clientes.get(usuario, ()))
+        evento = (secuencia, tipo, texto)
+        for cliente in clientes:
+            if not cliente.enviar(evento):
+                self.descartados += 1
+        self.eventos += 1
+
+    def _delta_lectura(self, datos: Dict) -> Dict:
+        """Solo los campos que cambiaron desde la última lectura enviada de la torre"""
+        id_torre = datos['id_torre']
+        anterior = self._ultimas.get(id_torre, {})
+        delta = {'t': id_torre, 'ts': datos.get('timestamp')}
+        for campo in CAMPOS_DELTA:
+            if campo in datos and anterior.get(campo) != datos[campo]:
+                delta[campo] = datos[campo]
+        self._ultimas[id_torre] = datos
+        return delta
+
+    def procesar(self, canal: str, datos: bytes):
+        """Enruta un mensaje Redis al usuario de la torre (si tiene clientes conectados)"""
+        from api.services.torre_service import CANAL_CAMBIOS_TORRES
+
+        mensaje = decodificar(datos)
+        if canal == CANAL_CAMBIOS_TORRES:
+            self._cambio_torre(mensaje)
+            return
+
+        id_torre = mensaje.get('id_torre')
+        usuario = self._torres_usuario.get(id_torre)
+        if usuario is None:
+            return
+        if canal.startswith('lecturas:'):
+            self._emitir(usuario, 'lectura', self._delta_lectura(mensaje))
+        elif canal.startswith('alertas:'):
+            self._emitir(usuario, 'alerta', {
+                't': id_torre,
+                'ts': mensaje.get('timestamp'),
+                'alertas': mensaje.get('alertas', []),
+                'resueltas': mensaje.get('resueltas', []),
+                'activas': mensaje.get('activas', [])
+            })
+
+    def _cambio_torre(self, torre: Dict):
+        """Una torre cambió de usuario o de estado: actualizar el enrutado y avisar"""
+        id_torre = torre['id_torre']
+        nuevo = torre.get('usuario_asignado')
+        with self._lock:
+            anterior = self._torres_usuario.pop(id_torre, None)
+            if nuevo in self._clientes:
+                self._torres_usuario[id_torre] = nuevo
+        for usuario in {anterior, nuevo} - {None}:
+            if usuario in self._clientes:
+                self._emitir(usuario, 'torre', {
+                    't': id_torre,
+                    'estado': torre.get('estado'),
+                    'asignada': usuario == nuevo
+                })
+
+    # suscripcion Redis
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._hilo and self._hilo.is_alive():
+                return
+            self._parar.clear()
+            self._hilo = threading.Thread(target=self._escuchar, daemon=True, name="hub_sse")
+            self._hilo.start()
+            logger.info("Hub SSE iniciado")
+
+    def _escuchar(self):
+        from api.services.torre_service import CANAL_CAMBIOS_TORRES
+
+        while not self._parar.is_set():
+            pubsub = None
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(PATRON_LECTURAS, PATRON_ALERTAS)
+                pubsub.subscribe(CANAL_CAMBIOS_TORRES)
+                while not self._parar.is_set():
+                    mensaje = pubsub.get_message(timeout=1.0)
+                    if not mensaje or mensaje.get('type') not in ('message', 'pmessage'):
+                        continue
+                    canal = mensaje['channel']
+                    canal = canal.decode() if isinstance(canal, bytes) else canal
+                    try:
+                        self.procesar(canal, mensaje['data'])
+                    except Exception as e:
+                        logger.error(f"Error procesando evento de {canal}: {str(e)}")
+            except Exception as e:
+                logger.error(f"Error en suscripción del hub SSE: {str(e)}")
+                self._parar.wait(5)  # reintentar la suscripcion
+            finally:
+                if pubsub:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def detener(self):
+        self._parar.set()
+        if self._hilo:
+            self._hilo.join(timeout=5)
+
+    def reiniciar_tras_fork(self):
+        """El hilo de suscripción no pasa al hijo: se suscribe de nuevo con su propio cliente"""
+        self._redis = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo = None
+        self._clientes.clear()
+
+    def estado(self) -> Dict:
+        with self._lock:
+            return {
+                'usuarios': len(self._clientes),
+                'clientes': sum(len(c) for c in self._clientes.values()),
+                'torres': len(self._torres_usuario),
+                'eventos': self.eventos,
+                'descartados': self.descartados
+            }
+
+
+def formatear_evento(id_evento: str, tipo: str, datos: str) -> str:
+    return f"id: {id_evento}\nevent: {tipo}\ndata: {datos}\n\n"
+
+
+def flujo_cliente(hub: HubEventos, cliente: ClienteSSE,
+                  pendientes: Optional[List[Tuple[int, str, str]]]) -> Iterator[str]:
+    """
+    Generador de la respuesta SSE: eventos perdidos, eventos en vivo y heartbeats. El
+    cliente se registra antes de leer el buffer, así que un evento puede llegar por las
+    dos vías; los que ya se enviaron desde el buffer se saltan por su secuencia.
+    """
+    try:
+        yield f"retry: {Config.SSE_RETRY_MS}\n\n"
+        enviado = 0
+        if pendientes is None:
+            # no se puede reanudar: el cliente debe recargar el estado completo
+            yield formatear_evento(f"{hub.epoca}-0", 'reinicio', '{}')
+        else:
+            for secuencia, tipo, datos in pendientes:
+                yield formatear_evento(f"{hub.epoca}-{secuencia}", tipo, datos)
+                enviado = secuencia
+
+        while not cliente.cerrado:
+            try:
+                secuencia, tipo, datos = cliente.cola.get(timeout=Config.SSE_HEARTBEAT)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            if secuencia > enviado:
+                yield formatear_evento(f"{hub.epoca}-{secuencia}", tipo, datos)
+    finally:
+        hub.desconectar(cliente)
+
+
+# Instancia global (una suscripcion Redis por proceso)
+hub_eventos = HubEventos()
+tras_fork(hub_eventos.reiniciar_tras_fork)
@@ -1,15 +1,37 @@
 import threading
 import time
 import logging
-import json
-from datetime import datetime
-from typing import Dict
+from typing import Dict, List
 
-from api.database import storage_manager, db_manager
-from api.utils.simulator import generar_datos_meteorologicos, generar_diagnostico_tecnico
+from config.settings import Config
+from api.database import storage_manager
+from api.utils.simulator import generar_lectura
+from api.utils.alertas import MotorReglas, mensaje_transiciones
+from api.utils.bus_alertas import publicar_alerta
+from api.utils.codec_redis import codificar_mensaje
+from api.utils.metricas import TICKS_SIMULACION
+from api.utils.planificacion import HistogramaTicks, desfase_torre, jitter, siguiente_tick
+from api.utils.procesos import tras_fork
 
 logger = logging.getLogger(__name__)
 
+class ControlTorre:
+    """Señales de control de un hilo de simulación"""
+
+    def __init__(self, pausada: bool = False):
+        self.parar = threading.Event()
+        self.reanudada = threading.Event()
+        if not pausada:
+            self.reanudada.set()
+
+    def esperar(self, segundos: float) -> bool:
+        """Espera interrumpible; devuelve True si se pidió detener el hilo"""
+        return self.parar.wait(segundos)
+
+    def detener(self):
+        self.parar.set()
+        self.reanudada.set()  # despierta tambien a los hilos pausados
+
 class ThreadManager:
     _instance = None
     _lock = threading.Lock()
@@ -20,7 +42,13 @@ class ThreadManager:
             if cls._instance is None:
                 cls._instance = super().__new__(cls)
                 cls._instance.active_threads = {}
+                cls._instance._controles = {}
+                cls._instance._hilos_saliendo = []
+                cls._instance.pausadas = set()
                 cls._instance._running = True
+                cls._instance.reconciliador = None
+                cls._instance.histograma = HistogramaTicks(Config.SIMULATION_INTERVAL)
+                cls._instance.motor_alertas = MotorReglas()
         return cls._instance
     
     def iniciar_hilo_torre(self, torre: Dict):
@@ -30,23 +58,30 @@ class ThreadManager:
         if id_torre in self.active_threads:
             logger.warning(f"La torre {id_torre} ya tiene un hilo activo")
             return
+
+        control = ControlTorre(pausada=id_torre in self.pausadas)
         
         def hilo_torre():
             """Hilo de simulación para una torre individual"""
             logger.info(f"Iniciando simulación para torre {id_torre}")
+
+            # cada torre arranca en su propia fase del intervalo para no escribir todas a la vez
+            intervalo = Config.SIMULATION_INTERVAL
+            base = time.monotonic() + desfase_torre(id_torre, intervalo)
+            objetivo = base
             
-            while getattr(self, '_running', True):
+            while getattr(self, '_running', True) and not control.parar.is_set():
+                if control.esperar(max(0.0, objetivo - time.monotonic())):
+                    break
+                if not control.reanudada.is_set():
+                    control.reanudada.wait()  # pausada hasta reanudar o detener
+                    base = objetivo = siguiente_tick(base, intervalo, time.monotonic())
+                    continue
+
+                inicio = time.monotonic()
                 try:
-                    # generar datos simulados
-                    datos_meteo = {
-                        **generar_datos_meteorologicos(id_torre),
-                        'timestamp': datetime.utcnow().isoformat()
-                    }
-                    
-                    diagnostico = {
-                        **generar_diagnostico_tecnico(id_torre),
-                        'timestamp': datetime.utcnow().isoformat()
-                    }
+                    # generar datos simulados (uniformes o segun el escenario configurado)
+                    datos_meteo, diagnostico = generar_lectura(id_torre)
                     
                     required_meteo = ['id_torre', 'temperatura', 'humedad_relativa']
                     required_diag = ['id_torre', 'nivel_bateria', 'estado_general']
@@ -57,31 +92,30 @@ class ThreadManager:
                     if not all(k in diagnostico for k in required_diag):
                         raise ValueError(f"Faltan campos de diagnóstico requeridos: {required_diag}")
 
-                    #guardar usando storage_manager (adaptado a Supabase)
-                    resultado_meteo = storage_manager.save('meteorologico', datos_meteo)
-                    resultado_diag = storage_manager.save('diagnostico', diagnostico)
+                    # todos los comandos Redis del tick (lectura, SSE, alertas) van en un round trip
+                    with storage_manager.pipeline_redis() as pipe:
+                        #guardar usando storage_manager (adaptado a Supabase)
+                        resultado_meteo = storage_manager.save('meteorologico', datos_meteo)
+                        resultado_diag = storage_manager.save('diagnostico', diagnostico)
+                        
+                        #verificar alertas
+                        self._verificar_alertas(datos_meteo, diagnostico)
                     
                     logger.info(f"Datos guardados para {id_torre} | "
                             f"Meteo: {resultado_meteo.get('supabase', {}).get('success')} | "
-                            f"Diag: {resultado_diag.get('supabase', {}).get('success')}")
+                            f"Diag: {resultado_diag.get('supabase', {}).get('success')} | "
+                            f"Redis: {len(pipe) - len(pipe.errores)}/{len(pipe)}")
                     
-                    #verificar alertas
-                    self._verificar_alertas(
-                        datos_meteo,
-                        diagnostico,
-                        umbrales={
-                            'temperatura_alta': 35,
-                            'temperatura_baja': 5,
-                            'humedad_alta': 90,
-                            'bateria_baja': 20
-                        }
-                    )
-                    
-                    time.sleep(10)  #intervalo configurable
+                    duracion = time.monotonic() - inicio
+                    self.histograma.registrar(inicio, duracion)
+                    TICKS_SIMULACION.observar(duracion, 'threads')
+                    base = siguiente_tick(base, intervalo, time.monotonic())
+                    objetivo = base + jitter(intervalo)
                     
                 except Exception as e:
                     logger.error(f"Error en simulación torre {id_torre}: {str(e)}", exc_info=True)
-                    time.sleep(30)  # backoff en caso de error / esperar antes de reintentar
+                    # backoff en caso de error / esperar antes de reintentar (conservando la fase)
+                    base = objetivo = siguiente_tick(base, intervalo, time.monotonic() + 30)
 
         thread = threading.Thread(
             target=hilo_torre,
@@ -89,82 +123,154 @@ class ThreadManager:
             name=f"torre_sim_{id_torre}"
         )
         self.active_threads[id_torre] = thread
+        self._controles[id_torre] = control
         thread.start()
+
+    def detener_hilo_torre(self, id_torre: str):
+        """Señala al hilo de una torre que termine; el tick en curso se completa"""
+        control = self._controles.pop(id_torre, None)
+        if control:
+            control.detener()
+        thread = self.active_threads.pop(id_torre, None)
+        if thread:
+            self._hilos_saliendo = [t for t in self._hilos_saliendo if t.is_alive()]
+            self._hilos_saliendo.append(thread)
+
+    def pausar_torre(self, id_torre: str):
+        """Pausa la simulación de una torre sin detener su hilo"""
+        self.pausadas.add(id_torre)
+        control = self._controles.get(id_torre)
+        if control:
+            control.reanudada.clear()
+
+    def reanudar_torre(self, id_torre: str):
+        self.pausadas.discard(id_torre)
+        control = self._controles.get(id_torre)
+        if control:
+            control.reanudada.set()
+
+    def iniciar_torres(self, ids_torre: List[str]):
+        for id_torre in ids_torre:
+            self.iniciar_hilo_torre({"id_torre": id_torre})
+
+    def detener_torres(self, ids_torre: List[str]):
+        for id_torre in ids_torre:
+            self.detener_hilo_torre(id_torre)
     
     def iniciar_simulaciones(self):
         """Inicia hilos para todas las torres activas"""
         logger.info("Iniciando simulaciones para torres activas")
         
         try:
-            # usar storage_manager.supabase en lugar de supabase directo (?)
-            torres_activas = db_manager.supabase.table("torres").select("id_torre").eq("estado", "Activa").not_.is_("usuario_asignado", "null").execute().data
-            
-            for torre in torres_activas:
-                self.iniciar_hilo_torre(torre)
-            
-            logger.info(f"Simulación iniciada para {len(torres_activas)} torres")
+            self._running = True
+
+            # el reconciliador arranca las torres activas y sigue los cambios de estado
+            from api.utils.reconciliador import ReconciliadorFlota
+
+            if self.reconciliador is None:
+                self.reconciliador = ReconciliadorFlota(self)
+            self.reconciliador.iniciar()
             
         except Exception as e:
             logger.error(f"Error al iniciar simulaciones: {str(e)}")
     
-    def detener_simulaciones(self):
-        """Detiene todos los hilos de simulación"""
+    def detener_simulaciones(self, timeout: float = None):
+        """
+        Detiene todos los hilos de simulación. Todos reciben la señal a la vez y las
+        esperas se interrumpen; la fase de drenaje deja terminar las escrituras del tick
+        en curso con un único plazo total (SHUTDOWN_TIMEOUT), no uno por hilo.
+        """
+        timeout = Config.SHUTDOWN_TIMEOUT if timeout is None else timeout
+        inicio = time.monotonic()
+
+        if self.reconciliador:
+            self.reconciliador.detener()
         self._running = False
-        for thread in self.active_threads.values():
-            thread.join(timeout=5)
+        for control in self._controles.values():
+            control.detener()
+
+        # drenaje: esperar a que los ticks en curso terminen de escribir
+        limite = inicio + timeout
+        hilos = list(self.active_threads.items()) + [(t.name, t) for t in self._hilos_saliendo]
+        sin_terminar = []
+        for nombre, thread in hilos:
+            thread.join(timeout=max(0.0, limite - time.monotonic()))
+            if thread.is_alive():
+                sin_terminar.append(nombre)
+
         self.active_threads.clear()
-        logger.info("Todas las simulaciones han sido detenidas")
+        self._controles.clear()
+        self._hilos_saliendo.clear()
 
-    def _verificar_alertas(self, datos: dict, diagnostico: dict, umbrales: dict):
-        """Verifica condiciones de alerta con umbrales configurables"""
-        alertas = []
-        
-        # Alertas meteorológicas
-        temp = datos.get('temperatura')
-        if temp > umbrales['temperatura_alta']:
-            alertas.append(f"Temperatura alta: {temp}°C")
-        elif temp < umbrales['temperatura_baja']:
-            alertas.append(f"Temperatura baja: {temp}°C")
-        
-        if datos.get('humedad_relativa', 0) > umbrales['humedad_alta']:
-            alertas.append(f"Humedad alta: {datos['humedad_relativa']}%")
-        
-        # Alertas técnicas
-        if diagnostico.get('nivel_bateria', 100) < umbrales['bateria_baja']:
-            alertas.append(f"Batería crítica: {diagnostico['nivel_bateria']}%")
-        
-        if diagnostico.get('estado_general') == 'Crítico':
-            alertas.append("Estado CRÍTICO de la torre")
-        
-        # publicar si hay alertas  ?
-        if alertas:
+        if sin_terminar:
+            logger.warning(f"{len(sin_terminar)} hilos no terminaron su escritura en {timeout}s")
+        logger.info(f"Todas las simulaciones han sido detenidas en {time.monotonic() - inicio:.2f}s")
+
+    def estadisticas(self) -> Dict:
+        """Torres activas, histograma de ticks y esperas de los limitadores de escritura"""
+        return {
+            'torres': len(self.active_threads),
+            'pausadas': len(self.pausadas),
+            'histograma_ticks': self.histograma.resumen(),
+            'alertas': self.motor_alertas.estado(),
+            'limitadores': {n: l.estado() for n, l in storage_manager.limitadores.items()}
+        }
+
+    def _verificar_alertas(self, datos: dict, diagnostico: dict):
+        """Evalúa las reglas de alerta y publica solo si cambió el estado de alguna"""
+        transiciones = self.motor_alertas.evaluar_lectura(datos, diagnostico)
+        if transiciones:
             self._publicar_alerta(
                 datos['id_torre'],
-                alertas,
+                transiciones,
                 datos=datos,
                 diagnostico=diagnostico
             )
 
 
-    def _publicar_alerta(self, id_torre: str, alertas: list, datos: dict, diagnostico: dict):
-        """Publica alertas en Redis"""
+    def _publicar_alerta(self, id_torre: str, transiciones: list, datos: dict, diagnostico: dict):
+        """Publica las transiciones en Redis: PUBLISH para clientes en vivo y el stream persistente"""
         try:
-            mensaje = {
-                'id_torre': id_torre,
-                'timestamp': datetime.utcnow().isoformat(),
-                'alertas': alertas,
-                'datos': datos,
-                'diagnostico': diagnostico
-            }
-            
-            db_manager.redis.publish(
-                f"alertas:{id_torre}",
-                json.dumps(mensaje)
+            mensaje = mensaje_transiciones(
+                id_torre,
+                transiciones,
+                self.motor_alertas.activas(id_torre),
+                datos,
+                diagnostico
             )
             
-            logger.warning(f"Alerta para torre {id_torre}: {', '.join(alertas)}")
+            # dentro de un tick se encola en el pipeline del tick
+            with storage_manager.pipeline_redis() as pipe:
+                pipe.publish(
+                    f"alertas:{id_torre}",
+                    codificar_mensaje(mensaje)
+                )
+                publicar_alerta(pipe, mensaje, usuario=self.motor_alertas.usuarios.get(id_torre))
+            
+            if mensaje['alertas']:
+                logger.warning(f"Alerta para torre {id_torre}: {', '.join(mensaje['alertas'])}")
+            if mensaje['resueltas']:
+                logger.info(f"Alertas resueltas en torre {id_torre}: {', '.join(mensaje['resueltas'])}")
         except Exception as e:
             logger.error(f"Error publicando alerta: {str(e)}")
 
 # Singleton global
-thread_manager = ThreadManager()
\ No newline at end of file
+thread_manager = ThreadManager()
+
+@tras_fork
+def _simulaciones_tras_fork():
+    """Los hilos de simulación no pasan al hijo: se olvidan para no contarlos como activos"""
+    if thread_manager.active_threads:
+        logger.warning(f"{len(thread_manager.active_threads)} simulaciones del proceso padre no continúan "
+                       "en este proceso; la simulación corre en el proceso de ingesta (PROCESS_ROLE)")
+    ThreadManager._lock = threading.Lock()
+    thread_manager.active_threads.clear()
+    thread_manager._controles.clear()
+    thread_manager._hilos_saliendo.clear()
+
+def obtener_gestor_simulacion():
+    """Devuelve el motor de simulación configurado en SIMULATION_ENGINE (threads | asyncio)"""
+    if Config.SIMULATION_ENGINE == 'asyncio':
+        from api.utils.async_manager import async_manager
+        return async_manager
+    return thread_manager
\ No newline at end of file
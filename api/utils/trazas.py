@@ -0,0 +1,210 @@
+import contextvars
+import json
+import logging
+import time
+from typing import Dict, Optional
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+logger_lentas = logging.getLogger('api.peticiones_lentas')
+
+# Trazas por petición: el tiempo pasado en Supabase, Supabase Auth, Redis, SQLite y la
+# serialización JSON se atribuye a la petición en curso (contextvar) y se devuelve en la
+# cabecera Server-Timing. Fuera de una petición (hilos de simulación) no se acumula nada.
+
+
+class TrazaPeticion:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.dependencias: Dict[str, list] = {}  # nombre -> [segundos, llamadas]
+
+    def registrar(self, dependencia: str, duracion: float):
+        total = self.dependencias.get(dependencia)
+        if total is None:
+            total = self.dependencias[dependencia] = [0.0, 0]
+        total[0] += duracion
+        total[1] += 1
+
+    def server_timing(self, total: float) -> str:
+        partes = [
+            f'{nombre};dur={segundos * 1000:.2f};desc="{llamadas} llamadas"'
+            for nombre, (segundos, llamadas) in sorted(self.dependencias.items())
+        ]
+        partes.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(partes)
+
+    def desglose(self) -> Dict[str, Dict]:
+        return {
+            nombre: {'ms': round(segundos * 1000, 2), 'llamadas': llamadas}
+            for nombre, (segundos, llamadas) in sorted(self.dependencias.items())
+        }
+
+
+_traza_actual: contextvars.ContextVar[Optional[TrazaPeticion]] = contextvars.ContextVar('traza', default=None)
+
+
+def _medido(dependencia: str, funcion):
+    def llamada(*args, **kwargs):
+        traza = _traza_actual.get()
+        if traza is None:
+            return funcion(*args, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            traza.registrar(dependencia, time.perf_counter() - inicio)
+    return llamada
+
+
+class _ProxyConstructor:
+    """
+    Constructores encadenables (consultas de postgrest, pipelines de Redis): solo
+    execute() hace I/O; el resto de métodos devuelven otro constructor que se envuelve.
+    """
+
+    def __init__(self, objeto, dependencia: str):
+        self._objeto = objeto
+        self._dependencia = dependencia
+
+    def __getattr__(self, nombre):
+        valor = getattr(self._objeto, nombre)
+        if nombre == 'execute':
+            return _medido(self._dependencia, valor)
+        if not callable(valor):
+            return valor
+
+        def llamada(*args, **kwargs):
+            resultado = valor(*args, **kwargs)
+            if hasattr(resultado, 'execute'):
+                return _ProxyConstructor(resultado, self._dependencia)
+            return resultado
+        return llamada
+
+    def __len__(self):
+        return len(self._objeto)
+
+
+class _ProxyCliente:
+    """
+    Cliente con todos sus métodos públicos medidos, salvo los que solo crean objetos
+    (`constructores`, cuyos resultados se envuelven) y los de `sin_medir`.
+    """
+
+    def __init__(self, objeto, dependencia: str, constructores=(), sin_medir=(), medir_resto: bool = True,
+                 subclientes: Optional[Dict[str, str]] = None):
+        self._objeto = objeto
+        self._dependencia = dependencia
+        self._constructores = set(constructores)
+        self._sin_medir = set(sin_medir)
+        self._medir_resto = medir_resto
+        self._subclientes = subclientes or {}
+
+    def __getattr__(self, nombre):
+        valor = getattr(self._objeto, nombre)
+        if nombre in self._subclientes:
+            return _ProxyCliente(valor, self._subclientes[nombre])
+        if not callable(valor) or nombre.startswith('_') or nombre in self._sin_medir:
+            return valor
+        if nombre in self._constructores:
+            dependencia = self._dependencia
+            return lambda *args, **kwargs: _ProxyConstructor(valor(*args, **kwargs), dependencia)
+        if self._medir_resto:
+            return _medido(self._dependencia, valor)
+        return valor
+
+
+def envolver_supabase(cliente):
+    return _ProxyCliente(
+        cliente, 'supabase',
+        constructores={'table', 'from_', 'rpc', 'schema'},
+        medir_resto=False,
+        subclientes={'auth': 'supabase_auth'}
+    )
+
+
+def envolver_redis(cliente):
+    return _ProxyCliente(
+        cliente, 'redis',
+        constructores={'pipeline'},
+        sin_medir={'pubsub', 'lock', 'register_script', 'monitor', 'client'}
+    )
+
+
+def instrumentar_sqlalchemy(engine):
+    """Tiempo de cada sentencia SQL (eventos de cursor del engine)"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _antes(conn, cursor, sentencia, parametros, contexto, multiples):
+        if _traza_actual.get() is not None:
+            conn.info.setdefault('inicio_traza', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _despues(conn, cursor, sentencia, parametros, contexto, multiples):
+        traza = _traza_actual.get()
+        inicios = conn.info.get('inicio_traza')
+        if traza is not None and inicios:
+            traza.registrar('sqlite', time.perf_counter() - inicios.pop())
+
+
+def _instrumentar_engine(engine):
+    instrumentar_sqlalchemy(engine)
+    return engine
+
+
+def instrumentar_dependencias(db_manager):
+    """
+    Envuelve los clientes de db_manager con proxies medidos (una sola vez). Los que aún no
+    existen se envuelven al crearse, así que con FAST_BOOT no se abre ninguna conexión aquí.
+    """
+    if getattr(db_manager, 'trazas_instaladas', False):
+        return
+    db_manager.envolver_conexion('supabase', envolver_supabase)
+    db_manager.envolver_conexion('redis', envolver_redis)
+    db_manager.envolver_conexion('engine', _instrumentar_engine)
+    db_manager.trazas_instaladas = True
+
+
+def instrumentar_trazas(app):
+    """Server-Timing en cada respuesta y registro de las peticiones más lentas que SLOW_REQUEST_MS"""
+    from flask import g, request
+    from flask.json.provider import DefaultJSONProvider
+
+    class ProveedorJSONMedido(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            return _medido('json', super().dumps)(obj, **kwargs)
+
+    app.json = ProveedorJSONMedido(app)
+
+    @app.before_request
+    def _iniciar_traza():
+        g.token_traza = _traza_actual.set(TrazaPeticion())
+
+    @app.after_request
+    def _cerrar_traza(response):
+        traza = _traza_actual.get()
+        if traza is None:
+            return response
+        total = time.perf_counter() - traza.inicio
+        response.headers['Server-Timing'] = traza.server_timing(total)
+
+        if total * 1000 >= Config.SLOW_REQUEST_MS:
+            desglose = traza.desglose()
+            logger_lentas.warning(json.dumps({
+                'evento': 'peticion_lenta',
+                'metodo': request.method,
+                'ruta': request.url_rule.rule if request.url_rule else None,
+                'url': request.path,
+                'estado': response.status_code,
+                'duracion_ms': round(total * 1000, 2),
+                'dependencias': desglose,
+                'resto_ms': round(total * 1000 - sum(d['ms'] for d in desglose.values()), 2)
+            }))
+        return response
+
+    @app.teardown_request
+    def _descartar_traza(error=None):
+        token = g.pop('token_traza', None)
+        if token is not None:
+            _traza_actual.reset(token)
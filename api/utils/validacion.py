@@ -0,0 +1,165 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Validación por lotes de lecturas y diagnósticos recibidos de fuentes reales: cada campo
+# numérico se convierte a una columna float64 y los rangos físicos se comprueban con una
+# sola operación por columna; después se descartan los duplicados (id_torre, timestamp)
+# dentro del lote. El resultado son registros con el mismo formato que produce el
+# simulador, listos para StorageManager.save_lote.
+
+# rangos físicos admitidos (ambos extremos incluidos)
+RANGOS = {
+    'meteorologico': {
+        'temperatura': (-90.0, 60.0),
+        'humedad_relativa': (0.0, 100.0),
+        'presion_atmosferica': (300.0, 1100.0),
+        'velocidad_viento': (0.0, 120.0),
+        'direccion_viento': (0, 360),
+        'precipitacion': (0.0, 500.0),
+        'radiacion_solar': (0.0, 1500.0),
+        'indice_uv': (0, 20),
+    },
+    'diagnostico': {
+        'nivel_bateria': (0.0, 100.0),
+    },
+}
+ENTEROS = {'direccion_viento', 'indice_uv'}
+ESTADOS = {
+    'estado_sensor_temperatura': {'OK', 'Error'},
+    'estado_sensor_humedad': {'OK', 'Error'},
+    'estado_general': {'Normal', 'Alerta', 'Crítico'},
+}
+CAMPOS_TEXTO = {'diagnostico': ('estado_sensor_temperatura', 'estado_sensor_humedad', 'estado_general')}
+FECHAS_OPCIONALES = {'diagnostico': ('tiempo_ultima_conexion',)}
+
+_NO_NUMERICO = np.inf  # marca de valor presente pero no numérico (no pasa isfinite)
+
+
+def tipo_registro(registro: Dict) -> str:
+    """'meteorologico' o 'diagnostico': el campo tipo si viene, si no por sus campos"""
+    tipo = registro.get('tipo')
+    if tipo:
+        return tipo
+    return 'diagnostico' if 'nivel_bateria' in registro or 'estado_general' in registro else 'meteorologico'
+
+
+def _fecha_utc(valor) -> Optional[datetime]:
+    """ISO 8601 (con o sin zona) o epoch en segundos, normalizado a UTC sin zona"""
+    if isinstance(valor, bool) or valor is None:
+        return None
+    try:
+        if isinstance(valor, (int, float)):
+            return datetime.fromtimestamp(valor, tz=timezone.utc).replace(tzinfo=None)
+        fecha = datetime.fromisoformat(valor)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+
+def _epoch(fecha: datetime) -> float:
+    return fecha.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _columna(registros: List[Dict], campo: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(valores float64, presente): NaN si falta, inf si no es numérico"""
+    valores = np.fromiter(
+        (v if type(v) in (int, float) else (np.nan if v is None else _NO_NUMERICO)
+         for v in (r.get(campo) for r in registros)),
+        dtype=np.float64, count=len(registros)
+    )
+    presente = np.fromiter((r.get(campo) is not None for r in registros), dtype=bool, count=len(registros))
+    return valores, presente
+
+
+def validar_lote(tipo: str, registros: List[Dict], torres_permitidas: Optional[Set[str]] = None,
+                 ahora: Optional[datetime] = None) -> Tuple[List[Tuple[int, Dict]], List[Tuple[int, str]]]:
+    """
+    Valida `registros` (todos del mismo tipo) y devuelve (aceptados, rechazados): los
+    aceptados como (índice, registro normalizado) y los rechazados como (índice, motivo).
+    Con `torres_permitidas` se rechazan las torres fuera del conjunto.
+    """
+    if tipo not in RANGOS:
+        return [], [(i, f"Tipo de dato no soportado: {tipo}") for i in range(len(registros))]
+    n = len(registros)
+    if n == 0:
+        return [], []
+
+    errores = np.full(n, None, dtype=object)
+
+    def marcar(mascara: np.ndarray, motivo: str):
+        errores[mascara & (errores == None)] = motivo  # noqa: E711 (comparación elemento a elemento)
+
+    # torre
+    ids = np.array([r.get('id_torre') for r in registros], dtype=object)
+    marcar(np.fromiter((not isinstance(i, str) or not i for i in ids), dtype=bool, count=n), "id_torre faltante")
+    if torres_permitidas is not None:
+        marcar(~np.isin(ids, list(torres_permitidas)), "Torre no encontrada o no asignada al usuario")
+
+    # marca de tiempo: se convierte fila a fila, la ventana admitida se comprueba por columna
+    ahora = ahora or datetime.utcnow()
+    fechas = [_fecha_utc(r.get('timestamp')) for r in registros]
+    epoch = np.array([_epoch(f) if f else np.nan for f in fechas], dtype=np.float64)
+    marcar(np.isnan(epoch), "timestamp faltante o inválido")
+    marcar(epoch > _epoch(ahora + timedelta(seconds=Config.INGEST_MAX_FUTURE_SECONDS)), "timestamp en el futuro")
+    if Config.INGEST_MAX_AGE_DAYS > 0:
+        marcar(epoch < _epoch(ahora - timedelta(days=Config.INGEST_MAX_AGE_DAYS)), "timestamp demasiado antiguo")
+
+    # campos numéricos: presentes deben ser finitos y estar en rango
+    columnas = {}
+    for campo, (minimo, maximo) in RANGOS[tipo].items():
+        valores, presente = _columna(registros, campo)
+        marcar(presente & ~np.isfinite(valores), f"{campo} no numérico")
+        marcar(presente & ((valores < minimo) | (valores > maximo)), f"{campo} fuera de rango [{minimo}, {maximo}]")
+        if campo in ENTEROS:
+            marcar(presente & np.isfinite(valores) & (valores != np.round(valores)), f"{campo} debe ser entero")
+        columnas[campo] = (valores, presente)
+
+    for campo in CAMPOS_TEXTO.get(tipo, ()):
+        validos = ESTADOS[campo]
+        marcar(np.fromiter((v is not None and (not isinstance(v, str) or v not in validos)
+                            for v in (r.get(campo) for r in registros)), dtype=bool, count=n),
+               f"{campo} debe ser uno de {sorted(validos)}")
+
+    fechas_extra = {}
+    for campo in FECHAS_OPCIONALES.get(tipo, ()):
+        fechas_extra[campo] = [_fecha_utc(r.get(campo)) for r in registros]
+        marcar(np.fromiter((r.get(campo) is not None and f is None
+                            for r, f in zip(registros, fechas_extra[campo])), dtype=bool, count=n),
+               f"{campo} inválido")
+
+    # duplicados dentro del lote: se queda la primera aparición
+    vistos = set()
+    for i in np.flatnonzero(errores == None):  # noqa: E711
+        clave = (ids[i], fechas[i])
+        if clave in vistos:
+            errores[i] = "duplicado (id_torre, timestamp) en el lote"
+        else:
+            vistos.add(clave)
+
+    aceptados, rechazados = [], []
+    for i in range(n):
+        if errores[i] is not None:
+            rechazados.append((i, errores[i]))
+            continue
+        normalizado = {'id_torre': ids[i], 'timestamp': fechas[i].isoformat()}
+        for campo, (valores, presente) in columnas.items():
+            if presente[i]:
+                normalizado[campo] = int(valores[i]) if campo in ENTEROS else float(valores[i])
+        for campo in CAMPOS_TEXTO.get(tipo, ()):
+            if registros[i].get(campo) is not None:
+                normalizado[campo] = registros[i][campo]
+        for campo, valores_fecha in fechas_extra.items():
+            if valores_fecha[i] is not None:
+                normalizado[campo] = valores_fecha[i].isoformat()
+        aceptados.append((i, normalizado))
+    return aceptados, rechazados
+
@@ -6,6 +6,10 @@
 
 
 import os
+from dotenv import load_dotenv
+
+# cargar .env antes de leer las variables de Config
+load_dotenv()
 
 class Config:
     DEBUG = os.getenv('FLASK_DEBUG', 'False') == 'True'
@@ -25,3 +29,111 @@ class Config:
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
     SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+
+    # Supabase local sobre SQLite (api/utils/supabase_local.py) para trabajar sin red
+    SUPABASE_LOCAL = os.getenv("SUPABASE_LOCAL", "False") == "True"
+    SUPABASE_LOCAL_DB = os.getenv("SUPABASE_LOCAL_DB", "supabase_local.sqlite3")
+    SUPABASE_LOCAL_PORT = int(os.getenv("SUPABASE_LOCAL_PORT", 0))  # 0 = puerto libre
+    SUPABASE_LOCAL_LATENCY_MS = float(os.getenv("SUPABASE_LOCAL_LATENCY_MS", 0))
+    SUPABASE_LOCAL_JITTER_MS = float(os.getenv("SUPABASE_LOCAL_JITTER_MS", 0))
+    SUPABASE_LOCAL_ERROR_RATE = float(os.getenv("SUPABASE_LOCAL_ERROR_RATE", 0))  # fraccion de peticiones con 503
+    SUPABASE_LOCAL_JWT_SECRET = os.getenv("SUPABASE_LOCAL_JWT_SECRET")  # por defecto, aleatorio por proceso
+
+    # Arranque rapido: conexiones perezosas y verificacion/sincronizacion/simulacion en
+    # segundo plano (GET /ready indica cuando termina)
+    FAST_BOOT = os.getenv("FAST_BOOT", "False") == "True"
+    BOOT_RETRY_INTERVAL = float(os.getenv("BOOT_RETRY_INTERVAL", 5))  # reintento de un paso fallido
+
+    # Modo de create_app: completo (API + simulacion, como run.py) | api (workers de
+    # gunicorn, sin simulacion ni consumidor; la ingesta corre en python -m api.ingest)
+    # | eventos (solo los flujos SSE, con workers gevent)
+    PROCESS_ROLE = os.getenv("PROCESS_ROLE", "completo")
+    INGEST_STATUS_PORT = int(os.getenv("INGEST_STATUS_PORT", 5001))  # /ready y /metrics de la ingesta (0 = sin servidor)
+    INGEST_ADMIN_TOKEN = os.getenv("INGEST_ADMIN_TOKEN", "")  # Bearer de POST /perfil de la ingesta (vacio = deshabilitado)
+
+    # Ingesta de fuentes reales (POST /api/ingest)
+    INGEST_MAX_BYTES = int(os.getenv("INGEST_MAX_BYTES", 32 * 1024 * 1024))  # cuerpo descomprimido
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 500))  # registros por save_lote
+    INGEST_MAX_FUTURE_SECONDS = float(os.getenv("INGEST_MAX_FUTURE_SECONDS", 300))  # desfase de reloj admitido
+    INGEST_MAX_AGE_DAYS = float(os.getenv("INGEST_MAX_AGE_DAYS", 30))  # 0 = sin limite
+    INGEST_BINARY_HOST = os.getenv("INGEST_BINARY_HOST", "127.0.0.1")  # receptor TCP/UDP del protocolo binario
+    INGEST_BINARY_PORT = int(os.getenv("INGEST_BINARY_PORT", 0))  # 0 = sin receptor
+    INGEST_BINARY_FLUSH_INTERVAL = float(os.getenv("INGEST_BINARY_FLUSH_INTERVAL", 1.0))  # segundos entre lotes
+    INGEST_BINARY_MAX_PENDING = int(os.getenv("INGEST_BINARY_MAX_PENDING", 200000))  # registros en búfer antes de rechazar tramas
+
+    # Simulacion
+    SIMULATION_ENGINE = os.getenv("SIMULATION_ENGINE", "threads")  # threads | asyncio
+    SIMULATION_INTERVAL = float(os.getenv("SIMULATION_INTERVAL", 10))
+    SIMULATION_BATCH = os.getenv("SIMULATION_BATCH", "False") == "True"  # tick vectorizado de toda la flota
+    SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", 10))  # plazo total para drenar escrituras al detener
+    SIMULATION_JITTER = float(os.getenv("SIMULATION_JITTER", 0.1))  # variacion aleatoria (fraccion del intervalo)
+    SIMULATION_SEED = int(os.environ["SIMULATION_SEED"]) if os.getenv("SIMULATION_SEED") else None
+    SIMULATION_SCENARIO = os.getenv("SIMULATION_SCENARIO", "uniforme")  # uniforme | diurno | tormentas | fallos | bateria | completo
+    SIMULATION_START = os.getenv("SIMULATION_START")  # instante simulado inicial (ISO), para repeticiones exactas
+    SIMULATION_TIME_ACCELERATION = float(os.getenv("SIMULATION_TIME_ACCELERATION", 1))
+
+    # Reparto de torres entre procesos/hosts con leases en Redis
+    SIMULATION_SHARDING = os.getenv("SIMULATION_SHARDING", "False") == "True"
+    SHARD_WORKER_ID = os.getenv("SHARD_WORKER_ID")  # por defecto host:pid:aleatorio
+    SHARD_LEASE_TTL = float(os.getenv("SHARD_LEASE_TTL", 15))
+    SHARD_HEARTBEAT_INTERVAL = float(os.getenv("SHARD_HEARTBEAT_INTERVAL", 5))
+
+    # Reconciliacion de la flota simulada con torres.estado
+    RECONCILE_INTERVAL = float(os.getenv("RECONCILE_INTERVAL", 30))
+    RECONCILE_FULL_EVERY = int(os.getenv("RECONCILE_FULL_EVERY", 10))  # ciclos entre comparaciones completas
+
+    # Sincronizacion Supabase -> SQLite (incremental por marca de agua)
+    SYNC_TABLES = [t.strip() for t in os.getenv("SYNC_TABLES", "torres,profiles,payments").split(",") if t.strip()]
+    SYNC_INTERVAL = float(os.getenv("SYNC_INTERVAL", 0))  # segundos entre pasadas en segundo plano, 0 = solo al arrancar
+    SYNC_FULL_EVERY = int(os.getenv("SYNC_FULL_EVERY", 20))  # ciclos entre pasadas completas (borrados)
+    SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", 1000))  # filas por pagina (keyset)
+    SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", 3))  # tablas sincronizadas a la vez
+    SYNC_LOOKBACK_SECONDS = float(os.getenv("SYNC_LOOKBACK_SECONDS", 3600))  # lecturas: se repide este margen bajo la marca
+
+    # Reglas de alerta (guardadas en Redis, recargadas al cambiar su version)
+    ALERT_RULES_RELOAD_INTERVAL = float(os.getenv("ALERT_RULES_RELOAD_INTERVAL", 30))
+
+    # Bus de alertas (Redis Streams)
+    ALERT_STREAM_MAXLEN = int(os.getenv("ALERT_STREAM_MAXLEN", 100000))  # longitud aproximada maxima del stream
+    ALERT_STREAM_BATCH = int(os.getenv("ALERT_STREAM_BATCH", 100))
+    ALERT_STREAM_CLAIM_IDLE = int(os.getenv("ALERT_STREAM_CLAIM_IDLE", 60000))  # ms sin confirmar antes de reclamar
+    ALERT_STREAM_MAX_DELIVERIES = int(os.getenv("ALERT_STREAM_MAX_DELIVERIES", 5))
+    ALERT_CONSUMER_ENABLED = os.getenv("ALERT_CONSUMER_ENABLED", "True") == "True"
+
+    # Eventos en vivo (SSE)
+    SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", 15))  # segundos entre comentarios de keep-alive
+    SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", 3000))
+    SSE_BUFFER = int(os.getenv("SSE_BUFFER", 10000))  # eventos recientes para reanudar con Last-Event-ID
+    SSE_CLIENT_QUEUE = int(os.getenv("SSE_CLIENT_QUEUE", 1000))  # eventos pendientes por cliente antes de cortarlo
+
+    # Metricas Prometheus (GET /metrics)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+    METRICS_DIR = os.getenv("METRICS_DIR", "")  # directorio compartido para sumar todos los procesos ('' = por proceso)
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))  # segundos entre volcados al directorio
+
+    # Trazas por peticion (cabecera Server-Timing y registro de peticiones lentas)
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "True") == "True"
+    SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 1000))
+
+    # Administracion: correos con acceso a /api/admin (separados por comas)
+    ADMIN_EMAILS = [e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()]
+
+    # Perfilador por muestreo (POST /api/admin/perfil, POST /perfil de la ingesta o kill -USR2 <pid>)
+    PROFILER_SIGNAL = os.getenv("PROFILER_SIGNAL", "SIGUSR2")  # vacio = sin manejador de senal
+    PROFILER_SIGNAL_SECONDS = float(os.getenv("PROFILER_SIGNAL_SECONDS", 30))
+    PROFILER_SIGNAL_THREADS = os.getenv("PROFILER_SIGNAL_THREADS", "")  # regex sobre el nombre del hilo
+    PROFILER_DIR = os.getenv("PROFILER_DIR", "perfiles")
+
+    # Formato de lecturas y alertas en Redis: json | msgpack | struct (se leen todos)
+    REDIS_CODEC = os.getenv("REDIS_CODEC", "json")
+
+    # Limite de escrituras por destino (registros por segundo, 0 = sin limite)
+    STORAGE_RATE_SUPABASE = float(os.getenv("STORAGE_RATE_SUPABASE", 0))
+    STORAGE_RATE_SQLITE = float(os.getenv("STORAGE_RATE_SQLITE", 0))
+    STORAGE_RATE_REDIS = float(os.getenv("STORAGE_RATE_REDIS", 0))
+
+    # Motor asyncio (lotes y pools de conexiones)
+    ASYNC_BATCH_SIZE = int(os.getenv("ASYNC_BATCH_SIZE", 500))
+    ASYNC_FLUSH_INTERVAL = float(os.getenv("ASYNC_FLUSH_INTERVAL", 0.5))
+    ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv("ASYNC_HTTP_MAX_CONNECTIONS", 20))
+    ASYNC_REDIS_MAX_CONNECTIONS = int(os.getenv("ASYNC_REDIS_MAX_CONNECTIONS", 20))
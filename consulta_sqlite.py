@@ -38,9 +38,9 @@ def mostrar_resumen_completo():
             with db_manager.get_session() as session:
                 count_sqlite = session.execute(text(f"SELECT COUNT(*) FROM {tabla}")).scalar()
             
-            # conteo en Supabase
+            # conteo en Supabase (count='exact' viene en la cabecera: basta con una fila)
             try:
-                res = db_manager.supabase.table(tabla).select('*', count='exact').execute()
+                res = db_manager.supabase.table(tabla).select('*', count='exact').limit(1).execute()
                 count_supabase = res.count
             except Exception as e:
                 logger.error(f"Error consultando {tabla} en Supabase: {str(e)}")
@@ -58,6 +58,7 @@ def mostrar_resumen_completo():
         print("-" * 50)
         for resultado in resultados:
             print(f"{resultado[0]}: SQLite={resultado[1]} | Supabase={resultado[2]} | Diferencia={resultado[3]}")
+        print("\nPara comparar contenido y reparar: python -m api.utils.conciliacion --tablas <tablas> [--reparar]")
         
     except Exception as e:
         logger.error(f"Error generando resumen: {str(e)}")
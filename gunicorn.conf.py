@@ -0,0 +1,64 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Workers de la API detrás de gunicorn:
+#
+#   gunicorn -c gunicorn.conf.py api.main:app
+#
+# Los workers no simulan ni consumen alertas (PROCESS_ROLE=api); eso lo hace un único
+# proceso de ingesta aparte, python -m api.ingest. Tampoco sirven los flujos SSE de
+# /api/eventos, que ocuparían un hilo cada uno: van en gunicorn_eventos.conf.py con
+# workers gevent (python -m api.despliegue lanza los tres).
+
+os.environ.setdefault('PROCESS_ROLE', 'api')  # antes de que se importe config.settings
+# /metrics suma los volcados de todos los workers (api.utils.metricas)
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'monitor_metricas'))
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))  # peticiones a la vez por worker (sin SSE)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(float(os.getenv('SHUTDOWN_TIMEOUT', 10))) + 5  # gunicorn solo admite enteros
+
+# la app se importa una vez en el master y los workers la heredan por fork; las
+# conexiones heredadas se descartan en cada hijo (api.utils.procesos.tras_fork)
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+
+def on_starting(server):
+    # volcados de un despliegue anterior: sus pids pueden repetirse
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['METRICS_DIR'], exist_ok=True)
+
+
+def worker_exit(server, worker):
+    from api.utils.metricas import registro
+
+    registro.volcar()
+
+
+def child_exit(server, worker):
+    # lo contado por un worker terminado se conserva en retirados.json
+    from api.utils.metricas import registro
+
+    registro.consolidar(worker.pid, os.environ['METRICS_DIR'])
+
+
+def post_fork(server, worker):
+    from api.utils.procesos import manejadores
+
+    server.log.info(f"Worker {worker.pid}: estado por proceso reiniciado ({', '.join(manejadores())})")
+
+
+def post_worker_init(worker):
+    # conexiones propias del worker abiertas antes de la primera petición
+    from api.database import db_manager
+
+    resultado = db_manager.verificar_conexiones()
+    fallidas = [nombre for nombre, r in resultado.items() if not r['ok']]
+    if fallidas:
+        logging.getLogger('gunicorn.error').warning(f"Worker {worker.pid}: conexiones fallidas {fallidas}")
@@ -0,0 +1,56 @@
+import logging
+import os
+import shutil
+import tempfile
+
+# Flujos SSE (/api/eventos) fuera de los workers de la API:
+#
+#   gunicorn -c gunicorn_eventos.conf.py api.main:app
+#
+# Cada cliente SSE mantiene su respuesta abierta mientras la pestaña está abierta; en un
+# worker gthread eso es un hilo por cliente. Con workers gevent cada conexión es una
+# greenlet y la espera en la cola del cliente (queue.Queue, parcheada) no bloquea a las
+# demás. Este proceso solo registra el blueprint de eventos (PROCESS_ROLE=eventos); el
+# proxy envía /api/eventos/ a SSE_BIND y el resto de /api a los workers de la API.
+
+os.environ.setdefault('PROCESS_ROLE', 'eventos')  # antes de que se importe config.settings
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'monitor_metricas_eventos'))
+
+bind = os.getenv('SSE_BIND', '0.0.0.0:5002')
+# cada worker tiene su hub y su buffer de reanudación: con más de uno el proxy debe fijar
+# cada usuario a un worker para que Last-Event-ID funcione al reconectar
+workers = int(os.getenv('SSE_WORKERS', 1))
+worker_class = 'gevent'
+worker_connections = int(os.getenv('SSE_MAX_CONNECTIONS', 1000))  # clientes SSE por worker
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(float(os.getenv('SHUTDOWN_TIMEOUT', 10))) + 5
+
+# sin preload: gevent parchea la biblioteca estándar al arrancar el worker, antes de que
+# la app importe threading, socket o redis
+preload_app = False
+
+
+def on_starting(server):
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['METRICS_DIR'], exist_ok=True)
+
+
+def worker_exit(server, worker):
+    from api.utils.metricas import registro
+
+    registro.volcar()
+
+
+def child_exit(server, worker):
+    from api.utils.metricas import registro
+
+    registro.consolidar(worker.pid, os.environ['METRICS_DIR'])
+
+
+def post_worker_init(worker):
+    from api.database import db_manager
+
+    resultado = db_manager.verificar_conexiones()
+    fallidas = [nombre for nombre, r in resultado.items() if not r['ok']]
+    if fallidas:
+        logging.getLogger('gunicorn.error').warning(f"Worker {worker.pid}: conexiones fallidas {fallidas}")